@@ -1,10 +1,15 @@
 from django.contrib import admin
-from .models import Room, Bill
+from .models import Room, Bill, QueueLatencyAggregate, ConfigSetting, ArchivedBill, Hotel, NightAuditEntry
+
+@admin.register(Hotel)
+class HotelAdmin(admin.ModelAdmin):
+    list_display = ("code", "name", "settings", "updated_at")
+    search_fields = ("code", "name")
 
 @admin.register(Room)
 class RoomAdmin(admin.ModelAdmin):
-    list_display = ("room_id", "occupancy_status", "is_on", "current_temp", "target_temp", "fan_speed", "mode", "status", "fee")
-    list_filter = ("occupancy_status", "is_on", "fan_speed", "mode", "status")
+    list_display = ("room_id", "hotel", "occupancy_status", "is_on", "current_temp", "target_temp", "fan_speed", "mode", "status", "fee")
+    list_filter = ("hotel", "occupancy_status", "is_on", "fan_speed", "mode", "status")
     search_fields = ("room_id", "guest_id")
 
 @admin.register(Bill)
@@ -12,3 +17,25 @@ class BillAdmin(admin.ModelAdmin):
     list_display = ("room", "guest_id", "check_in_time", "check_out_time", "ac_fee", "accommodation_fee", "total_amount")
     list_filter = ("check_in_time", "check_out_time")
     search_fields = ("guest_id", "room__room_id")
+
+@admin.register(QueueLatencyAggregate)
+class QueueLatencyAggregateAdmin(admin.ModelAdmin):
+    list_display = ("period_start", "period_end", "hotel", "fan_speed", "zone", "admissions", "wait_max", "preemptions", "swaps")
+    list_filter = ("hotel", "fan_speed", "zone")
+
+@admin.register(ConfigSetting)
+class ConfigSettingAdmin(admin.ModelAdmin):
+    list_display = ("key", "value", "updated_at")
+    search_fields = ("key",)
+
+@admin.register(ArchivedBill)
+class ArchivedBillAdmin(admin.ModelAdmin):
+    list_display = ("id", "room", "guest_id", "check_out_time", "total_amount", "archive", "session_count")
+    list_filter = ("archive",)
+    search_fields = ("guest_id", "room__room_id")
+
+@admin.register(NightAuditEntry)
+class NightAuditEntryAdmin(admin.ModelAdmin):
+    list_display = ("business_date", "room", "guest_id", "nights", "accommodation_fee", "ac_fee", "ac_to_date", "difference")
+    list_filter = ("business_date",)
+    search_fields = ("guest_id", "room__room_id")
@@ -13,27 +13,38 @@ class CoreConfig(AppConfig):
     def start_services(self):
         from core.services.scheduler import Scheduler
         from core.services.simulation import SimulationEngine
+        from core.services.partitioned import PartitionedSimulationEngine
+        from core.services.config import Config
+        from core.services.config_store import ConfigStore
+        from core.services.provisioning import iter_room_rows, upsert_rooms
         from core.models import Room
+        from django.conf import settings
         from django.db.utils import OperationalError, ProgrammingError
 
         # Initialize Rooms
         try:
             # Check if table exists by querying
             if not Room.objects.exists():
-                room_ids = ['301', '302', '303', '304', '305',
-                            '401', '402', '403', '404', '405']
-                for rid in room_ids:
-                    Room.objects.create(room_id=rid)
-                print("[Init] Created default rooms.")
+                seed_file = getattr(settings, 'ROOM_SEED_FILE', None)
+                if seed_file and os.path.exists(seed_file):
+                    count, _ = upsert_rooms(iter_room_rows(seed_file))
+                    print(f"[Init] Created {count} rooms from {seed_file}.")
+                else:
+                    print("[Init] No rooms found. Use 'manage.py import_rooms' to provision rooms.")
         except (OperationalError, ProgrammingError):
             # DB not ready (e.g. during migration)
             print("[Init] Database not ready, skipping room initialization.")
             return
 
-        # Start Scheduler
-        scheduler = Scheduler()
-        scheduler.start()
+        # Apply runtime config overrides before the services read Config
+        ConfigStore().refresh(force=True)
+
+        # Start the schedulers (default property and one per hotel) on their shared thread
+        Scheduler.start_all()
         
         # Start Simulation
-        sim = SimulationEngine()
+        if Config.SIM_WORKERS > 1:
+            sim = PartitionedSimulationEngine()
+        else:
+            sim = SimulationEngine()
         sim.start()
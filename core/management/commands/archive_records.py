@@ -0,0 +1,34 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.services.archive import archive_settled, archive_dir, DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Move bills checked out before the retention window, with their AC sessions, into compressed monthly archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Retention window in the hot tables')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days must be >= 0')
+        before = timezone.now() - datetime.timedelta(days=options['days'])
+
+        def progress(bills, sessions):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {bills} bills, {sessions} sessions')
+
+        try:
+            result = archive_settled(before, batch_size=options['batch_size'],
+                                     dry_run=options['dry_run'], progress=progress)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['bills']} bills and {result['sessions']} sessions older than "
+            f"{timezone.localtime(before):%Y-%m-%d} in {result['elapsed']:.2f}s ({archive_dir()})."
+        ))
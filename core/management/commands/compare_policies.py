@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.services.headless import HeadlessSimulation
+from core.services.policies import POLICIES, get_policy
+from core.services.workload import record_workload, load_workload, save_workload
+
+
+class Command(BaseCommand):
+    help = 'Replay a recorded workload under each scheduling policy and compare wait, preemption and comfort'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workload', help='Workload JSON file (default: rebuilt from ACSession rows)')
+        parser.add_argument('--save', help='Write the workload used to this file')
+        parser.add_argument('--policies', nargs='+', choices=sorted(POLICIES), default=sorted(POLICIES))
+        parser.add_argument('--max-serving', type=int, default=None)
+        parser.add_argument('--time-slice', type=float, default=None)
+        parser.add_argument('--power-budget', type=float, default=None,
+                            help='Admit rooms by FAN_POWER within this budget instead of --max-serving slots')
+
+    def handle(self, *args, **options):
+        if options['workload']:
+            try:
+                workload = load_workload(options['workload'])
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f'Cannot read workload: {e}')
+        else:
+            workload = record_workload()
+        if not workload['events']:
+            raise CommandError('Workload is empty (no AC sessions recorded).')
+        if options['save']:
+            save_workload(workload, options['save'])
+
+        self.stdout.write(f"Workload: {len(workload['rooms'])} rooms, {len(workload['events'])} events")
+        header = f"{'policy':<22}{'admits':>8}{'mean wait':>11}{'p95':>9}{'p99':>9}{'max':>9}" \
+                 f"{'preempt':>9}{'swaps':>7}{'err(°C·min)':>13}{'err/slot-h':>12}{'energy':>9}"
+        self.stdout.write(header)
+        for name in options['policies']:
+            sim = HeadlessSimulation(workload, policy=get_policy(name),
+                                     max_serving=options['max_serving'], time_slice=options['time_slice'],
+                                     power_budget=options['power_budget'])
+            m = sim.run()
+            slot_hours = m['serving_seconds'] / 3600.0
+            per_slot = m['error_integral'] / slot_hours if slot_hours else 0.0
+            self.stdout.write(
+                f"{name:<22}{m['admissions']:>8}{m['mean_wait']:>10.1f}s{m['p95_wait']:>8.1f}s"
+                f"{m['p99_wait']:>8.1f}s{m['max_wait']:>8.1f}s{m['preemptions']:>9}{m['swaps']:>7}"
+                f"{m['error_integral']:>13.1f}{per_slot:>12.1f}{m['energy']:>9.2f}"
+            )
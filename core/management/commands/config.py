@@ -0,0 +1,40 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from core.services.config_store import ConfigStore
+
+
+class Command(BaseCommand):
+    help = 'Show or change runtime Config overrides (picked up by a running server within one tick)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', nargs='?', choices=['list', 'set', 'unset'], default='list')
+        parser.add_argument('key', nargs='?')
+        parser.add_argument('value', nargs='?', help='JSON value, e.g. 90, null, \'{"HIGH": 1.2, "MID": 0.6, "LOW": 0.4}\'')
+
+    def handle(self, *args, **options):
+        store = ConfigStore()
+        action, key, value = options['action'], options['key'], options['value']
+        try:
+            if action == 'set':
+                if not key or value is None:
+                    raise CommandError('Usage: config set KEY VALUE')
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass  # Bare strings, e.g. config set DEFAULT_FAN_SPEED HIGH
+                store.set(key, value)
+                self.stdout.write(self.style.SUCCESS(f'{key} = {json.dumps(value)}'))
+                return
+            if action == 'unset':
+                if not key:
+                    raise CommandError('Usage: config unset KEY')
+                store.unset(key)
+                self.stdout.write(self.style.SUCCESS(f'{key} reset to default'))
+                return
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        store.refresh(force=True)
+        for name, (current, overridden) in store.effective().items():
+            marker = '*' if overridden else ' '
+            self.stdout.write(f'{marker} {name:<24}{json.dumps(current)}')
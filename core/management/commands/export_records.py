@@ -0,0 +1,92 @@
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime, parse_date
+from django.utils import timezone
+from core.services.export import stream_export, EXPORTS, FORMATS, ArchivedRangeError
+
+
+def _parse(value):
+    if value is None:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'Invalid date: {value}')
+        parsed = datetime.datetime(day.year, day.month, day.day)
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+class Command(BaseCommand):
+    help = 'Stream bills or AC sessions to a CSV/NDJSON file (optionally gzipped) with flat memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+        parser.add_argument('--after', type=int, default=0,
+                            help='Resume after this id; the output file is appended to')
+        parser.add_argument('--hot-only', action='store_true',
+                            help='Export sessions still in the database even if the range reaches archived months')
+        parser.add_argument('--from', dest='since', help='Date or datetime (bills: check-out, sessions: start)')
+        parser.add_argument('--to', dest='until')
+
+    def handle(self, *args, **options):
+        state = {'rows': 0, 'last': options['after']}
+
+        def on_row(row):
+            state['rows'] += 1
+            state['last'] = row[0]
+
+        try:
+            chunks = stream_export(
+                options['kind'], options['format'], compress=options['gzip'], after=options['after'],
+                since=_parse(options['since']), until=_parse(options['until']), on_row=on_row,
+                hot_only=options['hot_only'],
+            )
+        except ArchivedRangeError as e:
+            raise CommandError(str(e))
+        started = time.perf_counter()
+        try:
+            if not options['output']:
+                self._write(chunks, sys.stdout.buffer)
+            elif options['gzip']:
+                self._write_gzip(chunks, options['output'], append=bool(options['after']))
+            else:
+                with open(options['output'], 'ab' if options['after'] else 'wb') as out:
+                    self._write(chunks, out)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - started
+        self.stderr.write(f"Exported {state['rows']} {options['kind']} in {elapsed:.2f}s; "
+                          f"last id {state['last']} (continue with --after {state['last']})")
+
+    def _write(self, chunks, target):
+        for chunk in chunks:
+            target.write(chunk)
+        target.flush()
+
+    def _write_gzip(self, chunks, path, append):
+        # A gzip stream cut short cannot be appended to, so --after could not resume an
+        # interrupted one: write to a temporary file and only then replace / append to
+        # the output. An interrupted run leaves the output as it was; run it again.
+        fd, tmp = tempfile.mkstemp(prefix='.export-', dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                self._write(chunks, out)
+            if append and os.path.exists(path):
+                # A complete gzip member after a complete file is a valid gzip file
+                with open(tmp, 'rb') as src, open(path, 'ab') as dst:
+                    shutil.copyfileobj(src, dst)
+            else:
+                os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
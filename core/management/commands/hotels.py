@@ -0,0 +1,60 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from core.models import Hotel
+from core.services.tenancy import HOTEL_KEYS, validate_settings
+
+
+class Command(BaseCommand):
+    help = ('List or add hosted hotels and change their own Config values '
+            f'({", ".join(HOTEL_KEYS)}; picked up by a running server within one tick)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', nargs='?', choices=['list', 'add', 'set', 'unset'], default='list')
+        parser.add_argument('code', nargs='?')
+        parser.add_argument('key', nargs='?')
+        parser.add_argument('value', nargs='?', help='JSON value, e.g. 5, null, \'[["08:00", 6.0], ["22:00", 3.0]]\'')
+        parser.add_argument('--name', default='', help='Display name (add)')
+
+    def handle(self, *args, **options):
+        action, code, key, value = options['action'], options['code'], options['key'], options['value']
+        if action == 'list':
+            for hotel in Hotel.objects.annotate(room_count=Count('rooms')).order_by('code'):
+                self.stdout.write(f'{hotel.code:<20}{hotel.room_count:>6} rooms  {hotel.name:<24}{json.dumps(hotel.settings)}')
+            return
+
+        if not code:
+            raise CommandError(f'Usage: hotels {action} CODE ...')
+        if action == 'add':
+            hotel, created = Hotel.objects.get_or_create(code=code, defaults={'name': options['name']})
+            if not created:
+                raise CommandError(f'Hotel {code} already exists')
+            self.stdout.write(self.style.SUCCESS(f'Added hotel {code}'))
+            return
+
+        try:
+            hotel = Hotel.objects.get(code=code)
+        except Hotel.DoesNotExist:
+            raise CommandError(f'Unknown hotel: {code}')
+        if not key:
+            raise CommandError(f'Usage: hotels {action} CODE KEY' + (' VALUE' if action == 'set' else ''))
+        settings = dict(hotel.settings)
+        if action == 'set':
+            if value is None:
+                raise CommandError('Usage: hotels set CODE KEY VALUE')
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass  # Bare strings, e.g. hotels set h1 SCHEDULING_POLICY weighted_fair
+            settings[key] = value
+        elif settings.pop(key, None) is None:
+            raise CommandError(f'{key} is not set for hotel {code}')
+        try:
+            hotel.settings = validate_settings(settings)
+        except ValueError as e:
+            raise CommandError(str(e))
+        hotel.save()
+        if action == 'set':
+            self.stdout.write(self.style.SUCCESS(f'{code}: {key} = {json.dumps(hotel.settings[key])}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{code}: {key} follows the global config'))
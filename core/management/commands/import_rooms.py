@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from core.services.provisioning import iter_room_rows, upsert_rooms, DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = ('Bulk import (upsert) room definitions from a CSV, JSON or JSON-lines file. Existing rooms get only '
+            'the columns the file sets; the import is all or nothing')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Room definition file')
+        parser.add_argument('--format', choices=['csv', 'json', 'jsonl'], default=None,
+                            help='File format (default: guessed from extension)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--hotel', help='Hotel code for rows without a hotel column (default: none)')
+
+    def handle(self, *args, **options):
+        def progress(count, elapsed):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {count} rooms ({elapsed:.2f}s)')
+
+        try:
+            rows = iter_room_rows(options['path'], options['format'])
+            count, elapsed = upsert_rooms(rows, batch_size=options['batch_size'], progress=progress,
+                                          hotel=options['hotel'])
+        except (OSError, ValueError, IntegrityError) as e:
+            raise CommandError(str(e))
+
+        rate = count / elapsed if elapsed > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {count} rooms in {elapsed:.2f}s ({rate:.0f} rooms/s).'
+        ))
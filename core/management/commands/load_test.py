@@ -0,0 +1,110 @@
+import csv
+import os
+import socket
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Room
+from core.services.loadtest import ramp
+
+
+class Command(BaseCommand):
+    help = ('Ramp up simulated guest panels (1 Hz polling plus occasional control changes) and monitor screens '
+            'until the p99 latency SLO is broken, and print the capacity curve. '
+            'Panels change room settings: run it against a copy of the database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--external', action='store_true',
+                            help='Use a server already running at --host:--port instead of starting one')
+        parser.add_argument('--start', type=int, default=10, help='Panels in the first stage')
+        parser.add_argument('--step', type=int, default=10, help='Panels added per stage')
+        parser.add_argument('--max', type=int, default=1000, help='Stop after this many panels')
+        parser.add_argument('--monitors', type=int, default=2, help='Monitor screens polling /api/rooms/ and /api/queues/')
+        parser.add_argument('--stage-seconds', type=float, default=15.0)
+        parser.add_argument('--slo-ms', type=float, default=200.0, help='p99 latency objective')
+        parser.add_argument('--control-interval', type=float, default=30.0,
+                            help='Mean seconds between control changes per panel (0 = none)')
+        parser.add_argument('--keep-rate-limits', action='store_true',
+                            help='Keep Config.RATE_LIMITS on in the server started here (off by default: '
+                                 'throttling would cap the measured capacity, not the scheduler or DB)')
+        parser.add_argument('--csv', help='Write the capacity curve to this CSV file')
+
+    def handle(self, *args, **options):
+        room_ids = list(Room.objects.order_by('room_id').values_list('room_id', flat=True))
+        if not room_ids:
+            raise CommandError('No rooms. Use import_rooms first.')
+
+        server = None
+        host, port = options['host'], options['port']
+        if not options['external']:
+            server = self._start_server(host, port, options['keep_rate_limits'])
+        try:
+            self.stdout.write(f"{'panels':>7}{'monitors':>9}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+                              f"{'room p99':>10}{'ctrl p99':>10}{'rooms p99':>11}{'errors':>8}{'429':>7}  SLO")
+            curve, capacity = ramp(
+                host, port, room_ids, options['start'], options['step'], options['max'],
+                options['monitors'], options['stage_seconds'], options['slo_ms'],
+                control_interval=options['control_interval'], on_stage=self._print_stage,
+            )
+        finally:
+            if server:
+                server.terminate()
+                server.wait(timeout=10)
+
+        if options['csv']:
+            self._write_csv(options['csv'], curve)
+        if capacity:
+            self.stdout.write(self.style.SUCCESS(
+                f"Capacity: {capacity} panels + {options['monitors']} monitors within p99 <= {options['slo_ms']:.0f}ms"))
+        else:
+            self.stdout.write(self.style.WARNING(f"SLO p99 <= {options['slo_ms']:.0f}ms not met at {options['start']} panels"))
+        if any(r['throttled'] for r in curve):
+            self.stdout.write(self.style.WARNING(
+                'Some requests were rate limited (429, not counted as errors or in the latencies); '
+                'see Config.RATE_LIMITS'))
+
+    def _print_stage(self, r):
+        ep = r['endpoints']
+        p99 = lambda name: ep.get(name, {}).get('p99_ms', 0.0)
+        self.stdout.write(
+            f"{r['panels']:>7}{r['monitors']:>9}{r['throughput']:>9.1f}{r['p50_ms']:>7.1f}ms{r['p95_ms']:>7.1f}ms"
+            f"{r['p99_ms']:>7.1f}ms{p99('room'):>8.1f}ms{p99('control'):>8.1f}ms{p99('rooms'):>9.1f}ms"
+            f"{r['errors']:>8}{r['throttled']:>7}  {'ok' if r['slo_met'] else 'BROKEN'}"
+        )
+
+    def _write_csv(self, path, curve):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['panels', 'monitors', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'errors', 'throttled',
+                             'slo_met'])
+            for r in curve:
+                writer.writerow([r['panels'], r['monitors'], f"{r['throughput']:.2f}", f"{r['p50_ms']:.2f}",
+                                 f"{r['p95_ms']:.2f}", f"{r['p99_ms']:.2f}", r['errors'], r['throttled'],
+                                 int(r['slo_met'])])
+
+    def _start_server(self, host, port, keep_rate_limits=False):
+        # RUN_MAIN makes the server start the scheduler and simulation (see CoreConfig.ready)
+        env = dict(os.environ, RUN_MAIN='true')
+        if not keep_rate_limits:
+            # Every simulated panel comes from this host: the limits would throttle the test itself
+            env['RATE_LIMIT_ENABLED'] = '0'
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'runserver', '--noreload', f'{host}:{port}'],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'Server exited with code {server.returncode}')
+            try:
+                with socket.create_connection((host, port), timeout=0.5):
+                    self.stdout.write(f'Started server at http://{host}:{port}/')
+                    return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'Server did not start on {host}:{port}')
@@ -0,0 +1,44 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from core.services.night_audit import run_audit, DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = ("Nightly audit: post the night's room rate and the AC fee accrued since the last audit of every "
+            "occupied room to the ledger, and reconcile Room.fee against the stay's AC sessions")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Business date YYYY-MM-DD (default: today); re-running a date replaces it')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rooms per read and write')
+        parser.add_argument('--fail-on-discrepancy', action='store_true',
+                            help='Exit with an error if any room does not reconcile')
+
+    def handle(self, *args, **options):
+        business_date = None
+        if options['date']:
+            try:
+                business_date = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be >= 1')
+
+        def progress(rooms):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {rooms} rooms')
+
+        result = run_audit(business_date, batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Audited {result['rooms']} rooms in {result['elapsed']:.2f}s: accommodation "
+            f"{result['accommodation_fee']:.2f}, AC accrued {result['ac_fee']:.2f}."
+        ))
+
+        discrepancies = result['discrepancies']
+        for entry in discrepancies[:20]:
+            self.stdout.write(self.style.WARNING(
+                f'  Room {entry.room_id}: Room.fee {entry.ac_to_date:.2f}, sessions {entry.session_fee:.2f} '
+                f'({entry.difference:+.2f})'))
+        if len(discrepancies) > 20:
+            self.stdout.write(self.style.WARNING(f'  ... and {len(discrepancies) - 20} more'))
+        if discrepancies and options['fail_on_discrepancy']:
+            raise CommandError(f'{len(discrepancies)} rooms do not reconcile')
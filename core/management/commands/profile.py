@@ -0,0 +1,88 @@
+import glob
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.services.profiling import TARGETS, REQUEST_FILE, profile_dir, result_path, load_result, folded
+
+
+class Command(BaseCommand):
+    help = ('Profile a running server (picked up within a second): sampled stacks and SQL timings of '
+            'simulation ticks, scheduler passes or a fraction of HTTP requests; dump them as folded '
+            'stacks for flamegraph.pl / speedscope / inferno')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', nargs='?', choices=['start', 'stop', 'list', 'dump', 'queries'], default='list')
+        parser.add_argument('target', nargs='?', help=f'start/stop: {", ".join(TARGETS)}; dump/queries: profile id or file (default: latest)')
+        parser.add_argument('--ticks', type=int, default=50, help='Simulation ticks / scheduler passes / requests to profile')
+        parser.add_argument('--rate', type=float, default=1.0, help='requests: fraction of requests profiled')
+        parser.add_argument('--top', type=int, default=20, help='queries: number of statements shown')
+        parser.add_argument('-o', '--output', help='dump: write the folded stacks to this file')
+
+    def handle(self, *args, **options):
+        directory = profile_dir()
+        if not directory:
+            raise CommandError('settings.PROFILE_DIR is not set')
+        action, target = options['action'], options['target']
+        if action in ('start', 'stop'):
+            self._request(directory, action, target, options)
+        elif action == 'list':
+            for path in self._results(directory):
+                result = load_result(path)
+                self.stdout.write(f"{result['id']}  {result['target']:<11}{result['started']}  "
+                                  f"{result['sections']:>5} sections  mean {result['mean_ms']:.1f} ms  "
+                                  f"max {result['max_ms']:.1f} ms  {result['samples']} samples")
+        else:
+            result = load_result(self._find(directory, target))
+            if action == 'dump':
+                lines = folded(result)
+                if options['output']:
+                    with open(options['output'], 'w', encoding='utf-8') as f:
+                        f.write('\n'.join(lines) + '\n')
+                    self.stdout.write(self.style.SUCCESS(f"Wrote {len(lines)} stacks to {options['output']}"))
+                else:
+                    self.stdout.write('\n'.join(lines))
+            else:
+                self.stdout.write(f"{'count':>7}{'total ms':>11}{'max ms':>9}  sql")
+                for query in result['queries'][:options['top']]:
+                    self.stdout.write(f"{query['count']:>7}{query['total_ms']:>11.1f}{query['max_ms']:>9.1f}  {query['sql']}")
+
+    def _request(self, directory, action, target, options):
+        if target not in TARGETS:
+            raise CommandError(f'Usage: profile {action} {"|".join(TARGETS)}')
+        path = os.path.join(directory, REQUEST_FILE)
+        try:
+            with open(path, encoding='utf-8') as f:
+                requests = json.load(f)
+        except FileNotFoundError:
+            requests = {}
+        if action == 'stop':
+            if requests.pop(target, None) is None:
+                raise CommandError(f'No {target} profile requested')
+            message = f'Stopping the {target} profile (what was collected is written)'
+        else:
+            if options['ticks'] < 1 or not 0 < options['rate'] <= 1:
+                raise CommandError('--ticks must be >= 1 and --rate in (0, 1]')
+            session_id = time.strftime('%Y%m%d-%H%M%S')
+            requests[target] = {'id': session_id, 'sections': options['ticks'], 'rate': options['rate']}
+            message = f"Requested {options['ticks']} {target} sections; result: {result_path(directory, session_id, target)}"
+        os.makedirs(directory, exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(requests, f, indent=2)
+        os.replace(tmp, path)
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def _results(self, directory):
+        paths = [p for p in glob.glob(os.path.join(directory, '*.json')) if os.path.basename(p) != REQUEST_FILE]
+        return sorted(paths, key=os.path.getmtime)
+
+    def _find(self, directory, name):
+        if name and os.path.exists(name):
+            return name
+        paths = self._results(directory)
+        if name:
+            paths = [p for p in paths if os.path.basename(p).startswith(name)]
+        if not paths:
+            raise CommandError(f'No profile found{f" for {name}" if name else ""}')
+        return paths[-1]
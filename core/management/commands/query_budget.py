@@ -0,0 +1,82 @@
+import contextlib
+import csv
+import io
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+from core.services.config_store import ConfigStore
+from core.services.query_budget import BUDGETS, run_scale, over_budget, over_time
+
+
+class Command(BaseCommand):
+    help = ('Check the query-count and wall-time budgets of every page, API and of one scheduler / '
+            'simulation tick against seeded data at several scales (in a throwaway test database); '
+            'fails if a query or time budget is exceeded')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='20,200,1000', help='Room counts to seed, comma separated')
+        parser.add_argument('--time-factor', type=float, default=1.0,
+                            help='Multiply the time budgets (slow machines); 0 checks query counts only')
+        parser.add_argument('--warn-on-time', action='store_true',
+                            help='Only warn on exceeded time budgets (uncalibrated or shared machines)')
+        parser.add_argument('--csv', help='Write scenario, rooms, queries, ms rows to this file')
+
+    def handle(self, *args, **options):
+        try:
+            scales = sorted(int(n) for n in options['scales'].split(','))
+        except ValueError:
+            raise CommandError('--scales must be comma separated room counts')
+        if scales[0] < 4:
+            raise CommandError('Every scale needs at least 4 rooms')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        results = {}  # rooms -> {name: (queries, ms)}
+        try:
+            with override_settings(SCHEDULER_JOURNAL_DIR=None, HISTORY_DIR=None, PROFILE_DIR=None):
+                for rooms in scales:
+                    call_command('flush', interactive=False, verbosity=0)
+                    self.stdout.write(f'Seeding {rooms} rooms...')
+                    # The config store, scheduler and simulation log with print(); keep it out of the report
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        # Control changes are applied in the request (coalescing off): the full write path is measured
+                        ConfigStore().set('CONTROL_COALESCE_WINDOW', 0)
+                        results[rooms] = run_scale(rooms)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        failures, slow = [], []
+        header = f"{'scenario':<24}" + ''.join(f'{f"{n} rooms":>18}' for n in scales) + f"{'growth':>9}"
+        self.stdout.write(header)
+        for name in BUDGETS:
+            cells = []
+            for rooms in scales:
+                queries, ms = results[rooms][name]
+                problem = over_budget(name, rooms, queries)
+                if problem:
+                    failures.append(problem)
+                too_slow = over_time(name, rooms, ms, options['time_factor'] or float('inf'))
+                if too_slow:
+                    slow.append(too_slow)
+                cells.append(f"{'!' if problem else '~' if too_slow else ''}{queries}q {ms:7.1f}ms")
+            growth = results[scales[-1]][name][0] - results[scales[0]][name][0]
+            self.stdout.write(f'{name:<24}' + ''.join(f'{cell:>18}' for cell in cells) + f'{growth:>+9}')
+
+        if options['csv']:
+            with open(options['csv'], 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['scenario', 'rooms', 'queries', 'ms'])
+                for rooms in scales:
+                    for name, (queries, ms) in results[rooms].items():
+                        writer.writerow([name, rooms, queries, f'{ms:.2f}'])
+            self.stdout.write(f"Wrote {options['csv']}")
+
+        if slow:
+            self.stdout.write(self.style.WARNING('Over time budget (~):\n  ' + '\n  '.join(slow)))
+        if not options['warn_on_time']:
+            failures += slow
+        if failures:
+            raise CommandError('Over budget:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All within query budget' if slow else 'All within budget'))
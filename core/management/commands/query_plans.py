@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from core.models import ACSession
+from core.services import query_plans
+
+
+class Command(BaseCommand):
+    help = ('Show the query plan of every hot query and flag full table scans (fails if any); '
+            'with --benchmark, time them on seeded data with and without the model indexes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the plans of queries without problems too')
+        parser.add_argument('--benchmark', type=int, metavar='SESSIONS',
+                            help='Seed this many AC sessions into a throwaway test database and compare timings')
+        parser.add_argument('--rooms', type=int, default=1000, help='--benchmark: rooms seeded')
+        parser.add_argument('--repeat', type=int, default=50, help='--benchmark: runs of each query')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            self._benchmark(options)
+            return
+
+        scans = []
+        for name, where, plan, problems in query_plans.audit():
+            marker = self.style.ERROR('SCAN') if any(p.startswith('full scan') for p in problems) else \
+                self.style.WARNING('SORT') if problems else self.style.SUCCESS(' ok ')
+            self.stdout.write(f'{marker} {name:<20}{where}')
+            if problems or options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f'       {line}')
+            scans += [f'{name}: {p}' for p in problems if p.startswith('full scan')]
+        if scans:
+            raise CommandError('Full table scans (run migrate?):\n  ' + '\n  '.join(scans))
+
+    def _benchmark(self, options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f"Seeding {options['benchmark']} sessions, {options['rooms']} rooms...")
+            query_plans.seed(options['benchmark'], rooms=options['rooms'])
+            self.stdout.write(f'{ACSession.objects.count()} sessions seeded')
+            after = query_plans.time_queries(options['repeat'])
+            query_plans.drop_indexes()
+            before = query_plans.time_queries(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'query':<22}{'no index ms':>13}{'indexed ms':>13}{'speedup':>10}")
+        for name in query_plans.HOT_QUERIES:
+            speedup = before[name] / after[name] if after[name] else float('inf')
+            self.stdout.write(f'{name:<22}{before[name]:>13.3f}{after[name]:>13.3f}{speedup:>9.1f}x')
@@ -1,15 +1,30 @@
 from django.core.management.base import BaseCommand
+from core.services.config import Config
 from core.services.scheduler import Scheduler
 from core.services.simulation import SimulationEngine
+from core.services.partitioned import PartitionedSimulationEngine
 import time
 
 class Command(BaseCommand):
     help = 'Start the scheduler and simulation engine for the HVAC system'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=Config.SIM_WORKERS,
+                            help='Worker processes for the partitioned engine (0/1 = single thread)')
+        parser.add_argument('--partition-by', choices=['floor', 'zone'], default=Config.SIM_PARTITION_BY)
+        parser.add_argument('--partition-size', type=int, default=Config.SIM_PARTITION_SIZE,
+                            help='Max rooms per partition')
+
     def handle(self, *args, **options):
-        scheduler = Scheduler()
-        scheduler.start()
-        sim = SimulationEngine()
+        schedulers = Scheduler.start_all()
+        if options['workers'] > 1:
+            sim = PartitionedSimulationEngine(
+                workers=options['workers'],
+                partition_by=options['partition_by'],
+                partition_size=options['partition_size'],
+            )
+        else:
+            sim = SimulationEngine()
         sim.start()
         self.stdout.write(self.style.SUCCESS('Scheduler and Simulation started. Press Ctrl+C to stop.'))
         try:
@@ -17,5 +32,6 @@ class Command(BaseCommand):
                 time.sleep(1)
         except KeyboardInterrupt:
             sim.stop()
-            scheduler.stop()
+            for scheduler in schedulers:
+                scheduler.stop()
             self.stdout.write(self.style.WARNING('Stopped.'))
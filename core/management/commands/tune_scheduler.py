@@ -0,0 +1,88 @@
+import csv
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.services.config_store import ConfigStore
+from core.services.policies import POLICIES
+from core.services.config import Config
+from core.services.tuning import sweep, summarize, METRICS
+
+
+def _numbers(value, kind):
+    return sorted({kind(v) for v in value.split(',') if v.strip()})
+
+
+class Command(BaseCommand):
+    help = ('Sweep TIME_SLICE x MAX_SERVING_ROOMS over randomized, seeded occupancy and usage scenarios '
+            'replayed headless (no DB) in a process pool; report mean and p95 wait, comfort error and '
+            'energy with confidence intervals')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--time-slices', default='60,120,180,300', help='Seconds, comma separated')
+        parser.add_argument('--max-serving', default='2,3,4', help='Slot counts, comma separated')
+        parser.add_argument('--runs', type=int, default=50, help='Scenarios per grid point (same seeds at every point)')
+        parser.add_argument('--rooms', type=int, default=40)
+        parser.add_argument('--hours', type=float, default=4.0, help='Simulated hours per scenario')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--policy', choices=sorted(POLICIES), help='Default: Config.SCHEDULING_POLICY')
+        parser.add_argument('--workers', type=int, default=None, help='Processes (default: CPU count)')
+        parser.add_argument('--confidence', type=float, default=0.95)
+        parser.add_argument('--csv', help='Write one row per grid point and metric to this file')
+
+    def handle(self, *args, **options):
+        try:
+            time_slices = _numbers(options['time_slices'], float)
+            max_serving = _numbers(options['max_serving'], int)
+        except ValueError:
+            raise CommandError('--time-slices and --max-serving must be comma separated numbers')
+        if not time_slices or not max_serving or min(time_slices) <= 0 or min(max_serving) < 1:
+            raise CommandError('Time slices must be > 0 and slot counts >= 1')
+        if options['runs'] < 2 or not 0 < options['confidence'] < 1:
+            raise CommandError('--runs must be >= 2 and --confidence between 0 and 1')
+
+        points = len(time_slices) * len(max_serving)
+        self.stdout.write(f"{points} grid points x {options['runs']} runs = {points * options['runs']} simulations "
+                          f"of {options['rooms']} rooms over {options['hours']:g}h")
+
+        def progress(done, total):
+            if options['verbosity'] > 1 and done % max(1, total // 20) == 0:
+                self.stdout.write(f'  {done}/{total}')
+
+        # Workers replay with the settings in effect here (rates, ambient, power), not the shipped defaults
+        overrides = {key: value for key, (value, overridden) in ConfigStore().effective().items() if overridden}
+        started = time.perf_counter()
+        samples = sweep(time_slices, max_serving, options['runs'], rooms=options['rooms'], hours=options['hours'],
+                        seed=options['seed'], policy=options['policy'], workers=options['workers'],
+                        overrides=overrides, progress=progress)
+        elapsed = time.perf_counter() - started
+        # Differences are paired against the settings in effect, or the first grid point
+        baseline = (float(Config.TIME_SLICE), Config.MAX_SERVING_ROOMS)
+        if baseline not in samples:
+            baseline = (time_slices[0], max_serving[0])
+        results = summarize(samples, baseline, options['confidence'])
+
+        pct = f"{options['confidence']:.0%}"
+        self.stdout.write(f"{'slice':>7}{'slots':>6}{'mean wait (s)':>18}{'p95 wait (s)':>18}"
+                          f"{'comfort (°C·min/room·h)':>26}{'energy':>18}{'Δ p95 vs baseline':>22}   (± {pct} CI)")
+        for (ts, ms), m in sorted(results.items()):
+            cells = ''.join(f'{m[metric][0]:>{width - 8}.1f} ±{m[metric][1]:>6.1f}'
+                            for metric, width in zip(METRICS, (18, 18, 26, 18)))
+            delta = 'baseline' if (ts, ms) == baseline else \
+                f"{m['delta']['p95_wait'][0]:+.1f} ±{m['delta']['p95_wait'][1]:>6.1f}"
+            self.stdout.write(f'{ts:>7g}{ms:>6}{cells}{delta:>22}')
+
+        best = min(results, key=lambda point: results[point]['p95_wait'][0])
+        self.stdout.write(self.style.SUCCESS(
+            f'Lowest p95 wait: TIME_SLICE={best[0]:g}, MAX_SERVING_ROOMS={best[1]}. '
+            f'{points * options["runs"]} simulations in {elapsed:.1f}s.'))
+
+        if options['csv']:
+            with open(options['csv'], 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['time_slice', 'max_serving', 'metric', 'mean', 'ci_half_width',
+                                 'delta_vs_baseline', 'delta_ci_half_width', 'runs'])
+                for (ts, ms), m in sorted(results.items()):
+                    for metric in METRICS:
+                        writer.writerow([ts, ms, metric, f'{m[metric][0]:.4f}', f'{m[metric][1]:.4f}',
+                                         f"{m['delta'][metric][0]:.4f}", f"{m['delta'][metric][1]:.4f}",
+                                         options['runs']])
+            self.stdout.write(f"Wrote {options['csv']}")
@@ -0,0 +1,22 @@
+from django.urls import resolve, Resolver404
+from core.services.profiling import Profiler
+
+
+class ProfilingMiddleware:
+    """Profiles a sampled fraction of requests while `manage.py profile start requests` runs."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profiler = Profiler()
+        profiler.poll()
+        if not profiler.profiling('requests'):
+            return self.get_response(request)
+        # Stacks of a request start at its route, so rooms and ids share one tree
+        try:
+            route = resolve(request.path_info).route
+        except Resolver404:
+            route = request.path_info
+        with profiler.section('requests', f'{request.method} /{route}'):
+            return self.get_response(request)
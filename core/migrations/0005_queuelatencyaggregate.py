@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_room_password_room_username'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueueLatencyAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField()),
+                ('period_end', models.DateTimeField()),
+                ('fan_speed', models.CharField(max_length=10)),
+                ('zone', models.CharField(max_length=20)),
+                ('admissions', models.IntegerField(default=0)),
+                ('wait_total', models.FloatField(default=0.0)),
+                ('wait_max', models.FloatField(default=0.0)),
+                ('histogram', models.JSONField(default=list)),
+                ('preemptions', models.IntegerField(default=0)),
+                ('swaps', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_configsetting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBill',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('guest_id', models.CharField(max_length=50)),
+                ('check_in_time', models.DateTimeField(blank=True, null=True)),
+                ('check_out_time', models.DateTimeField()),
+                ('ac_fee', models.FloatField(default=0.0)),
+                ('accommodation_fee', models.FloatField(default=0.0)),
+                ('total_amount', models.FloatField(default=0.0)),
+                ('archive', models.CharField(max_length=7)),
+                ('session_count', models.IntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.room')),
+            ],
+        ),
+    ]
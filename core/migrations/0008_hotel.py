@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_archivedbill'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hotel',
+            fields=[
+                ('code', models.SlugField(max_length=30, primary_key=True, serialize=False)),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('settings', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='queuelatencyaggregate',
+            name='hotel',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.hotel'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='hotel',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='rooms', to='core.hotel'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_hotel'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='acsession',
+            index=models.Index(condition=models.Q(('end_time__isnull', True)), fields=['room'], name='acsession_open'),
+        ),
+        migrations.AddIndex(
+            model_name='acsession',
+            index=models.Index(condition=models.Q(('bill__isnull', True)), fields=['room', 'start_time'], name='acsession_unbilled'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['check_out_time'], name='bill_check_out'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['status', 'hotel'], name='room_status_hotel'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['occupancy_status', 'room_id'], name='room_occupancy'),
+        ),
+    ]
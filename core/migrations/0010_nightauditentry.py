@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NightAuditEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('guest_id', models.CharField(blank=True, max_length=50)),
+                ('check_in_time', models.DateTimeField(blank=True, null=True)),
+                ('nights', models.IntegerField(default=1)),
+                ('accommodation_fee', models.FloatField(default=0.0)),
+                ('ac_fee', models.FloatField(default=0.0)),
+                ('ac_to_date', models.FloatField(default=0.0)),
+                ('session_fee', models.FloatField(default=0.0)),
+                ('difference', models.FloatField(default=0.0)),
+                ('audited_at', models.DateTimeField(auto_now=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.room')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['room', 'check_in_time', 'business_date'], name='night_audit_stay')],
+                'constraints': [models.UniqueConstraint(fields=('business_date', 'room'), name='night_audit_date_room')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_nightauditentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedbill',
+            name='archive_offset',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
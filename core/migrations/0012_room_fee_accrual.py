@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_archivedbill_archive_offset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='fee_rate',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='fee_since',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
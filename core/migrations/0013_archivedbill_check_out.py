@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_room_fee_accrual'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedbill',
+            index=models.Index(fields=['check_out_time'], name='archived_bill_check_out'),
+        ),
+    ]
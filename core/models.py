@@ -1,6 +1,25 @@
 from django.db import models
 from django.utils import timezone
 
+class Hotel(models.Model):
+    # A property hosted by this deployment; rooms without a hotel belong to the
+    # default property of a single-hotel install (see core.services.tenancy)
+    code = models.SlugField(max_length=30, primary_key=True)
+    name = models.CharField(max_length=100, blank=True)
+    settings = models.JSONField(default=dict, blank=True)  # Config overrides, keys in tenancy.HOTEL_KEYS
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from core.services.tenancy import validate_settings
+        try:
+            self.settings = validate_settings(self.settings)
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+    def __str__(self):
+        return self.name or self.code
+
 class Room(models.Model):
     ROOM_TYPES = (
         ('STANDARD', 'Standard Room'),
@@ -8,6 +27,7 @@ class Room(models.Model):
     )
 
     room_id = models.CharField(max_length=10, primary_key=True)
+    hotel = models.ForeignKey(Hotel, on_delete=models.PROTECT, null=True, blank=True, related_name='rooms')
     # Login credentials
     username = models.CharField(max_length=50, unique=True, null=True, blank=True)
     password = models.CharField(max_length=50, default='88888888')
@@ -27,6 +47,9 @@ class Room(models.Model):
     mode = models.CharField(max_length=10, default='COOL') # COOL, HEAT
     fee = models.FloatField(default=0.0)
     total_fee = models.FloatField(default=0.0)
+    # fee is exact at fee_since (epoch seconds) and grows by fee_rate per second from then (see services.fees)
+    fee_rate = models.FloatField(default=0.0)
+    fee_since = models.FloatField(null=True, blank=True)
     status = models.CharField(max_length=10, default='IDLE') # IDLE, SERVING, WAITING
     
     # Scheduler specific
@@ -34,6 +57,14 @@ class Room(models.Model):
     wait_time = models.FloatField(default=0.0)
     wait_timeout = models.FloatField(default=0.0)
 
+    class Meta:
+        indexes = [
+            # Scheduler queues of a hotel (status + hotel) and of all hotels (dashboard, /api/queues/)
+            models.Index(fields=['status', 'hotel'], name='room_status_hotel'),
+            # Check-in / check-out lists and the monitor snapshot, already in room_id order
+            models.Index(fields=['occupancy_status', 'room_id'], name='room_occupancy'),
+        ]
+
     def __str__(self):
         return f"Room {self.room_id}"
 
@@ -46,6 +77,12 @@ class Bill(models.Model):
     accommodation_fee = models.FloatField(default=0.0)
     total_amount = models.FloatField(default=0.0)
 
+    class Meta:
+        indexes = [
+            # Bill history order, export and archive ranges
+            models.Index(fields=['check_out_time'], name='bill_check_out'),
+        ]
+
 class ACSession(models.Model):
     room = models.ForeignKey(Room, on_delete=models.CASCADE)
     bill = models.ForeignKey(Bill, on_delete=models.CASCADE, null=True, blank=True)
@@ -58,8 +95,99 @@ class ACSession(models.Model):
     fee = models.FloatField(default=0.0)
     initial_fee = models.FloatField(default=0.0)
 
+    class Meta:
+        indexes = [
+            # The open session of a room (control changes, checkout); only open rows are indexed
+            models.Index(fields=['room'], condition=models.Q(end_time__isnull=True), name='acsession_open'),
+            # Unbilled sessions of a stay (checkout)
+            models.Index(fields=['room', 'start_time'], condition=models.Q(bill__isnull=True), name='acsession_unbilled'),
+        ]
+
     def duration(self):
         if self.end_time:
             return (self.end_time - self.start_time).total_seconds()
         return 0
 
+
+class QueueLatencyAggregate(models.Model):
+    # Scheduler queueing metrics for one period, per hotel, fan speed and zone
+    hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, null=True, blank=True)
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    fan_speed = models.CharField(max_length=10)
+    zone = models.CharField(max_length=20)
+    admissions = models.IntegerField(default=0)
+    wait_total = models.FloatField(default=0.0)
+    wait_max = models.FloatField(default=0.0)
+    histogram = models.JSONField(default=list) # Counts per core.services.metrics.WAIT_BUCKETS
+    preemptions = models.IntegerField(default=0)
+    swaps = models.IntegerField(default=0)
+
+
+class ConfigSetting(models.Model):
+    # Runtime override of a Config attribute (see core.services.config_store)
+    key = models.CharField(max_length=50, unique=True)
+    value = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from core.services.config import Config
+        from core.services.config_store import validate, check_power_floors, POWER_KEYS
+        try:
+            self.value = validate(self.key, self.value)
+            if self.key in POWER_KEYS:
+                check_power_floors({**{k: getattr(Config, k) for k in POWER_KEYS}, self.key: self.value})
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+class ArchivedBill(models.Model):
+    # Summary of a bill moved out of the hot tables; its AC sessions are in the
+    # compressed monthly archive named by `archive` (see core.services.archive)
+    id = models.BigIntegerField(primary_key=True)  # Original Bill.id, so links keep working
+    room = models.ForeignKey(Room, on_delete=models.CASCADE)
+    guest_id = models.CharField(max_length=50)
+    check_in_time = models.DateTimeField(null=True, blank=True)
+    check_out_time = models.DateTimeField()
+    ac_fee = models.FloatField(default=0.0)
+    accommodation_fee = models.FloatField(default=0.0)
+    total_amount = models.FloatField(default=0.0)
+    archive = models.CharField(max_length=7)  # YYYY-MM
+    # Byte offset of the gzip member holding the bill in the archive file (None: archived before offsets were kept)
+    archive_offset = models.BigIntegerField(null=True, blank=True)
+    session_count = models.IntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Bill history pages, newest first (merged with Bill's bill_check_out)
+            models.Index(fields=['check_out_time'], name='archived_bill_check_out'),
+        ]
+
+
+class NightAuditEntry(models.Model):
+    # One occupied room on one business date, posted by the night audit (see core.services.night_audit)
+    business_date = models.DateField()
+    room = models.ForeignKey(Room, on_delete=models.CASCADE)
+    guest_id = models.CharField(max_length=50, blank=True)
+    check_in_time = models.DateTimeField(null=True, blank=True)
+    nights = models.IntegerField(default=1)  # Nights charged so far by the checkout rule
+    accommodation_fee = models.FloatField(default=0.0)  # The night's room rate
+    ac_fee = models.FloatField(default=0.0)  # AC accrued since the previous audit of this stay
+    ac_to_date = models.FloatField(default=0.0)  # Room.fee at the audit
+    session_fee = models.FloatField(default=0.0)  # AC fee of the stay according to its sessions
+    difference = models.FloatField(default=0.0)  # ac_to_date - session_fee
+    audited_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['business_date', 'room'], name='night_audit_date_room'),
+        ]
+        indexes = [
+            # Previous audit of a stay
+            models.Index(fields=['room', 'check_in_time', 'business_date'], name='night_audit_stay'),
+        ]
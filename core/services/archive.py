@@ -0,0 +1,189 @@
+"""
+Archival of settled billing records.
+Bills checked out before a retention cutoff, together with their AC sessions,
+are appended to a gzip-compressed monthly JSON-lines file and removed from the
+hot Bill/ACSession tables. A small ArchivedBill summary row keeps the bill
+listable; its sessions are read back from the archive file on demand.
+Sessions that never got a bill stay in the hot table: nothing could reach
+them in an archive (older files may still hold such lines, with bill null).
+
+Each archive line is {"bill": {...} | null, "sessions": [{...}, ...]}.
+Every batch is appended as its own gzip member, and ArchivedBill keeps the
+byte offset of the member holding the bill, so showing one archived bill
+decompresses one batch rather than the whole month.
+Files are written before the rows are deleted, so a crash in between only
+leaves duplicate lines, which readers skip.
+"""
+import datetime
+import gzip
+import json
+import os
+import time
+import zlib
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from core.models import Bill, ACSession, ArchivedBill
+
+BILL_FIELDS = ('id', 'room_id', 'guest_id', 'check_in_time', 'check_out_time', 'ac_fee', 'accommodation_fee', 'total_amount')
+SESSION_FIELDS = ('id', 'room_id', 'bill_id', 'start_time', 'end_time', 'mode', 'fan_speed',
+                  'start_temp', 'target_temp', 'fee', 'initial_fee')
+DATETIME_FIELDS = ('check_in_time', 'check_out_time', 'start_time', 'end_time')
+DEFAULT_BATCH_SIZE = 500
+
+
+def archive_dir():
+    return str(getattr(settings, 'ARCHIVE_DIR', None) or os.path.join(settings.BASE_DIR, 'archive'))
+
+
+def archive_path(month, directory=None):
+    return os.path.join(directory or archive_dir(), f'billing-{month}.jsonl.gz')
+
+
+def archive_months(directory=None):
+    """Months (YYYY-MM) that have an archive file, ascending."""
+    directory = directory or archive_dir()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[len('billing-'):-len('.jsonl.gz')] for name in os.listdir(directory)
+                  if name.startswith('billing-') and name.endswith('.jsonl.gz'))
+
+
+def month_of(dt):
+    return timezone.localtime(dt).strftime('%Y-%m')
+
+
+def _encode(row):
+    return {k: (v.isoformat() if isinstance(v, datetime.datetime) else v) for k, v in row.items()}
+
+
+def _decode(row):
+    row = dict(row)
+    for field in DATETIME_FIELDS:
+        if row.get(field):
+            row[field] = parse_datetime(row[field])
+    return row
+
+
+def _append(path, lines):
+    """Append the lines as one gzip member (gzip readers concatenate members); returns its byte offset."""
+    with open(path, 'ab') as raw:
+        offset = raw.seek(0, os.SEEK_END)
+        with gzip.GzipFile(fileobj=raw, mode='ab') as gz:
+            for line in lines:
+                gz.write((json.dumps(line, separators=(',', ':')) + '\n').encode('utf-8'))
+        raw.flush()
+        os.fsync(raw.fileno())
+    return offset
+
+
+def _write_groups(groups, directory):
+    """groups: {month: [archive lines]}. Returns {month: offset of the member written}."""
+    return {month: _append(archive_path(month, directory), lines) for month, lines in groups.items()}
+
+
+def _read_member(path, offset):
+    """Decoded lines of the single gzip member starting at `offset`."""
+    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    chunks = []
+    with open(path, 'rb') as raw:
+        raw.seek(offset)
+        while not decompressor.eof:
+            data = raw.read(64 * 1024)
+            if not data:
+                break
+            chunks.append(decompressor.decompress(data))
+    return [json.loads(line) for line in b''.join(chunks).decode('utf-8').splitlines() if line]
+
+
+def archive_settled(before, batch_size=DEFAULT_BATCH_SIZE, directory=None, dry_run=False, progress=None):
+    """
+    Archive bills checked out before `before` with their sessions (dry_run:
+    only count them). Returns {'bills', 'sessions', 'elapsed'}.
+    """
+    directory = directory or archive_dir()
+    if not dry_run:
+        os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+    bills_done = sessions_done = 0
+    settled = Bill.objects.filter(check_out_time__lt=before).order_by('id')
+    last = 0
+    while True:
+        # Keyset pages: a dry run walks every batch without deleting what it read
+        bills = list(settled.filter(id__gt=last).values(*BILL_FIELDS)[:batch_size])
+        if not bills:
+            break
+        ids = [b['id'] for b in bills]
+        last = ids[-1]
+        if dry_run:
+            bills_done += len(bills)
+            sessions_done += ACSession.objects.filter(bill_id__in=ids).count()
+            continue
+        sessions = {}
+        for s in ACSession.objects.filter(bill_id__in=ids).order_by('start_time').values(*SESSION_FIELDS):
+            sessions.setdefault(s['bill_id'], []).append(s)
+
+        groups = {}
+        for b in bills:
+            groups.setdefault(month_of(b['check_out_time']), []).append(
+                {'bill': _encode(b), 'sessions': [_encode(s) for s in sessions.get(b['id'], [])]})
+        offsets = _write_groups(groups, directory)
+
+        with transaction.atomic():
+            ArchivedBill.objects.bulk_create([
+                ArchivedBill(
+                    archive=month_of(b['check_out_time']), archive_offset=offsets[month_of(b['check_out_time'])],
+                    session_count=len(sessions.get(b['id'], [])), **{k: b[k] for k in BILL_FIELDS}
+                ) for b in bills
+            ], ignore_conflicts=True)
+            ACSession.objects.filter(bill_id__in=ids).delete()
+            Bill.objects.filter(id__in=ids).delete()
+        bills_done += len(bills)
+        sessions_done += sum(len(v) for v in sessions.values())
+        if progress:
+            progress(bills_done, sessions_done)
+
+    return {'bills': bills_done, 'sessions': sessions_done, 'elapsed': time.perf_counter() - started}
+
+
+def iter_archive(month, directory=None):
+    """Yield decoded archive lines of one month, skipping duplicates from interrupted runs."""
+    path = archive_path(month, directory)
+    if not os.path.exists(path):
+        return
+    seen_bills, seen_sessions = set(), set()
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            bill = record['bill']
+            if bill:
+                if bill['id'] in seen_bills:
+                    continue
+                seen_bills.add(bill['id'])
+            else:
+                sid = record['sessions'][0]['id'] if record['sessions'] else None
+                if sid in seen_sessions:
+                    continue
+                seen_sessions.add(sid)
+            yield {
+                'bill': _decode(bill) if bill else None,
+                'sessions': [_decode(s) for s in record['sessions']],
+            }
+
+
+def archived_sessions(archived_bill, directory=None):
+    """AC sessions of an ArchivedBill, as dicts with the ACSession field names."""
+    if archived_bill.archive_offset is not None:
+        path = archive_path(archived_bill.archive, directory)
+        if not os.path.exists(path):
+            return []
+        for record in _read_member(path, archived_bill.archive_offset):
+            if record['bill'] and record['bill']['id'] == archived_bill.id:
+                return [_decode(s) for s in record['sessions']]
+        return []
+    # Archived before offsets were kept: scan the month
+    for record in iter_archive(archived_bill.archive, directory):
+        if record['bill'] and record['bill']['id'] == archived_bill.id:
+            return record['sessions']
+    return []
@@ -35,10 +35,86 @@ class Config:
     # Scheduler Configuration
     TIME_SLICE = 120  # Time slice duration in seconds (2 minutes)
     SCHEDULER_TICK = 1 # Scheduler loop interval
+    SCHEDULER_MAX_BATCH = 500  # Most commands handled in one scheduling pass
+    SCHEDULER_REPLY_TIMEOUT = 5.0  # Seconds the simulation waits for a scheduler decision
     MAX_SERVING_ROOMS = 3
+    # Power budget (kW) of the central unit. None = fixed MAX_SERVING_ROOMS slots;
+    # otherwise rooms are admitted while the FAN_POWER of serving rooms fits the budget.
+    POWER_BUDGET = None
+    FAN_POWER = {
+        'HIGH': 1.5,
+        'MID': 1.0,
+        'LOW': 0.7
+    }
+    # Optional time-of-day budgets, e.g. [('08:00', 6.0), ('14:00', 4.0), ('22:00', 3.0)].
+    # Each entry applies from its start until the next one; overrides POWER_BUDGET.
+    POWER_SCHEDULE = []
+    # Queueing metrics are persisted as QueueLatencyAggregate rows this often (seconds)
+    METRICS_FLUSH_INTERVAL = 300
+    # Dispatch policy (see core.services.policies.POLICIES)
+    SCHEDULING_POLICY = 'priority_time_slice'
+    # aged_priority: a waiter gains one priority level per AGING_SECONDS waited
+    AGING_SECONDS = 120
+    # Scheduler journal: records appended between snapshots (see settings.SCHEDULER_JOURNAL_DIR)
+    JOURNAL_SNAPSHOT_EVERY = 1000
+
+    # Guest panel: control changes of a room are merged until it has been quiet
+    # this long (seconds), and applied at most CONTROL_COALESCE_MAX_DELAY after
+    # the first one. 0 = apply every request at once.
+    CONTROL_COALESCE_WINDOW = 0.8
+    CONTROL_COALESCE_MAX_DELAY = 3.0
+
+    # Rate limits of the write APIs, by URL name: {scope: [tokens per second, burst]}
+    # per room (room_id in the URL) and per client address. Requests beyond them get
+    # 429 + Retry-After. Endpoints not listed are not limited. Panels behind a NAT or
+    # proxy share one address, so the control API is limited per room only; add a
+    # 'client' scope there only where every panel has its own address.
+    RATE_LIMITS = {
+        'api_control_room': {'room': [2.0, 10]},
+        'api_checkin': {'client': [5.0, 20]},
+        'api_checkout': {'client': [5.0, 20]},
+        'api_group_checkin': {'client': [1.0, 5]},
+        'api_group_checkout': {'client': [1.0, 5]},
+    }
+
+    # Profiling (manage.py profile): seconds between stack samples of a profiled thread
+    PROFILE_SAMPLE_INTERVAL = 0.005
+
+    # Simulation: how often rooms whose temperature is moving are written back
+    # to the DB for display. State transitions are event-driven and not affected.
+    SIM_FLUSH_INTERVAL = 5
+
+    # Bill history page: bills per page (newest first)
+    BILL_HISTORY_PAGE_SIZE = 50
+
+    # Monitor API snapshot: rebuilt on request if the simulation has not published one for this long (seconds)
+    MONITOR_SNAPSHOT_MAX_AGE = 2.0
+
+    # Temperature history: one sample per room every HISTORY_INTERVAL seconds,
+    # HISTORY_CAPACITY samples in memory, older blocks of HISTORY_SPILL_BLOCK
+    # samples spilled to settings.HISTORY_DIR and kept for HISTORY_RETENTION_HOURS.
+    HISTORY_INTERVAL = 10
+    HISTORY_CAPACITY = 360
+    HISTORY_SPILL_BLOCK = 180
+    HISTORY_RETENTION_HOURS = 24 * 7
+    HISTORY_MAX_BUCKETS = 5000  # Per /api/room/<id>/history/ request
+
+    # Partitioned simulation (multi-core hosts). 0 or 1 worker = single-threaded engine.
+    SIM_WORKERS = 0
+    SIM_PARTITION_BY = 'floor'  # 'floor' or 'zone'
+    SIM_PARTITION_SIZE = 500    # Max rooms per partition
+    SIM_FLOORS_PER_ZONE = 5
+    SIM_REPORT_INTERVAL = 60    # Ticks between per-partition timing reports (0 = off)
 
     # Ambient Temperature
     AMBIENT_TEMP = 20.0
+
+    # Coupled thermal model: fraction of the temperature difference to each
+    # neighbouring room (same floor, adjacent number) exchanged per minute.
+    # 0 = rooms are isolated. A room's slope is only rebuilt when its exchange
+    # changed by more than HEAT_EXCHANGE_TOLERANCE (degrees per minute).
+    HEAT_TRANSFER_COEFF = 0.0
+    HEAT_EXCHANGE_TOLERANCE = 0.01
     
     # Fan Speed Priority (Higher is better)
     SPEED_PRIORITY = {
@@ -0,0 +1,327 @@
+"""
+Hot-reloadable overrides of Config attributes.
+Overrides live in the ConfigSetting table, or in a JSON file when
+settings.CONFIG_FILE is set. ConfigStore().refresh() is called once per
+scheduler/simulation tick: it checks a cheap version stamp of the backend and,
+when it changed, validates the overrides, applies them to Config and notifies
+subscribers with the changed keys.
+"""
+import copy
+import json
+import os
+import threading
+import time
+from core.services.config import Config
+
+SPEEDS = ('HIGH', 'MID', 'LOW')
+
+
+def _number(minimum=None, positive=False):
+    def check(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError("must be a number")
+        if positive and value <= 0:
+            raise ValueError("must be positive")
+        if minimum is not None and value < minimum:
+            raise ValueError(f"must be >= {minimum}")
+        return float(value)
+    return check
+
+
+def _integer(minimum=None):
+    def check(value):
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError("must be an integer")
+        if minimum is not None and value < minimum:
+            raise ValueError(f"must be >= {minimum}")
+        return value
+    return check
+
+
+def _optional(check):
+    def wrapped(value):
+        return None if value is None else check(value)
+    return wrapped
+
+
+def _choice(*choices):
+    def check(value):
+        if value not in choices:
+            raise ValueError(f"must be one of {', '.join(choices)}")
+        return value
+    return check
+
+
+def _per_speed(check):
+    def wrapped(value):
+        if not isinstance(value, dict) or set(value) != set(SPEEDS):
+            raise ValueError(f"must map each of {', '.join(SPEEDS)} to a value")
+        return {speed: check(value[speed]) for speed in SPEEDS}
+    return wrapped
+
+
+def _policy(value):
+    from core.services.policies import POLICIES
+    if value not in POLICIES:
+        raise ValueError(f"must be one of {', '.join(sorted(POLICIES))}")
+    return value
+
+
+def _schedule(value):
+    from core.services.power import parse_time_of_day
+    if not isinstance(value, list):
+        raise ValueError("must be a list of [\"HH:MM\", budget] entries")
+    entries = []
+    for entry in value:
+        if not isinstance(entry, (list, tuple)) or len(entry) != 2 or not isinstance(entry[0], str):
+            raise ValueError("must be a list of [\"HH:MM\", budget] entries")
+        parse_time_of_day(entry[0])
+        entries.append((entry[0], _optional(_number(positive=True))(entry[1])))
+    return entries
+
+
+def _rate_limits(value):
+    from core.services.rate_limit import SCOPES
+    if not isinstance(value, dict):
+        raise ValueError("must map endpoint names to {scope: [tokens per second, burst]}")
+    limits = {}
+    for endpoint, scopes in value.items():
+        if not isinstance(scopes, dict) or not set(scopes) <= set(SCOPES):
+            raise ValueError(f"{endpoint}: scopes must be among {', '.join(SCOPES)}")
+        limits[endpoint] = {}
+        for scope, limit in scopes.items():
+            if not isinstance(limit, (list, tuple)) or len(limit) != 2:
+                raise ValueError(f"{endpoint}.{scope}: must be [tokens per second, burst]")
+            limits[endpoint][scope] = [_number(positive=True)(limit[0]), _number(minimum=1)(limit[1])]
+    return limits
+
+
+# Attributes that can be changed at runtime. Others (workers, journal, ...) need a restart.
+SCHEMA = {
+    'DEFAULT_TARGET_TEMP': _number(),
+    'DEFAULT_FAN_SPEED': _choice(*SPEEDS),
+    'MIN_TEMP_COOL': _number(),
+    'MAX_TEMP_COOL': _number(),
+    'MIN_TEMP_HEAT': _number(),
+    'MAX_TEMP_HEAT': _number(),
+    'FEE_RATE': _per_speed(_number(minimum=0)),
+    'TEMP_CHANGE_RATE': _per_speed(_number(positive=True)),
+    'TIME_SLICE': _number(positive=True),
+    'SCHEDULER_TICK': _number(positive=True),
+    'MAX_SERVING_ROOMS': _integer(minimum=1),
+    'POWER_BUDGET': _optional(_number(positive=True)),
+    'FAN_POWER': _per_speed(_number(positive=True)),
+    'POWER_SCHEDULE': _schedule,
+    'METRICS_FLUSH_INTERVAL': _number(positive=True),
+    'SCHEDULING_POLICY': _policy,
+    'AGING_SECONDS': _number(positive=True),
+    'CONTROL_COALESCE_WINDOW': _number(minimum=0),
+    'CONTROL_COALESCE_MAX_DELAY': _number(minimum=0),
+    'RATE_LIMITS': _rate_limits,
+    'PROFILE_SAMPLE_INTERVAL': _number(positive=True),
+    'SIM_FLUSH_INTERVAL': _number(minimum=0),
+    'MONITOR_SNAPSHOT_MAX_AGE': _number(minimum=0),
+    'SIM_REPORT_INTERVAL': _integer(minimum=0),
+    'AMBIENT_TEMP': _number(),
+    'HEAT_TRANSFER_COEFF': _number(minimum=0),
+    'HEAT_EXCHANGE_TOLERANCE': _number(positive=True),
+    'SPEED_PRIORITY': _per_speed(_integer()),
+}
+
+# Keys that change room trajectories (the simulation rebuilds its segments)
+THERMAL_KEYS = ('FEE_RATE', 'TEMP_CHANGE_RATE', 'AMBIENT_TEMP', 'HEAT_TRANSFER_COEFF', 'HEAT_EXCHANGE_TOLERANCE')
+
+# Values of Config as shipped, restored when an override is removed
+DEFAULTS = {key: copy.deepcopy(getattr(Config, key)) for key in SCHEMA}
+
+
+def validate(key, value):
+    """Return the value coerced to the attribute's type, or raise ValueError."""
+    if key not in SCHEMA:
+        raise ValueError(f"Unknown or non-reloadable config key: {key}")
+    try:
+        return SCHEMA[key](value)
+    except ValueError as e:
+        raise ValueError(f"{key} {e}")
+
+
+def check_power_floor(key, value, fan_power=None):
+    """
+    Refuse POWER_BUDGET / POWER_SCHEDULE budgets a room at the largest fan
+    power (of `fan_power`, default Config.FAN_POWER) could never fit in: it
+    would wait forever with nobody served.
+    """
+    if key == 'POWER_BUDGET':
+        budgets = [value]
+    elif key == 'POWER_SCHEDULE':
+        budgets = [budget for _, budget in value]
+    else:
+        return
+    floor = max((fan_power or Config.FAN_POWER).values())
+    if any(budget is not None and budget < floor for budget in budgets):
+        raise ValueError(f"{key} budgets must be at least the largest FAN_POWER ({floor:g})")
+
+
+POWER_KEYS = ('FAN_POWER', 'POWER_BUDGET', 'POWER_SCHEDULE')
+
+
+def check_power_floors(values):
+    """check_power_floor over a full {key: value} mapping of POWER_KEYS."""
+    for key in ('POWER_BUDGET', 'POWER_SCHEDULE'):
+        check_power_floor(key, values[key], values['FAN_POWER'])
+
+
+class DatabaseBackend:
+    def version(self):
+        from django.db.models import Count, Max
+        from core.models import ConfigSetting
+        stamp = ConfigSetting.objects.aggregate(n=Count('id'), last=Max('updated_at'))
+        return stamp['n'], stamp['last']
+
+    def load(self):
+        from core.models import ConfigSetting
+        return dict(ConfigSetting.objects.values_list('key', 'value'))
+
+    def set(self, key, value):
+        from core.models import ConfigSetting
+        ConfigSetting.objects.update_or_create(key=key, defaults={'value': value})
+
+    def delete(self, key):
+        from core.models import ConfigSetting
+        ConfigSetting.objects.filter(key=key).delete()
+
+
+class FileBackend:
+    def __init__(self, path):
+        self.path = str(path)
+
+    def version(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        if not isinstance(data, dict):
+            raise ValueError(f"{self.path} must hold a JSON object")
+        return data
+
+    def _write(self, data):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def set(self, key, value):
+        data = self.load()
+        data[key] = value
+        self._write(data)
+
+    def delete(self, key):
+        data = self.load()
+        if data.pop(key, None) is not None:
+            self._write(data)
+
+
+class ConfigStore:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(ConfigStore, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        from django.conf import settings
+        config_file = getattr(settings, 'CONFIG_FILE', None)
+        self.backend = FileBackend(config_file) if config_file else DatabaseBackend()
+        self.version = object()  # Never equal to a backend version: the first refresh loads
+        self.last_check = 0.0
+        self.overrides = {}      # key -> validated value currently applied
+        self.subscribers = []
+        self._refresh_lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """callback(changed) is called with {key: new value} after every change."""
+        self.subscribers.append(callback)
+
+    def refresh(self, force=False):
+        """Re-read the backend if its version changed; at most once per scheduler tick."""
+        with self._refresh_lock:
+            now = time.monotonic()
+            if not force and now - self.last_check < Config.SCHEDULER_TICK:
+                return {}
+            self.last_check = now
+            try:
+                version = self.backend.version()
+                if version == self.version:
+                    return {}
+                raw = self.backend.load()
+            except Exception as e:
+                print(f"[Config] Error reading overrides: {e}")
+                return {}
+            self.version = version
+
+            overrides = {}
+            for key, value in raw.items():
+                try:
+                    overrides[key] = validate(key, value)
+                except ValueError as e:
+                    print(f"[Config] Ignoring override: {e}")
+                    if key in self.overrides:
+                        overrides[key] = self.overrides[key]
+
+            # A FAN_POWER raised above an existing budget is as bad as a budget
+            # set below FAN_POWER: keep the last consistent power settings.
+            try:
+                check_power_floors({key: overrides.get(key, DEFAULTS[key]) for key in POWER_KEYS})
+            except ValueError as e:
+                print(f"[Config] Ignoring override: {e}")
+                for key in POWER_KEYS:
+                    overrides.pop(key, None)
+                    if key in self.overrides:
+                        overrides[key] = self.overrides[key]
+
+            changed = {}
+            for key in SCHEMA:
+                value = overrides.get(key, DEFAULTS[key])
+                if getattr(Config, key) != value:
+                    setattr(Config, key, copy.deepcopy(value))
+                    changed[key] = value
+            self.overrides = overrides
+
+        if changed:
+            print(f"[Config] Applied: {', '.join(sorted(changed))}")
+            for callback in list(self.subscribers):
+                callback(changed)
+        return changed
+
+    def set(self, key, value):
+        value = validate(key, value)
+        if key in POWER_KEYS:
+            check_power_floors({**{k: getattr(Config, k) for k in POWER_KEYS}, key: value})
+        self.backend.set(key, value)
+        return self.refresh(force=True)
+
+    def unset(self, key):
+        if key not in SCHEMA:
+            raise ValueError(f"Unknown or non-reloadable config key: {key}")
+        self.backend.delete(key)
+        return self.refresh(force=True)
+
+    def effective(self):
+        """{key: (value, overridden)} for every reloadable key."""
+        return {key: (getattr(Config, key), key in self.overrides) for key in SCHEMA}
@@ -0,0 +1,212 @@
+"""
+Guest panel control changes (POST /api/control/<room_id>/).
+Every click on the panel's +/- or fan buttons is its own request, and each
+applied change of a room that is on closes one ACSession, opens another and
+may re-queue the room in the scheduler. ControlCoalescer holds the changes of
+a room until it has been quiet for Config.CONTROL_COALESCE_WINDOW seconds (at
+most CONTROL_COALESCE_MAX_DELAY after the first change of the burst) and then
+applies their net effect once. Power on/off is applied at once, together with
+anything still pending, so the AC never waits to start or stop.
+"""
+import threading
+import time
+from core.services.config import Config
+
+SETTINGS = ('mode', 'fan_speed', 'target_temp')
+MODES = ('COOL', 'HEAT')
+FAN_SPEEDS = ('LOW', 'MID', 'HIGH')
+
+
+def parse_changes(data, mode=None):
+    """
+    The control fields of a request body, checked before they are queued
+    (ValueError otherwise): coalesced changes are applied after the response.
+    target_temp must lie in the range of the request's mode, else of `mode`.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Body must be a JSON object")
+    changes = {}
+    if 'is_on' in data:
+        if not isinstance(data['is_on'], bool):
+            raise ValueError("is_on must be true or false")
+        changes['is_on'] = data['is_on']
+    if 'mode' in data:
+        if data['mode'] not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        changes['mode'] = data['mode']
+    if 'fan_speed' in data:
+        if data['fan_speed'] not in FAN_SPEEDS:
+            raise ValueError(f"fan_speed must be one of {', '.join(FAN_SPEEDS)}")
+        changes['fan_speed'] = data['fan_speed']
+    if 'target_temp' in data:
+        value = data['target_temp']
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError("target_temp must be a number")
+        mode = changes.get('mode', mode)
+        if mode == 'HEAT':
+            low, high = Config.MIN_TEMP_HEAT, Config.MAX_TEMP_HEAT
+        elif mode == 'COOL':
+            low, high = Config.MIN_TEMP_COOL, Config.MAX_TEMP_COOL
+        else:
+            low, high = min(Config.MIN_TEMP_COOL, Config.MIN_TEMP_HEAT), max(Config.MAX_TEMP_COOL, Config.MAX_TEMP_HEAT)
+        if not low <= value <= high:
+            raise ValueError(f"target_temp must be between {low:g} and {high:g}")
+        changes['target_temp'] = float(value)
+    return changes
+
+
+def _close_session(room):
+    from core.models import ACSession
+    from django.utils import timezone
+    session = ACSession.objects.filter(room=room, end_time__isnull=True).last()
+    if session:
+        session.end_time = timezone.now()
+        session.fee = room.fee - session.initial_fee
+        session.save()
+
+
+def _open_session(room):
+    from core.models import ACSession
+    ACSession.objects.create(
+        room=room,
+        mode=room.mode,
+        fan_speed=room.fan_speed,
+        start_temp=room.current_temp,
+        target_temp=room.target_temp,
+        initial_fee=room.fee
+    )
+
+
+def apply_control(room_id, changes):
+    """Apply control changes to a room: AC sessions, room row and scheduler request."""
+    from core.models import Room
+    from core.services.fees import settle_fees
+    from core.services.scheduler import Scheduler
+    # Sessions are closed with the fee accrued up to now, not as the simulation last wrote it
+    rows = Room.objects.filter(room_id=room_id)
+    settle_fees(rows, stop=changes.get('is_on') is False)
+    room = rows.get()
+    # Values the room already has change nothing (e.g. a burst of +1/-1 clicks)
+    changes = {field: value for field, value in changes.items() if getattr(room, field) != value}
+    if not changes:
+        return False
+    scheduler = Scheduler.for_hotel(room.hotel_id)
+
+    # A room that was on ends its session, one that is on now starts one with the new settings
+    was_on = room.is_on
+    if was_on:
+        _close_session(room)
+    if 'is_on' in changes:
+        room.is_on = changes['is_on']
+    for field in SETTINGS:
+        if field in changes:
+            setattr(room, field, changes[field])
+    if room.is_on:
+        _open_session(room)
+    # Only the control fields: fee, temperature, status and timers belong to the
+    # simulation and scheduler, which may have written them since the read above
+    room.save(update_fields=list(changes))
+
+    if was_on and not room.is_on:
+        scheduler.stop_service(room_id)
+    # Requirement C: Adjusting fan speed counts as new request, adjusting temp does not.
+    if changes.get('is_on') or (room.is_on and 'fan_speed' in changes):
+        scheduler.request_service(room_id, room.fan_speed)
+    return True
+
+
+class ControlCoalescer:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(ControlCoalescer, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.thread = None
+        self.pending = {}  # room_id -> [merged changes, first change at, last change at] (monotonic)
+        self._cond = threading.Condition()
+        self._room_locks = {}  # room_id -> Lock keeping the changes of that room in arrival order
+        self.received = 0  # Control requests
+        self.applied = 0   # Net changes written
+
+    def submit(self, room_id, changes):
+        """Queue the changes of a room; returns True if they were applied before returning."""
+        if not Config.CONTROL_COALESCE_WINDOW or 'is_on' in changes:
+            with self._cond:
+                self.received += 1
+            self._apply(room_id, changes)
+            return True
+        now = time.monotonic()
+        with self._cond:
+            self.received += 1
+            entry = self.pending.get(room_id)
+            if entry:
+                entry[0].update(changes)
+                entry[2] = now
+            else:
+                self.pending[room_id] = [dict(changes), now, now]
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run_loop, daemon=True)
+                self.thread.start()
+            self._cond.notify()
+        return False
+
+    def pending_changes(self, room_id):
+        """Changes of a room not applied yet, for showing the panel what it asked for."""
+        with self._cond:
+            entry = self.pending.get(room_id)
+            return dict(entry[0]) if entry else {}
+
+    def flush(self, room_id):
+        """Apply the pending changes of a room now (e.g. before checkout)."""
+        self._apply(room_id, {})
+
+    def stats(self):
+        with self._cond:
+            return {'received': self.received, 'applied': self.applied, 'pending': len(self.pending)}
+
+    def _room_lock(self, room_id):
+        with self._cond:
+            lock = self._room_locks.get(room_id)
+            if lock is None:
+                lock = self._room_locks[room_id] = threading.Lock()
+            return lock
+
+    def _apply(self, room_id, changes):
+        with self._room_lock(room_id):
+            with self._cond:
+                entry = self.pending.pop(room_id, None)
+            if entry:
+                entry[0].update(changes)
+                changes = entry[0]
+            if changes and apply_control(room_id, changes):
+                with self._cond:
+                    self.applied += 1
+
+    def _due(self, entry):
+        return min(entry[2] + Config.CONTROL_COALESCE_WINDOW, entry[1] + Config.CONTROL_COALESCE_MAX_DELAY)
+
+    def _run_loop(self):
+        while True:
+            with self._cond:
+                while not self.pending:
+                    self._cond.wait()
+                now = time.monotonic()
+                due = [rid for rid, entry in self.pending.items() if self._due(entry) <= now]
+                if not due:
+                    self._cond.wait(min(self._due(entry) for entry in self.pending.values()) - now)
+                    continue
+            for rid in due:
+                try:
+                    self._apply(rid, {})
+                except Exception as e:
+                    print(f"[Control] Error applying changes of room {rid}: {e}")
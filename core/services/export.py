@@ -0,0 +1,147 @@
+"""
+Streaming export of bills and AC sessions as CSV or NDJSON, optionally gzipped.
+Rows are read in keyset chunks (id > last id, CHUNK_SIZE at a time), so memory
+stays flat and no read transaction stays open between chunks (a long-lived
+cursor on SQLite would hold off the simulation's writes). Rows are ordered by
+id, so an interrupted export resumes with after=<id of the last complete row>.
+
+Bills moved out of the hot table by archive_records keep their id in
+ArchivedBill and are merged in, so a bills export covers the full history.
+Archived AC sessions exist only in the monthly archive files: a sessions
+export whose range may reach them is refused (ArchivedRangeError) unless
+hot_only is set, rather than silently leaving them out.
+"""
+import csv
+import datetime
+import heapq
+import io
+import json
+import zlib
+from core.models import Bill, ACSession, ArchivedBill
+from core.services import archive
+
+CHUNK_SIZE = 2000
+
+EXPORTS = {
+    # kind: (models merged by id, fields, time field used by since/until)
+    'bills': ((Bill, ArchivedBill), ('id', 'room_id', 'guest_id', 'check_in_time', 'check_out_time',
+                                     'ac_fee', 'accommodation_fee', 'total_amount'), 'check_out_time'),
+    'sessions': ((ACSession,), ('id', 'room_id', 'bill_id', 'start_time', 'end_time', 'mode', 'fan_speed',
+                                'start_temp', 'target_temp', 'fee', 'initial_fee'), 'start_time'),
+}
+FORMATS = ('csv', 'ndjson')
+
+
+class ArchivedRangeError(ValueError):
+    """The requested range may include rows that only exist in archive files."""
+
+
+def archived_months(kind, since=None):
+    """Archive months that may hold `kind` rows the hot tables no longer have in the range."""
+    if kind != 'sessions':
+        return []
+    # A session is archived in the month its bill was checked out, which is not before it started
+    start = archive.month_of(since) if since else ''
+    return [month for month in archive.archive_months() if month >= start]
+
+
+def _iter_model(model, fields, time_field, after, since, until, chunk_size):
+    qs = model.objects.all()
+    if since:
+        qs = qs.filter(**{f'{time_field}__gte': since})
+    if until:
+        qs = qs.filter(**{f'{time_field}__lt': until})
+    last = after or 0
+    while True:
+        chunk = list(qs.filter(id__gt=last).order_by('id').values_list(*fields)[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last = chunk[-1][0]
+
+
+def iter_rows(kind, after=0, since=None, until=None, chunk_size=CHUNK_SIZE):
+    """Yield value tuples of `kind` ordered by id, starting after id `after`."""
+    models, fields, time_field = EXPORTS[kind]
+    rows = heapq.merge(*[_iter_model(model, fields, time_field, after, since, until, chunk_size)
+                         for model in models], key=lambda row: row[0])
+    last = None
+    for row in rows:
+        # A bill archived while the export runs can be read from both tables
+        if row[0] != last:
+            last = row[0]
+            yield row
+
+
+def _value(v):
+    return v.isoformat() if isinstance(v, datetime.datetime) else v
+
+
+def encode_csv(rows, fields, header=True, rows_per_chunk=500):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(fields)
+    n = 0
+    for row in rows:
+        writer.writerow([_value(v) for v in row])
+        n += 1
+        if n % rows_per_chunk == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def encode_ndjson(rows, fields, rows_per_chunk=500):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({f: _value(v) for f, v in zip(fields, row)}, ensure_ascii=False))
+        if len(lines) >= rows_per_chunk:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(kind, fmt='csv', compress=False, after=0, since=None, until=None, on_row=None, hot_only=False):
+    """
+    Bytes chunks of the export. on_row(row) is called for every row (e.g. to track the last id).
+    Raises ArchivedRangeError if archived rows may be missing, unless hot_only.
+    """
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export: {kind}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    months = [] if hot_only else archived_months(kind, since)
+    if months:
+        raise ArchivedRangeError(
+            f"AC sessions of {', '.join(months)} were archived and are not in the database; export the rest with "
+            f"hot_only (--hot-only) and take the archived ones from {archive.archive_dir()}")
+    fields = EXPORTS[kind][1]
+    rows = iter_rows(kind, after=after, since=since, until=until)
+    if on_row:
+        rows = _tap(rows, on_row)
+    if fmt == 'csv':
+        # No header when resuming: the output is appended to the interrupted file
+        text = encode_csv(rows, fields, header=not after)
+    else:
+        text = encode_ndjson(rows, fields)
+    chunks = (t.encode('utf-8') for t in text)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def _tap(rows, callback):
+    for row in rows:
+        callback(row)
+        yield row
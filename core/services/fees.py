@@ -0,0 +1,39 @@
+"""
+AC fees accrued since the simulation last wrote Room.fee.
+The simulation persists fees every SIM_FLUSH_INTERVAL (or on state changes),
+together with the time they are exact at (Room.fee_since) and the rate they
+grow by (Room.fee_rate). Views that bill, reset or re-session a room settle it
+first: one UPDATE adds what accrued since fee_since and moves fee_since to now.
+The simulation only adds its own deltas to rooms nobody settled meanwhile (see
+SimulationEngine._persist), so nothing is charged twice or on top of a reset.
+"""
+import time
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def accrued(now):
+    """Expression for the fee a room accrued from Room.fee_since to `now` (epoch seconds)."""
+    return Greatest(Coalesce(F('fee_rate') * (Value(now) - F('fee_since')), Value(0.0)), Value(0.0))
+
+
+def fee_at(now):
+    """Expression for Room.fee brought up to `now`."""
+    return F('fee') + accrued(now)
+
+
+def settled(now, stop=False):
+    """
+    Update fields that settle a room's fee at `now`; stop=True also ends the
+    accrual, for rooms being powered off or checked out.
+    """
+    update = {'fee': fee_at(now), 'total_fee': F('total_fee') + accrued(now), 'fee_since': now}
+    if stop:
+        update['fee_rate'] = 0.0
+    return update
+
+
+def settle_fees(rooms, stop=False, now=None):
+    """Bring Room.fee of the `rooms` queryset up to `now` (default: the current time)."""
+    now = time.time() if now is None else now
+    rooms.update(**settled(now, stop))
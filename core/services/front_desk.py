@@ -0,0 +1,146 @@
+"""
+Group check-in and check-out (tour groups). A group is handled in one request
+and one transaction with set-based statements, so the number of queries does
+not grow with the number of rooms: occupancy of every room is validated with
+one query, rooms are claimed and written with bulk updates, open AC sessions are closed,
+bills created and sessions linked to them with one statement each. Either the
+whole group goes through or nothing changes.
+"""
+from django.db import transaction
+from django.db.models import Case, When, Value, F, OuterRef, Subquery
+from django.utils import timezone
+from core.models import Room, Bill, ACSession
+from core.services.fees import settled
+
+
+class GroupError(ValueError):
+    """A group request that cannot go through; rooms maps room_id -> reason."""
+
+    def __init__(self, message, rooms=None):
+        super().__init__(message)
+        self.rooms = rooms or {}
+
+
+def stay_nights(check_in_time, check_out_time):
+    """
+    Nights charged: calendar days between check-in and check-out, plus one
+    if checking out at or after 12:00, and at least one.
+    """
+    days = (check_out_time.date() - check_in_time.date()).days
+    if check_out_time.hour >= 12:
+        days += 1
+    return max(days, 1)
+
+
+def _rooms(room_ids, expected_occupancy):
+    """{room_id: Room} of the group, or GroupError listing unknown, repeated or wrongly occupied rooms."""
+    problems = {}
+    seen = set()
+    for rid in room_ids:
+        if rid in seen:
+            problems[rid] = 'listed twice'
+        seen.add(rid)
+    rooms = Room.objects.in_bulk(list(seen))
+    for rid in seen:
+        room = rooms.get(rid)
+        if room is None:
+            problems[rid] = 'unknown room'
+        elif room.occupancy_status != expected_occupancy:
+            problems[rid] = 'occupied' if expected_occupancy == 'EMPTY' else 'not occupied'
+    if problems:
+        raise GroupError(f"{len(problems)} of {len(room_ids)} rooms cannot be processed", problems)
+    return rooms
+
+
+def group_check_in(guests):
+    """guests: [(room_id, guest_id)]. Checks every room in, or none."""
+    if not guests:
+        raise GroupError("No rooms given")
+    now = timezone.now()
+    rooms = _rooms([rid for rid, _ in guests], 'EMPTY')
+    with transaction.atomic():
+        # Guarded by occupancy, so a room taken since the check above fails the whole group
+        updated = Room.objects.filter(room_id__in=rooms, occupancy_status='EMPTY').update(
+            occupancy_status='OCCUPIED', check_in_time=now, fee=0.0, fee_rate=0.0, fee_since=now.timestamp(),
+            guest_id=Case(*[When(room_id=rid, then=Value(guest_id)) for rid, guest_id in guests]),
+        )
+        if updated != len(rooms):
+            raise GroupError("Rooms were checked in by someone else meanwhile; nothing was changed")
+    return {'rooms': len(rooms), 'check_in_time': now}
+
+
+def group_check_out(room_ids):
+    """
+    Check out every room of the group (or none): close open AC sessions, bill
+    each stay, reset the rooms. Returns the combined invoice and the rooms whose
+    AC was on, which the caller must stop in their scheduler.
+    """
+    from core.services.control import ControlCoalescer
+    if not room_ids:
+        raise GroupError("No rooms given")
+    coalescer = ControlCoalescer()
+    for rid in room_ids:
+        coalescer.flush(rid)
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(_rooms(room_ids, 'OCCUPIED'))
+        # Claim the rooms first, guarded by occupancy: a room checked out since
+        # the check above fails the whole group. The claim settles the fees, and the
+        # rooms are re-read after it, so the bills use the fee and stay as they are now.
+        claimed = Room.objects.filter(room_id__in=ids, occupancy_status='OCCUPIED').update(
+            occupancy_status='EMPTY', **settled(now.timestamp(), stop=True))
+        if claimed != len(ids):
+            raise GroupError("Rooms were checked out by someone else meanwhile; nothing was changed")
+        rooms = Room.objects.in_bulk(ids)
+
+        # Open sessions end now, charged with what the room accrued since they started
+        room_fee = Subquery(Room.objects.filter(room_id=OuterRef('room_id')).values('fee')[:1])
+        ACSession.objects.filter(room_id__in=ids, end_time__isnull=True).update(
+            end_time=now, fee=room_fee - F('initial_fee'))
+
+        bills = []
+        for rid, room in rooms.items():
+            check_in_time = room.check_in_time or now
+            accommodation_fee = stay_nights(check_in_time, now) * room.daily_rate
+            bills.append(Bill(room_id=rid, guest_id=room.guest_id or "Unknown", check_in_time=check_in_time,
+                              check_out_time=now, ac_fee=room.fee, accommodation_fee=accommodation_fee,
+                              total_amount=room.fee + accommodation_fee))
+        Bill.objects.bulk_create(bills)
+        bill_of = {bill.room_id: bill for bill in bills}
+
+        ACSession.objects.filter(room_id__in=ids, bill__isnull=True, start_time__gte=F('room__check_in_time')).update(
+            bill_id=Case(*[When(room_id=rid, then=Value(bill.id)) for rid, bill in bill_of.items()]))
+        sessions = list(ACSession.objects.filter(bill_id__in=[bill.id for bill in bills]).order_by('start_time')
+                        .values_list('bill_id', 'start_time', 'end_time', 'mode', 'fan_speed', 'fee'))
+
+        Room.objects.filter(room_id__in=ids).update(
+            guest_id=None, fee=0.0, total_fee=0.0, check_in_time=None, status='IDLE', is_on=False)
+
+    details = {bill.id: [] for bill in bills}
+    for bill_id, start, end, mode, fan_speed, fee in sessions:
+        details[bill_id].append({
+            'start': start.strftime("%Y-%m-%d %H:%M:%S"),
+            'end': end.strftime("%Y-%m-%d %H:%M:%S") if end else "N/A",
+            'mode': mode,
+            'fan': fan_speed,
+            'fee': fee,
+        })
+    invoice = {
+        'rooms': len(bills),
+        'accommodation_fee': sum(bill.accommodation_fee for bill in bills),
+        'ac_fee': sum(bill.ac_fee for bill in bills),
+        'total': sum(bill.total_amount for bill in bills),
+        'bills': [{
+            'bill_id': bill.id,
+            'room_id': bill.room_id,
+            'guest_id': bill.guest_id,
+            'days': stay_nights(bill.check_in_time, now),
+            'daily_rate': rooms[bill.room_id].daily_rate,
+            'accommodation_fee': bill.accommodation_fee,
+            'ac_fee': bill.ac_fee,
+            'total': bill.total_amount,
+            'ac_details': details[bill.id],
+        } for bill in sorted(bills, key=lambda b: b.room_id)],
+    }
+    powered = [(rid, room.hotel_id) for rid, room in rooms.items() if room.is_on]
+    return invoice, powered
@@ -0,0 +1,245 @@
+"""
+DB-free scheduler and thermal simulation for offline experiments.
+HeadlessSimulation replays a workload of guest control events in simulated
+time, with the same Scheduler decision code and ThermalPartition model as
+the live system, and collects comfort and fairness metrics.
+"""
+import math
+from core.services.config import Config
+from core.services import power
+from core.services.policies import get_policy, INFINITE_TIMEOUT
+from core.services.scheduler import Scheduler
+from core.services.thermal import ThermalPartition
+
+
+class HeadlessScheduler(Scheduler):
+    """Scheduler that keeps room state in memory and never touches the DB or journal."""
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, rooms, policy=None, on_status=None):
+        self._initialized = True
+        self.running = False
+        self.hotel = None
+        self.config = Config
+        self.journal = None
+        self.rooms = rooms  # room_id -> {'fan_speed', 'target_temp', 'temp_fn'}
+        self.on_status = on_status
+        self._init_state(policy or get_policy())
+        self.budget = None
+
+        # Metrics
+        self.waits = []      # request-to-service time of every admission (seconds)
+        self.preemptions = 0
+        self.swaps = 0
+
+    def _log(self, message):
+        pass
+
+    def _power_budget(self):
+        # Simulated time has no time of day; POWER_SCHEDULE does not apply
+        if Config.POWER_BUDGET is None:
+            return None
+        return max(Config.POWER_BUDGET, power.minimum_budget())
+
+    def _room_views(self, room_ids):
+        views = {}
+        for rid in room_ids:
+            room = self.rooms.get(rid)
+            if room:
+                delta = abs(room['temp_fn'](rid) - room['target_temp'])
+                views[rid] = self._make_view(rid, room['fan_speed'], delta)
+        return views
+
+    def _fetch_rows(self, room_ids):
+        # Views come straight from self.rooms (see _room_views), nothing to prefetch
+        return {}
+
+    def _update_room_status(self, room_id, status, service_time=None, wait_timeout=None):
+        if self.on_status:
+            self.on_status(room_id, status)
+
+    def _record_admission(self, room_id, waited, fan_speed=None):
+        self.waits.append(waited)
+
+    def _record_preemption(self, room_id, fan_speed, swap):
+        if swap:
+            self.swaps += 1
+        else:
+            self.preemptions += 1
+
+    def next_deadline(self):
+        """Earliest finite wait deadline still in the future, or None."""
+        future = [info[1] for info in self.wait_info.values()
+                  if self.clock < info[1] < self.clock + INFINITE_TIMEOUT / 2]
+        return min(future) if future else None
+
+
+def abs_error_integral(segment, t0, t1, target):
+    """Integral of |temp(t) - target| over [t0, t1] for one segment (degree-seconds)."""
+    if t1 <= t0:
+        return 0.0
+    # Split at the clamp point so each piece is linear
+    if segment.limit is not None and not segment.is_flat:
+        tc = segment.time_at(segment.limit)
+        if tc is not None and t0 < tc < t1:
+            return abs_error_integral(segment, t0, tc, target) + abs_error_integral(segment, tc, t1, target)
+
+    a = segment.temp_at(t0) - target
+    b = segment.temp_at(t1) - target
+    if a * b >= 0:
+        return (abs(a) + abs(b)) / 2 * (t1 - t0)
+    # Sign change: two triangles
+    return (a * a + b * b) / (2 * (abs(a) + abs(b))) * (t1 - t0)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = math.floor(k)
+    hi = math.ceil(k)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class HeadlessSimulation:
+    """
+    Replay a workload under one policy.
+    workload: {'rooms': {room_id: initial_temp}, 'events': [(t, room_id, changes), ...]}
+    where t is in seconds and changes holds any of is_on, mode, fan_speed,
+    target_temp (the body of a POST to api_control_room).
+    """
+
+    def __init__(self, workload, policy=None, max_serving=None, time_slice=None, power_budget=None):
+        self.workload = workload
+        self.max_serving = max_serving
+        self.time_slice = time_slice
+        self.power_budget = power_budget
+        self.now = 0.0
+
+        self.partition = ThermalPartition()
+        self.partition.on_segment_end = self._segment_end
+        self.state = {}  # room_id -> {'is_on', 'status', 'fan_speed', 'mode', 'target_temp', 'temp_fn'}
+        for rid in workload['rooms']:
+            self.state[rid] = {
+                'is_on': False, 'status': 'IDLE', 'fan_speed': Config.DEFAULT_FAN_SPEED,
+                'mode': 'COOL', 'target_temp': Config.DEFAULT_TARGET_TEMP, 'temp_fn': self._temp,
+            }
+        self.scheduler = HeadlessScheduler(self.state, policy=policy, on_status=self._on_status)
+
+        self.error_integral = 0.0   # degree-seconds away from target while AC is on
+        self.energy = 0.0           # AC fee accrued (proportional to energy)
+        self.serving_seconds = 0.0
+
+    def _temp(self, rid):
+        return self.partition.temperature_at(rid, self.now)
+
+    def _key(self, rid):
+        s = self.state[rid]
+        return (s['is_on'], s['status'], s['fan_speed'], s['mode'], s['target_temp'])
+
+    def _segment_end(self, track, t):
+        is_on, status, _, _, target_temp = track.key
+        if is_on:
+            self.error_integral += abs_error_integral(track.segment, track.segment.start, t, target_temp)
+            if status == 'SERVING':
+                self.serving_seconds += max(0.0, t - track.segment.start)
+
+    def _on_status(self, rid, status):
+        self.state[rid]['status'] = status
+        self.partition.apply_state(rid, self._key(rid), None, self.now)
+
+    def _apply_control(self, rid, changes):
+        s = self.state[rid]
+        was_on = s['is_on']
+        for field in ('mode', 'fan_speed', 'target_temp'):
+            if field in changes:
+                s[field] = changes[field]
+        if 'is_on' in changes:
+            s['is_on'] = bool(changes['is_on'])
+        self.partition.apply_state(rid, self._key(rid), None, self.now)
+
+        if s['is_on'] and not was_on:
+            self.scheduler.request_service(rid, s['fan_speed'])
+        elif not s['is_on'] and was_on:
+            self.scheduler.stop_service(rid)
+        elif s['is_on'] and 'fan_speed' in changes:
+            # Adjusting fan speed counts as new request
+            self.scheduler.request_service(rid, s['fan_speed'])
+
+    def _dispatch(self):
+        _, fees, statuses, actions, _ = self.partition.drain()
+        self.energy += sum(fees.values())
+        for rid, status in statuses.items():
+            self.state[rid]['status'] = status
+        for _, action, rid in sorted(actions):
+            if action == 'STOP':
+                self.scheduler.stop_service(rid)
+            else:
+                self.scheduler.request_service(rid, self.state[rid]['fan_speed'])
+
+    def _step(self, t):
+        self.partition.advance(t)
+        self.now = t
+        self.scheduler.clock = t
+        self._dispatch()
+        self.scheduler._check_time_slice()
+        self._dispatch()
+
+    def _advance_to(self, t):
+        # Stop at every thermal event and time-slice deadline so decisions
+        # happen at the moment they are due.
+        while True:
+            step = t
+            for candidate in (self.partition.next_event_time(), self.scheduler.next_deadline()):
+                if candidate is not None and self.now < candidate < step:
+                    step = candidate
+            self._step(step)
+            if step >= t:
+                return
+
+    def run(self, horizon=None):
+        saved = (Config.MAX_SERVING_ROOMS, Config.TIME_SLICE, Config.POWER_BUDGET)
+        if self.max_serving is not None:
+            Config.MAX_SERVING_ROOMS = self.max_serving
+        if self.time_slice is not None:
+            Config.TIME_SLICE = self.time_slice
+        if self.power_budget is not None:
+            Config.POWER_BUDGET = self.power_budget
+        try:
+            self.scheduler._check_power_budget()
+            for rid, temp in self.workload['rooms'].items():
+                self.partition.apply_state(rid, self._key(rid), temp, 0.0)
+            events = sorted(self.workload['events'], key=lambda e: (e[0], e[1]))
+            for t, rid, changes in events:
+                if rid not in self.state:
+                    continue
+                self._advance_to(t)
+                self._apply_control(rid, changes)
+                self._dispatch()
+            end = horizon if horizon is not None else (events[-1][0] if events else 0.0)
+            self._advance_to(end)
+            # Account for the segments still open at the end
+            for track in self.partition.tracks.values():
+                self._segment_end(track, end)
+        finally:
+            Config.MAX_SERVING_ROOMS, Config.TIME_SLICE, Config.POWER_BUDGET = saved
+        return self.metrics(end)
+
+    def metrics(self, duration):
+        waits = sorted(self.scheduler.waits)
+        return {
+            'policy': self.scheduler.policy.name,
+            'admissions': len(waits),
+            'mean_wait': sum(waits) / len(waits) if waits else 0.0,
+            'p95_wait': percentile(waits, 95),
+            'p99_wait': percentile(waits, 99),
+            'max_wait': waits[-1] if waits else 0.0,
+            'preemptions': self.scheduler.preemptions,
+            'swaps': self.scheduler.swaps,
+            'error_integral': self.error_integral / 60.0,  # degree-minutes
+            'energy': self.energy,
+            'serving_seconds': self.serving_seconds,
+            'duration': duration,
+        }
@@ -0,0 +1,81 @@
+"""
+Heat exchange between neighbouring rooms, for ThermalPartition.
+Rooms leak heat into the rooms next to them on the same floor (floor =
+room_id // 100, neighbours = adjacent numbers, e.g. 204 touches 203 and 205).
+The adjacency is kept as a sparse matrix in CSR form (row pointers and column
+indices into the room order), so the exchange of every room is one sparse
+matrix-vector product with the graph Laplacian per tick:
+
+    exchange_i = k * sum_j (T_j - T_i)   over neighbours j of i
+
+with k = Config.HEAT_TRANSFER_COEFF per minute. Kept free of Django imports
+(runs in partition worker processes).
+"""
+from array import array
+
+
+def room_number(room_id):
+    try:
+        return int(room_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def adjacency(room_ids):
+    """{room_id: [neighbour room_ids]}: adjacent numbers on the same floor."""
+    by_number = {}
+    for rid in room_ids:
+        number = room_number(rid)
+        if number is not None:
+            by_number[number] = rid
+    result = {}
+    for rid in room_ids:
+        number = room_number(rid)
+        if number is None:
+            result[rid] = []
+            continue
+        result[rid] = [by_number[n] for n in (number - 1, number + 1)
+                       if n in by_number and n // 100 == number // 100]
+    return result
+
+
+class HeatExchange:
+    """Sparse neighbour matrix of a set of rooms, rebuilt when rooms come or go."""
+
+    def __init__(self):
+        self.order = []          # room_id per row
+        self.indptr = array('i', [0])
+        self.indices = array('i')
+        self._members = None     # frozenset of room_ids the matrix was built for
+
+    def rebuild(self, room_ids):
+        members = frozenset(room_ids)
+        if members == self._members:
+            return
+        self._members = members
+        self.order = sorted(members)
+        position = {rid: i for i, rid in enumerate(self.order)}
+        neighbours = adjacency(self.order)
+        self.indptr = array('i', [0])
+        self.indices = array('i')
+        for rid in self.order:
+            self.indices.extend(position[n] for n in neighbours[rid])
+            self.indptr.append(len(self.indices))
+
+    def rates(self, temps, coefficient):
+        """
+        Exchange rate (degrees per second) of every room in self.order, given
+        their temperatures in the same order: one Laplacian product.
+        """
+        k = coefficient / 60.0
+        indptr, indices = self.indptr, self.indices
+        out = [0.0] * len(temps)
+        for i, temp in enumerate(temps):
+            start, end = indptr[i], indptr[i + 1]
+            if start == end:
+                continue
+            total = 0.0
+            for j in indices[start:end]:
+                total += temps[j]
+            out[i] = k * (total - (end - start) * temp)
+        return out
@@ -0,0 +1,223 @@
+"""
+Per-room temperature history.
+Every HISTORY_INTERVAL seconds the simulation records one float32 sample per
+room in a fixed-size ring buffer (HISTORY_CAPACITY samples per room). Samples
+share a global slot number (t // HISTORY_INTERVAL), so a slot index locates a
+sample without storing timestamps. Each completed block of slots is spilled to
+one file for all rooms, so older data stays queryable after the ring wraps.
+
+Segment file: magic, header (interval, first slot, slots, rooms, index length),
+JSON list of room_ids, then one float32 array of `slots` samples per room.
+"""
+import json
+import math
+import os
+import struct
+import threading
+from array import array
+from core.services.config import Config
+
+SEGMENT_MAGIC = b'RTH1'
+SEGMENT_HEADER = struct.Struct('<dqiii')  # interval, first slot, slots, rooms, index bytes
+NAN = float('nan')
+
+
+class RoomRing:
+    __slots__ = ('temps', 'last_slot')
+
+    def __init__(self, capacity):
+        self.temps = array('f', [NAN]) * capacity
+        self.last_slot = None
+
+    def record(self, slot, temp):
+        capacity = len(self.temps)
+        if self.last_slot is not None and slot > self.last_slot + 1:
+            # Gap (room missing or engine paused): blank the skipped slots
+            for s in range(self.last_slot + 1, min(slot, self.last_slot + 1 + capacity)):
+                self.temps[s % capacity] = NAN
+        self.temps[slot % capacity] = temp
+        if self.last_slot is None or slot > self.last_slot:
+            self.last_slot = slot
+
+    def first_slot(self):
+        return self.last_slot - len(self.temps) + 1
+
+    def get(self, slot):
+        if self.last_slot is None or not (self.first_slot() <= slot <= self.last_slot):
+            return NAN
+        return self.temps[slot % len(self.temps)]
+
+
+class TemperatureHistory:
+    def __init__(self, directory=None, interval=None, capacity=None, block=None):
+        self.directory = str(directory) if directory else None
+        self.interval = interval or Config.HISTORY_INTERVAL
+        self.capacity = capacity or Config.HISTORY_CAPACITY
+        # Spilled blocks must still be in the ring when they complete
+        self.block = max(1, min(block or Config.HISTORY_SPILL_BLOCK, self.capacity - 1))
+        self.rings = {}
+        self.last_slot = None
+        self.indexes = {}  # segment path -> (interval, first slot, slots, {room_id: column}, data offset)
+        self._lock = threading.Lock()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def slot_of(self, t):
+        return int(t // self.interval)
+
+    def due(self, now):
+        return self.last_slot is None or self.slot_of(now) > self.last_slot
+
+    def record(self, now, temps):
+        """Record {room_id: temperature} for the slot containing `now`."""
+        slot = self.slot_of(now)
+        with self._lock:
+            previous = self.last_slot
+            for rid, temp in temps.items():
+                if temp is None:
+                    continue
+                ring = self.rings.get(rid)
+                if ring is None:
+                    ring = self.rings[rid] = RoomRing(self.capacity)
+                ring.record(slot, temp)
+            self.last_slot = slot if previous is None else max(previous, slot)
+        if previous is not None and self.directory and slot // self.block > previous // self.block:
+            self._spill((previous // self.block) * self.block)
+            self._expire(slot)
+
+    def forget(self, room_id):
+        with self._lock:
+            self.rings.pop(room_id, None)
+
+    # --- Disk segments ---
+
+    def _segment_path(self, first_slot):
+        return os.path.join(self.directory, f'{first_slot:012d}.seg')
+
+    def _spill(self, first_slot):
+        with self._lock:
+            room_ids = sorted(self.rings)
+            columns = []
+            for rid in room_ids:
+                ring = self.rings[rid]
+                columns.append(array('f', (ring.get(s) for s in range(first_slot, first_slot + self.block))))
+        index = json.dumps(room_ids).encode()
+        path = self._segment_path(first_slot)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(SEGMENT_MAGIC)
+            f.write(SEGMENT_HEADER.pack(self.interval, first_slot, self.block, len(room_ids), len(index)))
+            f.write(index)
+            for column in columns:
+                column.tofile(f)
+        os.replace(tmp, path)
+        self.indexes.pop(path, None)
+
+    def _expire(self, slot):
+        oldest = slot - int(Config.HISTORY_RETENTION_HOURS * 3600 / self.interval)
+        for first_slot, path in self._segments():
+            if first_slot + self.block <= oldest:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                self.indexes.pop(path, None)
+
+    def _segments(self):
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        result = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.seg'):
+                try:
+                    result.append((int(name[:-4]), os.path.join(self.directory, name)))
+                except ValueError:
+                    continue
+        return sorted(result)
+
+    def _segment_index(self, path, f):
+        """Header and room index of a segment, parsed once per file; None if it is not a segment."""
+        index = self.indexes.get(path)
+        if index is None:
+            if f.read(len(SEGMENT_MAGIC)) != SEGMENT_MAGIC:
+                return None
+            interval, first_slot, slots, rooms, index_len = SEGMENT_HEADER.unpack(f.read(SEGMENT_HEADER.size))
+            columns = {rid: i for i, rid in enumerate(json.loads(f.read(index_len)))}
+            offset = len(SEGMENT_MAGIC) + SEGMENT_HEADER.size + index_len
+            index = self.indexes[path] = (interval, first_slot, slots, columns, offset)
+        return index
+
+    def _read_segment(self, path, room_id):
+        """Return (interval, first_slot, float32 array) for one room, or None."""
+        with open(path, 'rb') as f:
+            index = self._segment_index(path, f)
+            if index is None:
+                return None
+            interval, first_slot, slots, columns, offset = index
+            i = columns.get(room_id)
+            if i is None:
+                return None
+            f.seek(offset + i * slots * 4)
+            values = array('f')
+            values.fromfile(f, slots)
+        return interval, first_slot, values
+
+    # --- Queries ---
+
+    def samples(self, room_id, t0, t1):
+        """[(t, temp)] for t0 <= t <= t1, from spilled segments and the ring."""
+        s0, s1 = math.ceil(t0 / self.interval), self.slot_of(t1)
+        found = {}
+        segments = self._segments()
+        for n, (first_slot, path) in enumerate(segments):
+            if first_slot > s1:
+                break
+            if n + 1 < len(segments) and segments[n + 1][0] <= s0:
+                continue  # Ends before the range: the next segment starts at or before s0
+            segment = self._read_segment(path, room_id)
+            if not segment:
+                continue
+            interval, seg_first, values = segment
+            if interval != self.interval:
+                continue  # Written with another HISTORY_INTERVAL
+            for i in range(max(s0, seg_first) - seg_first, min(s1 + 1, seg_first + len(values)) - seg_first):
+                found[seg_first + i] = values[i]
+        with self._lock:
+            ring = self.rings.get(room_id)
+            if ring and ring.last_slot is not None:
+                for s in range(max(s0, ring.first_slot()), min(s1, ring.last_slot) + 1):
+                    found[s] = ring.get(s)
+        return [(s * self.interval, v) for s, v in sorted(found.items()) if not math.isnan(v)]
+
+    def buckets(self, room_id, t0, t1, step):
+        """Downsample into [{'t', 'min', 'mean', 'max', 'count'}] buckets of `step` seconds (empty buckets omitted)."""
+        result = {}
+        for t, temp in self.samples(room_id, t0, t1):
+            i = int((t - t0) // step)
+            b = result.get(i)
+            if b is None:
+                result[i] = [temp, temp, temp, 1]
+            else:
+                b[0] = min(b[0], temp)
+                b[1] += temp
+                b[2] = max(b[2], temp)
+                b[3] += 1
+        return [
+            {'t': t0 + i * step, 'min': round(lo, 2), 'mean': round(total / n, 2), 'max': round(hi, 2), 'count': n}
+            for i, (lo, total, hi, n) in sorted(result.items())
+        ]
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_history():
+    """The process-wide history, spilling to settings.HISTORY_DIR (None keeps it in memory only)."""
+    global _history
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                from django.conf import settings
+                _history = TemperatureHistory(getattr(settings, 'HISTORY_DIR', None))
+    return _history
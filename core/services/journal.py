@@ -0,0 +1,245 @@
+import os
+import struct
+import threading
+
+# Record ops
+OP_SERVE = 1    # room admitted to serving
+OP_WAIT = 2     # room put in waiting queue
+OP_PREEMPT = 3  # priority preemption: victim -> waiting, new -> serving
+OP_SWAP = 4     # time slice swap: victim -> waiting, new -> serving
+OP_STOP = 5     # room left both queues
+OP_TICK = 6     # scheduler clock advanced
+
+# Why a room is waiting
+REASON_PREEMPTED = 1     # kicked out by a higher priority request (no timeout)
+REASON_TIME_SLICE = 2    # waiting for a same-priority time slice
+REASON_LOW_PRIORITY = 3  # all serving rooms have higher priority (no timeout)
+REASON_SWAPPED = 4       # time slice expired while serving
+
+# seq, clock, op
+HEADER = struct.Struct('<QdB')
+WAIT_INFO = struct.Struct('<Bd')  # reason, deadline
+SNAPSHOT_WAIT = struct.Struct('<Bdd')  # reason, deadline, waiting since
+SNAPSHOT_MAGIC = b'SJS2'
+SNAPSHOT_HEADER = struct.Struct('<Qd')  # last seq, clock
+COUNT = struct.Struct('<I')
+DEADLINE = struct.Struct('<d')
+
+
+def _pack_room(room_id):
+    data = room_id.encode('utf-8')
+    return bytes((len(data),)) + data
+
+
+def _unpack_room(buf, pos):
+    n = buf[pos]
+    return buf[pos + 1:pos + 1 + n].decode('utf-8'), pos + 1 + n
+
+
+class JournalState:
+    """Scheduler queue state rebuilt from a snapshot and the journal tail."""
+
+    def __init__(self):
+        self.seq = 0
+        self.clock = 0.0
+        self.serving = []       # room_ids in admission order
+        self.waiting = []       # room_ids in queue order
+        self.service_start = {} # room_id -> clock when service started
+        self.wait_info = {}     # room_id -> (reason, deadline clock)
+        self.wait_since = {}    # room_id -> clock when the room started waiting
+
+    def _remove(self, room_id):
+        if room_id in self.serving:
+            self.serving.remove(room_id)
+            self.service_start.pop(room_id, None)
+        if room_id in self.waiting:
+            self.waiting.remove(room_id)
+            self.wait_info.pop(room_id, None)
+            self.wait_since.pop(room_id, None)
+
+    def serve(self, room_id):
+        self._remove(room_id)
+        self.serving.append(room_id)
+        self.service_start[room_id] = self.clock
+
+    def wait(self, room_id, reason, deadline):
+        self._remove(room_id)
+        self.waiting.append(room_id)
+        self.wait_info[room_id] = (reason, deadline)
+        self.wait_since[room_id] = self.clock
+
+    def apply(self, op, args):
+        if op == OP_SERVE:
+            self.serve(args[0])
+        elif op == OP_WAIT:
+            self.wait(args[0], args[1], args[2])
+        elif op in (OP_PREEMPT, OP_SWAP):
+            victim, new, deadline = args
+            reason = REASON_PREEMPTED if op == OP_PREEMPT else REASON_SWAPPED
+            self.wait(victim, reason, deadline)
+            self.serve(new)
+        elif op == OP_STOP:
+            self._remove(args[0])
+
+
+class SchedulerJournal:
+    """
+    Append-only binary journal of scheduler decisions with periodic snapshots.
+    Files in `directory`: scheduler.snap (latest snapshot) and scheduler.journal.
+    Records carry a sequence number, so records already covered by the
+    snapshot are skipped on replay even if the journal was not truncated.
+    """
+
+    def __init__(self, directory, snapshot_every=1000, fsync=False):
+        self.directory = str(directory)
+        self.snapshot_path = os.path.join(self.directory, 'scheduler.snap')
+        self.journal_path = os.path.join(self.directory, 'scheduler.journal')
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.seq = 0
+        self.since_snapshot = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.journal_path)
+
+    def open(self, seq=0):
+        os.makedirs(self.directory, exist_ok=True)
+        self.seq = seq
+        self._file = open(self.journal_path, 'ab')
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    # Writing
+
+    def append(self, op, clock, *args):
+        with self._lock:
+            if self._file:
+                self._append(op, clock, args)
+
+    def _append(self, op, clock, args):
+        self.seq += 1
+        parts = [HEADER.pack(self.seq, clock, op)]
+        if op in (OP_SERVE, OP_STOP):
+            parts.append(_pack_room(args[0]))
+        elif op == OP_WAIT:
+            parts.append(_pack_room(args[0]))
+            parts.append(WAIT_INFO.pack(args[1], args[2]))
+        elif op in (OP_PREEMPT, OP_SWAP):
+            parts.append(_pack_room(args[0]))
+            parts.append(_pack_room(args[1]))
+            parts.append(DEADLINE.pack(args[2]))
+        self._file.write(b''.join(parts))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.since_snapshot += 1
+
+    def snapshot_due(self):
+        return self.since_snapshot >= self.snapshot_every
+
+    def snapshot(self, clock, serving, service_start, waiting, wait_info, wait_since):
+        with self._lock:
+            self._snapshot(clock, serving, service_start, waiting, wait_info, wait_since)
+
+    def _snapshot(self, clock, serving, service_start, waiting, wait_info, wait_since):
+        parts = [SNAPSHOT_MAGIC, SNAPSHOT_HEADER.pack(self.seq, clock), COUNT.pack(len(serving))]
+        for rid in serving:
+            parts.append(_pack_room(rid))
+            parts.append(DEADLINE.pack(service_start.get(rid, clock)))
+        parts.append(COUNT.pack(len(waiting)))
+        for rid in waiting:
+            reason, deadline = wait_info.get(rid, (REASON_LOW_PRIORITY, clock))
+            parts.append(_pack_room(rid))
+            parts.append(SNAPSHOT_WAIT.pack(reason, deadline, wait_since.get(rid, clock)))
+
+        tmp = self.snapshot_path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(b''.join(parts))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+
+        # Snapshot covers everything so far; start a fresh journal
+        if self._file:
+            self._file.close()
+        self._file = open(self.journal_path, 'wb')
+        self.since_snapshot = 0
+
+    # Reading
+
+    def load(self):
+        state = JournalState()
+        if os.path.exists(self.snapshot_path):
+            self._load_snapshot(state)
+        if os.path.exists(self.journal_path):
+            self._replay(state)
+        return state
+
+    def _load_snapshot(self, state):
+        with open(self.snapshot_path, 'rb') as f:
+            buf = f.read()
+        if buf[:4] != SNAPSHOT_MAGIC:
+            raise ValueError("Bad scheduler snapshot")
+        pos = 4
+        state.seq, state.clock = SNAPSHOT_HEADER.unpack_from(buf, pos)
+        pos += SNAPSHOT_HEADER.size
+        (n,) = COUNT.unpack_from(buf, pos)
+        pos += COUNT.size
+        for _ in range(n):
+            rid, pos = _unpack_room(buf, pos)
+            (start,) = DEADLINE.unpack_from(buf, pos)
+            pos += DEADLINE.size
+            state.serving.append(rid)
+            state.service_start[rid] = start
+        (n,) = COUNT.unpack_from(buf, pos)
+        pos += COUNT.size
+        for _ in range(n):
+            rid, pos = _unpack_room(buf, pos)
+            reason, deadline, since = SNAPSHOT_WAIT.unpack_from(buf, pos)
+            pos += SNAPSHOT_WAIT.size
+            state.waiting.append(rid)
+            state.wait_info[rid] = (reason, deadline)
+            state.wait_since[rid] = since
+
+    def _replay(self, state):
+        with open(self.journal_path, 'rb') as f:
+            buf = f.read()
+        pos = 0
+        end = len(buf)
+        while pos + HEADER.size <= end:
+            try:
+                seq, clock, op = HEADER.unpack_from(buf, pos)
+                p = pos + HEADER.size
+                if op in (OP_SERVE, OP_STOP):
+                    rid, p = _unpack_room(buf, p)
+                    args = (rid,)
+                elif op == OP_WAIT:
+                    rid, p = _unpack_room(buf, p)
+                    reason, deadline = WAIT_INFO.unpack_from(buf, p)
+                    p += WAIT_INFO.size
+                    args = (rid, reason, deadline)
+                elif op in (OP_PREEMPT, OP_SWAP):
+                    victim, p = _unpack_room(buf, p)
+                    new, p = _unpack_room(buf, p)
+                    (deadline,) = DEADLINE.unpack_from(buf, p)
+                    p += DEADLINE.size
+                    args = (victim, new, deadline)
+                elif op == OP_TICK:
+                    args = ()
+                else:
+                    break  # Corrupt record
+                if p > end:
+                    break
+            except (IndexError, struct.error, UnicodeDecodeError):
+                break  # Torn write at the tail
+            pos = p
+            if seq <= state.seq:
+                continue  # Already in the snapshot
+            state.seq = seq
+            state.clock = clock
+            state.apply(op, args)
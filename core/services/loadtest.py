@@ -0,0 +1,245 @@
+"""
+Asyncio load generator for the guest panel and monitor APIs.
+A panel does what customer.js does: GET /api/room/<id>/ every second and,
+now and then, POST a change to /api/control/<id>/ followed by a refresh.
+A monitor screen polls /api/rooms/ and /api/queues/ every second.
+Only the standard library is used (HTTP/1.1 keep-alive over asyncio streams).
+"""
+import asyncio
+import json
+import math
+import random
+import time
+from core.services.config import Config
+
+
+class HttpClient:
+    """One keep-alive HTTP/1.1 connection, reopened when the server closes it."""
+
+    def __init__(self, host, port, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (OSError, ConnectionError):
+                pass
+            self.writer = None
+
+    async def request(self, method, path, body=None):
+        """Return (status, body bytes)."""
+        payload = json.dumps(body).encode() if body is not None else b''
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Connection: keep-alive\r\nContent-Length: {len(payload)}\r\n")
+        if body is not None:
+            head += "Content-Type: application/json\r\n"
+        data = (head + "\r\n").encode() + payload
+
+        for attempt in (0, 1):
+            if self.writer is None:
+                await self._connect()
+            try:
+                self.writer.write(data)
+                await self.writer.drain()
+                return await asyncio.wait_for(self._read_response(), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Stale keep-alive connection: retry once on a fresh one
+                await self.close()
+                if attempt:
+                    raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        length = None
+        close = False
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name = name.strip().lower()
+            if name == 'content-length':
+                length = int(value.strip())
+            elif name == 'connection' and value.strip().lower() == 'close':
+                close = True
+        if length is None:
+            body = await self.reader.read()
+            close = True
+        else:
+            body = await self.reader.readexactly(length)
+        if close:
+            await self.close()
+        return status, body
+
+
+def quantile(sorted_values, q):
+    """Nearest-rank quantile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))]
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.samples = {}  # endpoint -> [seconds]
+        self.errors = {}   # endpoint -> count
+        self.throttled = {}  # endpoint -> 429 answers (rate limiting, not an overload of the server)
+        self.recording = False
+
+    async def timed(self, client, endpoint, method, path, body=None):
+        started = time.perf_counter()
+        try:
+            status, payload = await client.request(method, path, body)
+            ok = status < 400
+        except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            status, payload, ok = None, None, False
+        if self.recording:
+            if ok:
+                self.samples.setdefault(endpoint, []).append(time.perf_counter() - started)
+            elif status == 429:
+                self.throttled[endpoint] = self.throttled.get(endpoint, 0) + 1
+            else:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+        return payload if ok else None
+
+    def summary(self, duration):
+        everything = sorted(v for values in self.samples.values() for v in values)
+        errors = sum(self.errors.values())
+        result = {
+            'requests': len(everything),
+            'errors': errors,
+            'throttled': sum(self.throttled.values()),
+            'throughput': len(everything) / duration if duration > 0 else 0.0,
+            'p50_ms': quantile(everything, 0.50) * 1000,
+            'p95_ms': quantile(everything, 0.95) * 1000,
+            'p99_ms': quantile(everything, 0.99) * 1000,
+            'endpoints': {},
+        }
+        for endpoint in sorted(set(self.samples) | set(self.errors) | set(self.throttled)):
+            values = sorted(self.samples.get(endpoint, []))
+            result['endpoints'][endpoint] = {
+                'requests': len(values),
+                'errors': self.errors.get(endpoint, 0),
+                'throttled': self.throttled.get(endpoint, 0),
+                'p99_ms': quantile(values, 0.99) * 1000,
+            }
+        return result
+
+
+def _control_change(state, rng):
+    """A random change a guest could make on the panel, based on the last polled state."""
+    if not state or not state.get('is_on'):
+        return {'is_on': True}
+    choice = rng.random()
+    if choice < 0.5:
+        if state.get('mode') == 'HEAT':
+            low, high = Config.MIN_TEMP_HEAT, Config.MAX_TEMP_HEAT
+        else:
+            low, high = Config.MIN_TEMP_COOL, Config.MAX_TEMP_COOL
+        target = state.get('target_temp', Config.DEFAULT_TARGET_TEMP) + rng.choice((-1, 1))
+        return {'target_temp': min(high, max(low, target))}
+    if choice < 0.9:
+        return {'fan_speed': rng.choice(('LOW', 'MID', 'HIGH'))}
+    return {'is_on': False}
+
+
+async def panel(client, recorder, room_id, stop_at, control_interval, rng):
+    state = None
+    await asyncio.sleep(rng.random())  # Panels are not in phase
+    next_poll = time.monotonic()
+    while next_poll < stop_at:
+        payload = await recorder.timed(client, 'room', 'GET', f'/api/room/{room_id}/')
+        if payload:
+            try:
+                state = json.loads(payload)
+            except ValueError:
+                pass
+        if control_interval and rng.random() < 1.0 / control_interval:
+            await recorder.timed(client, 'control', 'POST', f'/api/control/{room_id}/', _control_change(state, rng))
+            await recorder.timed(client, 'room', 'GET', f'/api/room/{room_id}/')
+        # setInterval(fetchStatus, 1000): fixed rate, skipping missed beats
+        next_poll += 1.0
+        delay = next_poll - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            next_poll = time.monotonic()
+
+
+async def monitor(client, recorder, stop_at, rng):
+    await asyncio.sleep(rng.random())
+    next_poll = time.monotonic()
+    while next_poll < stop_at:
+        await recorder.timed(client, 'rooms', 'GET', '/api/rooms/')
+        await recorder.timed(client, 'queues', 'GET', '/api/queues/')
+        next_poll += 1.0
+        delay = next_poll - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            next_poll = time.monotonic()
+
+
+async def run_stage(host, port, room_ids, panels, monitors, duration, control_interval=30.0, warmup=2.0, seed=0):
+    """Run `panels` panels and `monitors` monitors for `duration` seconds; return the latency summary."""
+    rng = random.Random(seed)
+    recorder = LatencyRecorder()
+    clients = [HttpClient(host, port) for _ in range(panels + monitors)]
+    start = time.monotonic()
+    stop_at = start + warmup + duration
+
+    async def start_recording():
+        await asyncio.sleep(warmup)
+        recorder.recording = True
+
+    tasks = [start_recording()]
+    for i in range(panels):
+        room_id = room_ids[i % len(room_ids)]
+        tasks.append(panel(clients[i], recorder, room_id, stop_at, control_interval, random.Random(rng.random())))
+    for i in range(monitors):
+        tasks.append(monitor(clients[panels + i], recorder, stop_at, random.Random(rng.random())))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for client in clients:
+            await client.close()
+    # Requests still in flight at stop_at are counted, so measure to the actual end
+    result = recorder.summary(time.monotonic() - start - warmup)
+    result.update(panels=panels, monitors=monitors)
+    return result
+
+
+def ramp(host, port, room_ids, start, step, maximum, monitors, duration, slo_ms,
+         control_interval=30.0, max_error_rate=0.01, on_stage=None):
+    """
+    Increase the number of panels from `start` by `step` until the p99 latency
+    exceeds `slo_ms` (or errors exceed max_error_rate). Returns (curve, capacity)
+    where capacity is the largest panel count that met the SLO (0 if none did).
+    """
+    curve = []
+    capacity = 0
+    panels = start
+    while panels <= maximum:
+        result = asyncio.run(run_stage(host, port, room_ids, panels, monitors, duration,
+                                       control_interval=control_interval, seed=panels))
+        total = result['requests'] + result['errors']
+        result['slo_met'] = (result['p99_ms'] <= slo_ms and total > 0
+                             and result['errors'] <= max_error_rate * total)
+        curve.append(result)
+        if on_stage:
+            on_stage(result)
+        if not result['slo_met']:
+            break
+        capacity = panels
+        panels += step
+    return curve, capacity
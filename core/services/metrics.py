@@ -0,0 +1,130 @@
+import bisect
+import threading
+import time
+from core.services.config import Config
+
+# Upper bounds (seconds) of the queueing-latency histogram buckets; the last bucket is open
+WAIT_BUCKETS = (0, 1, 5, 10, 30, 60, 120, 300, 600, 1200, 3600)
+
+
+def zone_of(room_id):
+    """Zone of a room: a block of SIM_FLOORS_PER_ZONE floors (floor = room_id // 100)."""
+    try:
+        floor = int(room_id) // 100
+    except (TypeError, ValueError):
+        return 'misc'
+    return f"zone-{floor // Config.SIM_FLOORS_PER_ZONE}"
+
+
+class WaitHistogram:
+    __slots__ = ('counts', 'count', 'total', 'max', 'preemptions', 'swaps')
+
+    def __init__(self):
+        self.counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.preemptions = 0
+        self.swaps = 0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(WAIT_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Approximate quantile: upper bound of the bucket holding the q-th admission."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return WAIT_BUCKETS[i] if i < len(WAIT_BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'admissions': self.count,
+            'mean_wait': self.total / self.count if self.count else 0.0,
+            'p50_wait': self.quantile(0.5),
+            'p95_wait': self.quantile(0.95),
+            'max_wait': self.max,
+            'preemptions': self.preemptions,
+            'swaps': self.swaps,
+            'histogram': list(self.counts),
+        }
+
+
+class QueueMetrics:
+    """
+    In-memory queueing metrics of the Scheduler, bucketed by (fan_speed, zone).
+    `total` accumulates since start (served by the API); `window` is reset
+    every time it is persisted as an aggregate.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.total = {}
+        self.window = {}
+        self.window_start = self.started
+        self.room_preemptions = {}  # room_id -> times preempted or swapped out
+
+    def _series(self, fan_speed, zone):
+        key = (fan_speed, zone)
+        for table in (self.total, self.window):
+            if key not in table:
+                table[key] = WaitHistogram()
+        return self.total[key], self.window[key]
+
+    def record_admission(self, room_id, fan_speed, waited):
+        with self._lock:
+            for h in self._series(fan_speed, zone_of(room_id)):
+                h.add(waited)
+
+    def record_preemption(self, room_id, fan_speed, swap=False):
+        with self._lock:
+            for h in self._series(fan_speed, zone_of(room_id)):
+                if swap:
+                    h.swaps += 1
+                else:
+                    h.preemptions += 1
+            self.room_preemptions[room_id] = self.room_preemptions.get(room_id, 0) + 1
+
+    def report(self, top=10):
+        with self._lock:
+            series = [dict(fan_speed=k[0], zone=k[1], **h.to_dict()) for k, h in sorted(self.total.items())]
+            most = sorted(self.room_preemptions.items(), key=lambda kv: -kv[1])[:top]
+        return {
+            'since': self.started,
+            'buckets': list(WAIT_BUCKETS),
+            'series': series,
+            'most_preempted': [{'room_id': rid, 'count': n} for rid, n in most],
+        }
+
+    def take_window(self):
+        """Return (start, end, {(fan_speed, zone): WaitHistogram}) and start a new window."""
+        with self._lock:
+            now = time.time()
+            window, start = self.window, self.window_start
+            self.window, self.window_start = {}, now
+        return start, now, window
+
+
+def merge_aggregates(rows):
+    """Merge persisted QueueLatencyAggregate rows into one report series per (fan_speed, zone)."""
+    merged = {}
+    for row in rows:
+        h = merged.setdefault((row.fan_speed, row.zone), WaitHistogram())
+        for i, n in enumerate(row.histogram[:len(h.counts)]):
+            h.counts[i] += n
+        h.count += row.admissions
+        h.total += row.wait_total
+        h.max = max(h.max, row.wait_max)
+        h.preemptions += row.preemptions
+        h.swaps += row.swaps
+    return [dict(fan_speed=k[0], zone=k[1], **h.to_dict()) for k, h in sorted(merged.items())]
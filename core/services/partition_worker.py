@@ -0,0 +1,51 @@
+"""
+Worker process for PartitionedSimulationEngine.
+Kept free of Django imports so it can run in a freshly spawned interpreter.
+"""
+import time
+from core.services.config import Config
+from core.services.thermal import ThermalPartition
+
+
+def run_worker(conn):
+    """
+    Serve tick messages from the coordinator until told to stop.
+    Message: ('tick', now, flush, {partition_id: (changes, removed)})
+    Reply:   {partition_id: (temps, fees, statuses, actions, accruals, elapsed)}
+    Message: ('config', now, {key: value}) applies Config changes, no reply.
+    """
+    partitions = {}
+    while True:
+        msg = conn.recv()
+        if msg[0] == 'stop':
+            break
+        if msg[0] == 'config':
+            _, now, values = msg
+            for key, value in values.items():
+                setattr(Config, key, value)
+            for part in partitions.values():
+                part.advance(now)
+                part.resegment_all(now)
+            continue
+
+        _, now, flush, work = msg
+        replies = {}
+        for pid, (changes, removed) in work.items():
+            started = time.perf_counter()
+            part = partitions.get(pid)
+            if part is None:
+                part = partitions[pid] = ThermalPartition()
+
+            part.advance(now)
+            for rid in removed:
+                part.remove(rid)
+            for rid, key, current_temp in changes:
+                part.apply_state(rid, key, current_temp, now)
+            part.exchange_heat(now)
+            part.advance(now)
+            if flush:
+                part.flush(now)
+
+            replies[pid] = part.drain() + (time.perf_counter() - started,)
+        conn.send(replies)
+    conn.close()
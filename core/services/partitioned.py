@@ -0,0 +1,176 @@
+import multiprocessing
+import time
+from core.models import Room
+from core.services.config import Config
+from core.services.config_store import ConfigStore, THERMAL_KEYS
+from core.services.partition_worker import run_worker
+from core.services.simulation import SimulationEngine
+
+
+class PartitionedSimulationEngine(SimulationEngine):
+    """
+    Simulation engine for large properties on multi-core hosts.
+    Rooms are split into partitions by floor or zone, and partitions are spread
+    over a pool of worker processes that each advance their own ThermalPartitions.
+    The coordinator (this thread) does the DB sync, merges the results and sends
+    one ordered stream of requests/stops to the Scheduler.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        return super(PartitionedSimulationEngine, cls).__new__(cls)
+
+    def __init__(self, workers=None, partition_by=None, partition_size=None):
+        if self._initialized:
+            return
+        super(PartitionedSimulationEngine, self).__init__()
+        self.partition = None  # Thermal state lives in the workers
+        self.num_workers = workers or Config.SIM_WORKERS
+        self.partition_by = partition_by or Config.SIM_PARTITION_BY
+        self.partition_size = partition_size or Config.SIM_PARTITION_SIZE
+
+        self.workers = []          # [(process, connection)]
+        self.room_partition = {}   # room_id -> partition id
+        self.partition_worker = {} # partition id -> worker index
+        self.group_sizes = {}      # floor/zone -> rooms assigned so far
+        self.pending = {}          # room_id -> key to push on the next tick
+        self.partition_stats = {}  # partition id -> tick timings
+        self.ticks = 0
+
+    def start(self):
+        ctx = multiprocessing.get_context('spawn')
+        for _ in range(self.num_workers):
+            parent_conn, child_conn = ctx.Pipe()
+            proc = ctx.Process(target=run_worker, args=(child_conn,), daemon=True)
+            proc.start()
+            self.workers.append((proc, parent_conn))
+        # Workers start from the shipped defaults; send the overrides in effect
+        self._apply_thermal_config(time.time())
+        print(f"[Simulation] Partitioned engine: {self.num_workers} workers, "
+              f"by {self.partition_by}, {self.partition_size} rooms/partition.")
+        super(PartitionedSimulationEngine, self).start()
+
+    def stop(self):
+        super(PartitionedSimulationEngine, self).stop()
+        for proc, conn in self.workers:
+            try:
+                conn.send(('stop',))
+            except (OSError, BrokenPipeError):
+                pass
+            proc.join(timeout=2)
+        self.workers = []
+
+    def _sample_temperatures(self, now):
+        # Persisted values are at most SIM_FLUSH_INTERVAL old
+        return dict(Room.objects.values_list('room_id', 'current_temp'))
+
+    def temperature_at(self, room_id, t=None):
+        # Trajectories live in the worker processes; use the persisted value instead
+        return None
+
+    def _group_of(self, room_id):
+        # Partitions never mix hotels
+        hotel = self.hotels.get(room_id)
+        prefix = f"{hotel}/" if hotel else ''
+        try:
+            floor = int(room_id) // 100
+        except ValueError:
+            return f"{prefix}misc"
+        if self.partition_by == 'zone':
+            return f"{prefix}zone-{floor // Config.SIM_FLOORS_PER_ZONE}"
+        return f"{prefix}floor-{floor}"
+
+    def _assign(self, room_id):
+        pid = self.room_partition.get(room_id)
+        if pid is None:
+            group = self._group_of(room_id)
+            index = self.group_sizes.get(group, 0)
+            self.group_sizes[group] = index + 1
+            pid = f"{group}#{index // self.partition_size}"
+            self.room_partition[room_id] = pid
+            if pid not in self.partition_worker:
+                self.partition_worker[pid] = len(self.partition_worker) % self.num_workers
+                self.partition_stats[pid] = {'rooms': 0, 'last': 0.0, 'max': 0.0, 'total': 0.0, 'ticks': 0}
+            self.partition_stats[pid]['rooms'] += 1
+        return pid
+
+    def _apply_thermal_config(self, now):
+        values = {key: getattr(Config, key) for key in THERMAL_KEYS}
+        for _, conn in self.workers:
+            conn.send(('config', now, values))
+
+    def _update_rooms(self):
+        ConfigStore().refresh()
+        now = time.time()
+        if self._thermal_config_changed():
+            self._apply_thermal_config(now)
+        changed, removed = self._sync_states()
+
+        # Every partition advances each tick, even without state changes
+        work = [{} for _ in self.workers]
+        for pid, w in self.partition_worker.items():
+            work[w][pid] = ([], [])
+        for rid, key, current_temp in changed:
+            pid = self._assign(rid)
+            work[self.partition_worker[pid]].setdefault(pid, ([], []))[0].append((rid, key, current_temp))
+        for rid, key in self.pending.items():
+            pid = self.room_partition.get(rid)
+            if pid:
+                work[self.partition_worker[pid]][pid][0].append((rid, key, None))
+        self.pending = {}
+        for rid in removed:
+            self.history.forget(rid)
+            pid = self.room_partition.pop(rid, None)
+            if pid:
+                work[self.partition_worker[pid]][pid][1].append(rid)
+                self.partition_stats[pid]['rooms'] -= 1
+
+        flush = self._flush_due(now)
+        for (_, conn), msg in zip(self.workers, work):
+            conn.send(('tick', now, flush, msg))
+
+        temps, fees, statuses, actions, accruals = {}, {}, {}, [], {}
+        for _, conn in self.workers:
+            for pid, (p_temps, p_fees, p_statuses, p_actions, p_accruals, elapsed) in conn.recv().items():
+                temps.update(p_temps)
+                fees.update(p_fees)
+                statuses.update(p_statuses)
+                actions.extend(p_actions)
+                accruals.update(p_accruals)
+                self._record(pid, elapsed)
+
+        self._persist(temps, fees, statuses, accruals)
+        for rid, status in self._dispatch(actions):
+            key = self._key_after_request(rid, status)
+            if key:
+                self.pending[rid] = key
+
+        self.ticks += 1
+        if Config.SIM_REPORT_INTERVAL and self.ticks % Config.SIM_REPORT_INTERVAL == 0:
+            self._report()
+
+    def _record(self, pid, elapsed):
+        stats = self.partition_stats[pid]
+        stats['last'] = elapsed
+        stats['max'] = max(stats['max'], elapsed)
+        stats['total'] += elapsed
+        stats['ticks'] += 1
+
+    def tick_report(self):
+        report = []
+        for pid, s in sorted(self.partition_stats.items()):
+            avg = s['total'] / s['ticks'] if s['ticks'] else 0.0
+            report.append({
+                'partition': pid,
+                'worker': self.partition_worker[pid],
+                'rooms': s['rooms'],
+                'last_ms': s['last'] * 1000,
+                'avg_ms': avg * 1000,
+                'max_ms': s['max'] * 1000,
+            })
+        return report
+
+    def _report(self):
+        for r in self.tick_report():
+            print(f"[Simulation] {r['partition']} (worker {r['worker']}): {r['rooms']} rooms, "
+                  f"last {r['last_ms']:.2f}ms, avg {r['avg_ms']:.2f}ms, max {r['max_ms']:.2f}ms")
@@ -0,0 +1,285 @@
+from core.services.config import Config
+from core.services import journal as jr
+
+INFINITE_TIMEOUT = 999999
+
+
+class RoomView:
+    """Snapshot of a room as seen by a scheduling policy."""
+    __slots__ = ('room_id', 'fan_speed', 'priority', 'service_time', 'wait_timeout', 'waited', 'temp_delta')
+
+    def __init__(self, room_id, fan_speed, service_time=0.0, wait_timeout=INFINITE_TIMEOUT, waited=0.0, temp_delta=0.0):
+        self.room_id = room_id
+        self.fan_speed = fan_speed
+        self.priority = speed_priority(fan_speed)
+        self.service_time = service_time
+        self.wait_timeout = wait_timeout
+        self.waited = waited
+        self.temp_delta = temp_delta
+
+
+def speed_priority(fan_speed):
+    return Config.SPEED_PRIORITY.get(fan_speed, 0)
+
+
+class ServingIndex:
+    """
+    Serving rooms grouped by fan speed, each group ordered by service start
+    (longest served first). Kept up to date by the Scheduler, so a policy can
+    tell whether anyone is served at a lower or equal priority, and who has
+    been served longest, without room views. There are only a few fan speeds,
+    so every lookup is constant time.
+    """
+
+    def __init__(self):
+        self.groups = {}  # fan_speed -> {room_id: (service start, admission seq)}, oldest first
+        self.speeds = {}  # room_id -> fan_speed
+        self._seq = 0     # Breaks ties in admission order, like the serving queue
+
+    def add(self, room_id, fan_speed, start):
+        if room_id in self.speeds:
+            if self.speeds[room_id] == fan_speed:
+                return
+            key = self.groups[self.speeds[room_id]][room_id]
+            self.remove(room_id)
+        else:
+            self._seq += 1
+            key = (start, self._seq)
+        group = self.groups.setdefault(fan_speed, {})
+        newest = next(reversed(group.values()), None)
+        group[room_id] = key
+        self.speeds[room_id] = fan_speed
+        if newest is not None and key < newest:
+            # Restored rooms or a fan speed change: keep the group in service order
+            self.groups[fan_speed] = dict(sorted(group.items(), key=lambda item: item[1]))
+
+    def remove(self, room_id):
+        if room_id in self.speeds:
+            del self.groups[self.speeds.pop(room_id)][room_id]
+
+    def count_at(self, priority):
+        return sum(len(group) for speed, group in self.groups.items() if speed_priority(speed) == priority)
+
+    def lowest_priority(self):
+        """Lowest priority being served, or None if nobody is."""
+        priorities = [speed_priority(speed) for speed, group in self.groups.items() if group]
+        return min(priorities) if priorities else None
+
+    def longest_served_at(self, priority):
+        """Room served longest among those at this priority."""
+        heads = [(next(iter(group.values())), next(iter(group))) for speed, group in self.groups.items()
+                 if group and speed_priority(speed) == priority]
+        return min(heads, key=lambda head: head[0])[1] if heads else None
+
+
+class Preempt:
+    def __init__(self, victim_id, victim_timeout, reason=jr.REASON_PREEMPTED):
+        self.victim_id = victim_id
+        self.victim_timeout = victim_timeout
+        self.reason = reason
+
+
+class Wait:
+    def __init__(self, timeout, reason):
+        self.timeout = timeout
+        self.reason = reason
+
+
+class SchedulingPolicy:
+    """
+    Decides what the Scheduler does when capacity is full.
+    on_full_capacity(): a new request arrives and all slots are taken -> Preempt or Wait
+    pick_waiter():      a slot was freed -> room_id of the waiter to admit
+    pick_swap():        a waiter's timeout expired -> room_id of the serving victim, or None
+    on_admit()/on_release() let stateful policies track service history.
+    """
+    name = None
+    config = Config  # Replaced by a hotel's Config (see core.services.tenancy)
+
+    def on_full_capacity(self, request, serving):
+        raise NotImplementedError
+
+    def on_full_capacity_indexed(self, fan_speed, serving):
+        """
+        The on_full_capacity() decision for a request at this fan speed, taken
+        from the ServingIndex alone; None if the policy needs room views.
+        """
+        return None
+
+    def pick_waiter(self, waiting):
+        raise NotImplementedError
+
+    def pick_swap(self, waiter, serving):
+        raise NotImplementedError
+
+    def swap_timeout(self):
+        return self.config.TIME_SLICE
+
+    def on_admit(self, room_id, clock):
+        pass
+
+    def on_release(self, room_id, clock):
+        pass
+
+
+class PriorityTimeSlicePolicy(SchedulingPolicy):
+    """Default: priority preemption by SPEED_PRIORITY, then TIME_SLICE round robin."""
+    name = 'priority_time_slice'
+
+    def on_full_capacity(self, request, serving):
+        # 2.1 Check for Lower Priority (Higher Speed > Lower Speed)
+        lower_prio_rooms = [r for r in serving if r.priority < request.priority]
+        if lower_prio_rooms:
+            # Rule: Lowest speed first. If speeds equal, longest service time.
+            victim = min(lower_prio_rooms, key=lambda r: (r.priority, -r.service_time))
+            # Victim gets infinite timeout because it was kicked by higher priority
+            return Preempt(victim.room_id, INFINITE_TIMEOUT)
+
+        # 2.2 Equal priority: Time Slice Strategy
+        if any(r.priority == request.priority for r in serving):
+            return Wait(self.config.TIME_SLICE, jr.REASON_TIME_SLICE)
+
+        # 2.3 Lower Priority (Request < Serving): must wait
+        return Wait(INFINITE_TIMEOUT, jr.REASON_LOW_PRIORITY)
+
+    def on_full_capacity_indexed(self, fan_speed, serving):
+        # Same rules as above, from the per-speed counts
+        priority = speed_priority(fan_speed)
+        lowest = serving.lowest_priority()
+        if lowest is not None and lowest < priority:
+            return Preempt(serving.longest_served_at(lowest), INFINITE_TIMEOUT)
+        if serving.count_at(priority):
+            return Wait(self.config.TIME_SLICE, jr.REASON_TIME_SLICE)
+        return Wait(INFINITE_TIMEOUT, jr.REASON_LOW_PRIORITY)
+
+    def pick_waiter(self, waiting):
+        # Highest priority, then smallest remaining timeout (waited longest in slice logic)
+        return min(waiting, key=lambda r: (-r.priority, r.wait_timeout)).room_id
+
+    def pick_swap(self, waiter, serving):
+        # Serving room with SAME speed and longest service time
+        candidates = [r for r in serving if r.priority == waiter.priority]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda r: r.service_time).room_id
+
+
+class WeightedFairPolicy(SchedulingPolicy):
+    """
+    Weighted fair queuing: each room's virtual time is its accumulated service
+    divided by its weight (SPEED_PRIORITY). Requests never preempt directly;
+    every waiter gets a time slice and then replaces the serving room that is
+    furthest ahead in virtual time. Freed slots go to the least-served waiter.
+    """
+    name = 'weighted_fair'
+
+    def __init__(self):
+        self.served = {}       # room_id -> accumulated service seconds
+        self.admitted_at = {}  # room_id -> clock at admission
+
+    def _virtual(self, r):
+        return (self.served.get(r.room_id, 0.0) + r.service_time) / max(r.priority, 1)
+
+    def on_full_capacity(self, request, serving):
+        return Wait(self.config.TIME_SLICE, jr.REASON_TIME_SLICE)
+
+    def on_full_capacity_indexed(self, fan_speed, serving):
+        return Wait(self.config.TIME_SLICE, jr.REASON_TIME_SLICE)
+
+    def pick_waiter(self, waiting):
+        return min(waiting, key=lambda r: (self._virtual(r), r.wait_timeout)).room_id
+
+    def pick_swap(self, waiter, serving):
+        if not serving:
+            return None
+        victim = max(serving, key=self._virtual)
+        if self._virtual(victim) <= self._virtual(waiter):
+            return None
+        return victim.room_id
+
+    def on_admit(self, room_id, clock):
+        self.admitted_at[room_id] = clock
+
+    def on_release(self, room_id, clock):
+        start = self.admitted_at.pop(room_id, None)
+        if start is not None:
+            self.served[room_id] = self.served.get(room_id, 0.0) + (clock - start)
+
+
+class ShortestDeltaFirstPolicy(SchedulingPolicy):
+    """
+    Shortest-remaining-delta-first: rooms closest to their target temperature
+    are served first, since they free their slot soonest. Waiters still get a
+    time slice so rooms far from target are not starved.
+    """
+    name = 'shortest_delta'
+
+    def on_full_capacity(self, request, serving):
+        if not serving:
+            # Nothing to preempt (e.g. a power budget too small for this fan speed)
+            return Wait(self.config.TIME_SLICE, jr.REASON_TIME_SLICE)
+        victim = max(serving, key=lambda r: (r.temp_delta, r.service_time))
+        if request.temp_delta < victim.temp_delta:
+            return Preempt(victim.room_id, self.config.TIME_SLICE)
+        return Wait(self.config.TIME_SLICE, jr.REASON_TIME_SLICE)
+
+    def pick_waiter(self, waiting):
+        return min(waiting, key=lambda r: (r.temp_delta, r.wait_timeout)).room_id
+
+    def pick_swap(self, waiter, serving):
+        if not serving:
+            return None
+        return max(serving, key=lambda r: (r.temp_delta, r.service_time)).room_id
+
+
+class AgedPriorityPolicy(PriorityTimeSlicePolicy):
+    """
+    Priority preemption where a waiter's priority grows by one level every
+    AGING_SECONDS spent waiting, so low fan speeds cannot starve behind a
+    steady stream of high-speed requests.
+    """
+    name = 'aged_priority'
+
+    def _aged(self, r):
+        return r.priority + r.waited / self.config.AGING_SECONDS
+
+    def on_full_capacity(self, request, serving):
+        return self._aging_wait(super(AgedPriorityPolicy, self).on_full_capacity(request, serving))
+
+    def on_full_capacity_indexed(self, fan_speed, serving):
+        return self._aging_wait(super(AgedPriorityPolicy, self).on_full_capacity_indexed(fan_speed, serving))
+
+    def _aging_wait(self, decision):
+        if isinstance(decision, Wait):
+            # Re-check periodically so aging can take effect
+            return Wait(min(decision.timeout, self.config.AGING_SECONDS), decision.reason)
+        return decision
+
+    def pick_waiter(self, waiting):
+        return max(waiting, key=lambda r: (self._aged(r), r.waited)).room_id
+
+    def pick_swap(self, waiter, serving):
+        if not serving:
+            return None
+        victim = min(serving, key=lambda r: (r.priority, -r.service_time))
+        if self._aged(waiter) >= victim.priority:
+            return victim.room_id
+        return None
+
+
+POLICIES = {
+    PriorityTimeSlicePolicy.name: PriorityTimeSlicePolicy,
+    WeightedFairPolicy.name: WeightedFairPolicy,
+    ShortestDeltaFirstPolicy.name: ShortestDeltaFirstPolicy,
+    AgedPriorityPolicy.name: AgedPriorityPolicy,
+}
+
+
+def get_policy(name=None, config=Config):
+    name = name or config.SCHEDULING_POLICY
+    try:
+        policy = POLICIES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown scheduling policy: {name}")
+    policy.config = config
+    return policy
@@ -0,0 +1,47 @@
+"""
+Power budget of the central AC unit. When Config.POWER_BUDGET is set, the
+Scheduler admits rooms while the summed FAN_POWER of serving rooms fits the
+budget, instead of a fixed MAX_SERVING_ROOMS slot count.
+"""
+from core.services.config import Config
+
+# Tolerance for float sums of fan power
+EPSILON = 1e-9
+
+
+def fan_power(fan_speed, config=Config):
+    """Power drawn by one serving room at this fan speed (unknown speeds count as the largest)."""
+    return config.FAN_POWER.get(fan_speed, max(config.FAN_POWER.values()))
+
+
+def minimum_budget(config=Config):
+    """Smallest usable budget: one room at the largest fan power. Below it a room could never be admitted."""
+    return max(config.FAN_POWER.values())
+
+
+def parse_time_of_day(value):
+    """'HH:MM' -> seconds since midnight."""
+    hours, minutes = value.split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time of day: {value}")
+    return hours * 3600 + minutes * 60
+
+
+def budget_at(seconds_of_day, config=Config):
+    """
+    Budget in effect at a time of day: the last POWER_SCHEDULE entry starting
+    at or before it (wrapping around midnight), else POWER_BUDGET.
+    None means no budget (fixed MAX_SERVING_ROOMS slots). A budget below
+    minimum_budget() (e.g. after FAN_POWER was raised) is clamped to it.
+    """
+    if not config.POWER_SCHEDULE:
+        current = config.POWER_BUDGET
+    else:
+        schedule = sorted((parse_time_of_day(start), budget) for start, budget in config.POWER_SCHEDULE)
+        current = schedule[-1][1]
+        for start, budget in schedule:
+            if start > seconds_of_day:
+                break
+            current = budget
+    return None if current is None else max(current, minimum_budget(config))
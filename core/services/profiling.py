@@ -0,0 +1,268 @@
+"""
+On-demand profiling of the simulation tick, the scheduler loop and a sampled
+fraction of HTTP requests. `manage.py profile start ...` writes a request to
+settings.PROFILE_DIR; the running server picks it up within a second
+(Profiler().poll()), profiles the next N sections of that target and writes
+the result next to the request. A result holds the sampled call stacks of the
+profiled threads in folded form ("frame;frame;frame count", the input of
+flamegraph.pl, speedscope and inferno) and the count and time of every SQL
+statement run inside the sections, which is where ORM, SQLite lock waits and
+print() I/O show up. With nothing requested a section costs one dict lookup.
+"""
+import datetime
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from core.services.config import Config
+
+TARGETS = ('simulation', 'scheduler', 'requests')
+REQUEST_FILE = 'request.json'
+
+
+def profile_dir():
+    from django.conf import settings
+    path = getattr(settings, 'PROFILE_DIR', None)
+    return str(path) if path else None
+
+
+def result_path(directory, session_id, target):
+    return os.path.join(directory, f'{session_id}-{target}.json')
+
+
+def _frame_label(code):
+    path = code.co_filename.replace('\\', '/').split('/')
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+class Session:
+    """One requested profile of a target, merged over all its sections."""
+
+    def __init__(self, target, session_id, sections, rate=1.0):
+        self.target = target
+        self.id = session_id
+        self.remaining = sections
+        self.rate = rate  # Fraction of sections profiled (requests)
+        self.started = time.time()
+        self.durations = []
+        self.stacks = Counter()  # folded stack -> samples
+        self.queries = {}        # sql -> [count, total seconds, max seconds]
+        self.lock = threading.Lock()
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                entry = self.queries.setdefault(sql, [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] = max(entry[2], elapsed)
+
+    def end_section(self, elapsed):
+        """Record one finished section; True when it was the last one requested."""
+        with self.lock:
+            self.durations.append(elapsed)
+            self.remaining -= 1
+            return self.remaining == 0
+
+    def result(self):
+        with self.lock:
+            durations = list(self.durations)
+            queries = sorted(self.queries.items(), key=lambda item: -item[1][1])
+            return {
+                'id': self.id,
+                'target': self.target,
+                'started': datetime.datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                'sections': len(durations),
+                'total_ms': sum(durations) * 1000,
+                'mean_ms': sum(durations) / len(durations) * 1000 if durations else 0.0,
+                'max_ms': max(durations) * 1000 if durations else 0.0,
+                'sample_interval': Config.PROFILE_SAMPLE_INTERVAL,
+                'samples': sum(self.stacks.values()),
+                'stacks': dict(self.stacks),
+                'queries': [{'sql': sql, 'count': count, 'total_ms': total * 1000, 'max_ms': longest * 1000}
+                            for sql, (count, total, longest) in queries],
+            }
+
+
+class Section:
+    def __init__(self, profiler, session, label):
+        self.profiler = profiler
+        self.session = session
+        self.label = label
+
+    def __enter__(self):
+        from django.db import connection
+        self.queries = connection.execute_wrapper(self.session.query_wrapper)
+        self.queries.__enter__()
+        self.previous = self.profiler._enter(self.session, sys._getframe(1), self.label)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        self.profiler._leave(self.previous)
+        self.queries.__exit__(*exc)
+        if self.session.end_section(elapsed):
+            self.profiler._finish(self.session)
+        return False
+
+
+class Profiler:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(Profiler, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.sessions = {}  # target -> Session being recorded
+        self.active = {}    # thread id -> (Session, frame that entered the section, label)
+        self.sampler = None
+        self.version = None
+        self.last_poll = 0.0
+        self._state_lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+
+    def poll(self, force=False):
+        """Start (or stop) the profiles requested since the last call; at most once per second."""
+        now = time.monotonic()
+        if not force and now - self.last_poll < 1.0:
+            return
+        if not self._poll_lock.acquire(blocking=False):
+            return
+        try:
+            self.last_poll = now
+            directory = profile_dir()
+            if not directory:
+                return
+            path = os.path.join(directory, REQUEST_FILE)
+            try:
+                st = os.stat(path)
+                version = st.st_mtime_ns, st.st_size
+            except FileNotFoundError:
+                version = None
+            if version == self.version:
+                return
+            self.version = version
+            requests = {}
+            if version is not None:
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        requests = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"[Profile] Error reading {path}: {e}")
+                    return
+            for target, session in list(self.sessions.items()):
+                if requests.get(target, {}).get('id') != session.id:
+                    self._finish(session)  # Stopped: write what was collected
+            for target, request in requests.items():
+                if target not in TARGETS or target in self.sessions:
+                    continue
+                if os.path.exists(result_path(directory, request['id'], target)):
+                    continue  # Finished before (e.g. by a previous server process)
+                self._begin(Session(target, request['id'], request['sections'], request.get('rate', 1.0)))
+        finally:
+            self._poll_lock.release()
+
+    def section(self, target, label=None):
+        """Context manager around one tick / pass / request of a target."""
+        session = self.sessions.get(target)
+        if session is None or (session.rate < 1.0 and random.random() >= session.rate):
+            return nullcontext()
+        return Section(self, session, label or target)
+
+    def profiling(self, target):
+        return target in self.sessions
+
+    def _begin(self, session):
+        with self._state_lock:
+            self.sessions[session.target] = session
+            if self.sampler is None:
+                self.sampler = threading.Thread(target=self._sample_loop, daemon=True)
+                self.sampler.start()
+        rate = f", {session.rate:.0%} sampled" if session.rate < 1.0 else ''
+        print(f"[Profile] Profiling {session.remaining} {session.target} sections{rate}")
+
+    def _finish(self, session):
+        with self._state_lock:
+            if self.sessions.get(session.target) is not session:
+                return
+            del self.sessions[session.target]
+        directory = profile_dir()
+        result = session.result()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = result_path(directory, session.id, session.target)
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[Profile] Error writing profile {session.id}: {e}")
+            return
+        print(f"[Profile] Wrote {path}: {result['sections']} sections, {result['samples']} samples")
+
+    def _enter(self, session, frame, label):
+        tid = threading.get_ident()
+        with self._state_lock:
+            previous = self.active.get(tid)
+            self.active[tid] = (session, frame, label)
+        return previous
+
+    def _leave(self, previous):
+        tid = threading.get_ident()
+        with self._state_lock:
+            if previous is None:
+                self.active.pop(tid, None)
+            else:
+                self.active[tid] = previous
+
+    def _sample_loop(self):
+        while True:
+            with self._state_lock:
+                if not self.sessions and not self.active:
+                    self.sampler = None
+                    return
+                active = list(self.active.items())
+            frames = sys._current_frames()
+            for tid, (session, entry, label) in active:
+                frame = frames.get(tid)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    if frame is entry:
+                        break
+                    frame = frame.f_back
+                else:
+                    continue  # The thread left the section meanwhile
+                stack.append(label)
+                with session.lock:
+                    session.stacks[';'.join(reversed(stack))] += 1
+            del frames
+            time.sleep(Config.PROFILE_SAMPLE_INTERVAL)
+
+
+def load_result(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def folded(result):
+    """Folded stack lines, most sampled first."""
+    return [f'{stack} {count}' for stack, count in sorted(result['stacks'].items(), key=lambda item: -item[1])]
@@ -0,0 +1,164 @@
+import csv
+import json
+import time
+from django.db import transaction
+from core.models import Room, Hotel
+
+# Columns that a room definition may set. Runtime columns (temperature,
+# fees, scheduler state) are never touched by provisioning.
+ROOM_FIELDS = ('hotel', 'room_type', 'daily_rate', 'username', 'password')
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def iter_room_rows(path, fmt=None):
+    """
+    Stream room definitions from a CSV, JSON or JSON-lines file.
+    Yields one dict per room. The format is guessed from the extension if not given.
+    """
+    if fmt is None:
+        lower = str(path).lower()
+        if lower.endswith('.csv'):
+            fmt = 'csv'
+        elif lower.endswith('.jsonl') or lower.endswith('.ndjson'):
+            fmt = 'jsonl'
+        else:
+            fmt = 'json'
+
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            for row in csv.DictReader(f):
+                yield row
+        elif fmt == 'jsonl':
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            data = json.load(f)
+            if isinstance(data, dict):
+                data = data.get('rooms', [])
+            for row in data:
+                yield row
+
+
+def build_room(row, hotel=None):
+    """(Room, fields the row sets): only those are written to an existing room."""
+    room_id = str(row.get('room_id') or '').strip()
+    if not room_id:
+        raise ValueError(f"Missing room_id: {row}")
+
+    # Room ids are unique across hotels; `hotel` is the default for rows without one
+    room = Room(room_id=room_id, hotel_id=str(row.get('hotel') or '').strip() or hotel)
+    fields = {'hotel'} if room.hotel_id else set()
+    # Floor is derived from the room number (room_id // 100), same as the dashboard.
+    if row.get('floor') not in (None, '') and room_id.isdigit():
+        if int(room_id) // 100 != int(row['floor']):
+            raise ValueError(f"Room {room_id} does not belong to floor {row['floor']}")
+
+    if row.get('room_type'):
+        room.room_type = str(row['room_type']).upper()
+        fields.add('room_type')
+    if row.get('daily_rate') not in (None, ''):
+        room.daily_rate = float(row['daily_rate'])
+        fields.add('daily_rate')
+    if row.get('username'):
+        room.username = str(row['username'])
+        fields.add('username')
+    if row.get('password'):
+        room.password = str(row['password'])
+        fields.add('password')
+    return room, frozenset(fields)
+
+
+def upsert_rooms(rows, batch_size=DEFAULT_BATCH_SIZE, progress=None, hotel=None):
+    """
+    Insert or update rooms with bulk_create in batches, in one transaction:
+    an error anywhere (bad row, hotel collision) leaves the rooms unchanged.
+    Existing rooms keep their runtime state and every column the input does
+    not set; only the ROOM_FIELDS a row gives are overwritten. Room ids and
+    usernames identify a room across all hotels, so a room that belongs to
+    another hotel, appears under two hotels, or a username another room has
+    is an error. Hotels named by the rows (or `hotel`) are created if missing.
+    Returns (count, elapsed_seconds).
+    """
+    started = time.perf_counter()
+    count = 0
+    batch = []
+    hotel_of = {}  # room_id -> hotel given by an earlier row of this import
+    login_of = {}  # username -> room_id given by an earlier row of this import
+    with transaction.atomic():
+        for row in rows:
+            batch.append(build_room(row, hotel))
+            if len(batch) >= batch_size:
+                count += _flush(batch, hotel_of, login_of)
+                batch = []
+                if progress:
+                    progress(count, time.perf_counter() - started)
+        if batch:
+            count += _flush(batch, hotel_of, login_of)
+            if progress:
+                progress(count, time.perf_counter() - started)
+    return count, time.perf_counter() - started
+
+
+def _check_hotels(batch, hotel_of):
+    """Raise ValueError for rooms this batch would move to another hotel."""
+    placed = [room for room, fields in batch if 'hotel' in fields]
+    twice = []
+    for room in placed:
+        previous = hotel_of.setdefault(room.room_id, room.hotel_id)
+        if previous != room.hotel_id:
+            twice.append(f"{room.room_id} ({previous}, {room.hotel_id})")
+    if twice:
+        raise ValueError(f"Room ids are unique across hotels; listed for two hotels: {_some(twice)}. "
+                         f"Nothing was imported.")
+    if placed:
+        current = dict(Room.objects.filter(room_id__in=[room.room_id for room in placed])
+                       .values_list('room_id', 'hotel_id'))
+        moved = [f"{room.room_id} ({current[room.room_id] or 'default'} -> {room.hotel_id})"
+                 for room in placed if room.room_id in current and current[room.room_id] != room.hotel_id]
+        if moved:
+            raise ValueError(f"Room ids are unique across hotels; these belong to another hotel: {_some(moved)}. "
+                             f"Nothing was imported.")
+
+
+def _check_logins(batch, login_of):
+    """Raise ValueError for usernames this batch gives to two rooms."""
+    named = [room for room, fields in batch if 'username' in fields]
+    twice = []
+    for room in named:
+        previous = login_of.setdefault(room.username, room.room_id)
+        if previous != room.room_id:
+            twice.append(f"{room.username} ({previous}, {room.room_id})")
+    if named:
+        taken = Room.objects.filter(username__in=[room.username for room in named]).exclude(
+            room_id__in=[room.room_id for room in named]).values_list('username', 'room_id')
+        twice += [f"{username} ({room_id}, {login_of[username]})" for username, room_id in taken]
+    if twice:
+        raise ValueError(f"Usernames are unique across hotels; given to two rooms: {_some(twice)}. "
+                         f"Nothing was imported.")
+
+
+def _some(items, limit=20):
+    return ', '.join(items[:limit]) + (f' and {len(items) - limit} more' if len(items) > limit else '')
+
+
+def _flush(batch, hotel_of, login_of):
+    _check_hotels(batch, hotel_of)
+    _check_logins(batch, login_of)
+    hotels = {room.hotel_id for room, _ in batch if room.hotel_id}
+    if hotels:
+        Hotel.objects.bulk_create([Hotel(code=code) for code in hotels], ignore_conflicts=True)
+    # One statement per set of given columns (usually the whole batch)
+    groups = {}
+    for room, fields in batch:
+        groups.setdefault(fields, []).append(room)
+    for fields, rooms in groups.items():
+        if fields:
+            Room.objects.bulk_create(rooms, update_conflicts=True, unique_fields=['room_id'],
+                                     update_fields=[f for f in ROOM_FIELDS if f in fields])
+        else:
+            # Nothing to update: only rooms that do not exist yet are created
+            Room.objects.bulk_create(rooms, ignore_conflicts=True)
+    return len(batch)
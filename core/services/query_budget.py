@@ -0,0 +1,194 @@
+"""
+Query-count and wall-time budgets for every page and API in core/urls.py and
+for one scheduler and simulation tick (manage.py query_budget).
+Each scenario runs against seeded data at several scales (rooms, with bills
+and AC sessions in proportion), so a change that adds a query per room or per
+session (N+1) shows up as growth between scales and fails its budget.
+Budgets are (queries, queries per room, milliseconds, milliseconds per
+room): each budget is base + per_room * rooms; per_room is non-zero only
+where the cost is linear on purpose and documented next to the budget, so a
+page that grows with the data set without being meant to (loading every
+bill, say) fails at the larger scales. Both query counts and times fail the
+check; the times are wall-clock, so slower machines scale them with
+--time-factor.
+"""
+import datetime
+import json
+import time
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core.services.config import Config
+
+ROOMS_PER_FLOOR = 20
+
+BUDGETS = {
+    # name: (queries, per room, ms, ms per room); ms per room only where the work is linear on purpose
+    'login': (0, 0, 100, 0),
+    'login_post': (9, 0, 1500, 0),  # Password hashing dominates the time
+    'logout': (4, 0, 100, 0),
+    'index': (5, 0, 150, 0.5),  # Renders every room
+    'monitor': (2, 0, 100, 0),
+    'checkin': (3, 0, 100, 0.2),  # Lists every empty room
+    'checkout': (3, 0, 100, 0.2),  # Lists every occupied room
+    'bill_history': (4, 0, 300, 0),  # One page, whatever the number of bills
+    'bill_detail': (5, 0, 200, 0),
+    'customer': (3, 0, 100, 0),
+    # Served from the snapshot the simulation publishes; one query if it is older than MONITOR_SNAPSHOT_MAX_AGE
+    'api_room_status': (1, 0, 100, 0.05),
+    'api_room_detail': (1, 0, 100, 0),
+    'api_room_history': (1, 0, 100, 0),
+    'api_control_room': (9, 0, 200, 0),
+    'api_checkin': (2, 0, 100, 0),
+    'api_checkout': (8, 0, 300, 0),
+    'api_group_checkin': (4, 0, 300, 0),
+    # Plus the scheduler promoting waiting rooms into the freed slots: at most MAX_SERVING_ROOMS updates
+    'api_group_checkout': (10 + Config.MAX_SERVING_ROOMS, 0, 300, 0.5),
+    'api_scheduler_queues': (2, 0, 100, 0.1),  # Lists every queued room
+    'api_scheduler_metrics': (1, 0, 100, 0),
+    'api_export': (5, 0.002, 200, 0.5),  # One query per export CHUNK_SIZE bills, hot and archived
+    # Queued rooms' service_time / wait_timeout: one UPDATE per queue and scheduler.TIMER_BATCH rooms
+    'scheduler_tick': (3, 0.002, 100, 1.0),
+    'simulation_tick': (3, 0, 100, 0.1),
+}
+
+
+def room_id(i):
+    return str(100 * (1 + i // ROOMS_PER_FLOOR) + 1 + i % ROOMS_PER_FLOOR)
+
+
+def seed(rooms, bills_per_room=2, sessions_per_bill=3):
+    """
+    Seed `rooms` rooms: half occupied with the AC on (three serving, the
+    rest waiting) and two closed sessions since check-in, the other half
+    empty; every room has bills_per_room settled bills with their sessions.
+    """
+    from django.contrib.auth.models import User
+    from core.models import Room, Bill, ACSession
+    now = timezone.now()
+    User.objects.create_user('budget', password='budget', is_staff=True)
+    occupied = rooms // 2
+    Room.objects.bulk_create([
+        Room(room_id=room_id(i), username=f'guest{i}', password='guest', current_temp=27.0, target_temp=23.0,
+             occupancy_status='OCCUPIED' if i < occupied else 'EMPTY',
+             guest_id=f'G{i}' if i < occupied else None,
+             check_in_time=now - datetime.timedelta(days=2) if i < occupied else None,
+             is_on=i < occupied, fee=3.0 if i < occupied else 0.0,
+             status=('SERVING' if i < Config.MAX_SERVING_ROOMS else 'WAITING') if i < occupied else 'IDLE',
+             wait_timeout=Config.TIME_SLICE if Config.MAX_SERVING_ROOMS <= i < occupied else 0.0)
+        for i in range(rooms)
+    ], batch_size=1000)
+    Bill.objects.bulk_create([
+        Bill(room_id=room_id(i), guest_id=f'OLD{i}-{b}',
+             check_in_time=now - datetime.timedelta(days=10 * (b + 1) + 3),
+             check_out_time=now - datetime.timedelta(days=10 * (b + 1)),
+             ac_fee=6.0, accommodation_fee=300.0, total_amount=306.0)
+        for i in range(rooms) for b in range(bills_per_room)
+    ], batch_size=1000)
+    sessions = []
+    for bill in Bill.objects.all():
+        for s in range(sessions_per_bill):
+            start = bill.check_in_time + datetime.timedelta(hours=s)
+            sessions.append(ACSession(room_id=bill.room_id, bill=bill, start_time=start,
+                                      end_time=start + datetime.timedelta(minutes=30),
+                                      mode='COOL', fan_speed='MID', start_temp=27.0, target_temp=23.0, fee=2.0))
+    for i in range(occupied):
+        for s in range(3):
+            start = now - datetime.timedelta(hours=3 - s)
+            sessions.append(ACSession(room_id=room_id(i), start_time=start,
+                                      end_time=None if s == 2 else start + datetime.timedelta(minutes=30),
+                                      mode='COOL', fan_speed='MID', start_temp=27.0, target_temp=23.0,
+                                      fee=0.0 if s == 2 else 1.5, initial_fee=3.0 if s == 2 else 0.0))
+    # auto_now_add stamps check_out_time / start_time with now; only counts and links matter here
+    ACSession.objects.bulk_create(sessions, batch_size=1000)
+    return {'occupied': occupied, 'bill': Bill.objects.order_by('id').values_list('id', flat=True).last()}
+
+
+def scenarios(rooms, data):
+    """(name, callable(client)) for every URL in core/urls.py; requests change state, so order matters."""
+    occupied = data['occupied']
+    busy = room_id(occupied - 1)   # Occupied, AC on, waiting
+    other = room_id(occupied - 2)
+    empty = room_id(rooms - 1)
+    # Up to 60 of the other empty rooms check in as a group, then leave with up to 30 occupied ones
+    arriving = [room_id(i) for i in range(occupied, min(rooms - 1, occupied + 60))]
+    leaving = arriving + [room_id(i) for i in range(min(occupied - 2, 30))]
+    post = lambda client, name, body, *args: client.post(reverse(name, args=args), json.dumps(body),
+                                                         content_type='application/json')
+    return [
+        ('login', lambda c: c.get(reverse('core:login'))),
+        ('login_post', lambda c: c.post(reverse('core:login'), {'username': 'budget', 'password': 'budget'})),
+        ('index', lambda c: c.get(reverse('core:index'))),
+        ('monitor', lambda c: c.get(reverse('core:monitor'))),
+        ('checkin', lambda c: c.get(reverse('core:checkin'))),
+        ('checkout', lambda c: c.get(reverse('core:checkout'))),
+        ('bill_history', lambda c: c.get(reverse('core:bill_history'))),
+        ('bill_detail', lambda c: c.get(reverse('core:bill_detail', args=[data['bill']]))),
+        ('customer', lambda c: c.get(reverse('core:customer', args=[busy]))),
+        ('api_room_status', lambda c: c.get(reverse('core:api_room_status'))),
+        ('api_room_detail', lambda c: c.get(reverse('core:api_room_detail', args=[busy]))),
+        ('api_room_history', lambda c: c.get(reverse('core:api_room_history', args=[busy]))),
+        ('api_control_room', lambda c: post(c, 'core:api_control_room', {'fan_speed': 'HIGH'}, busy)),
+        ('api_checkin', lambda c: post(c, 'core:api_checkin', {'room_id': empty, 'guest_id': 'NEW'})),
+        ('api_checkout', lambda c: post(c, 'core:api_checkout', {'room_id': other})),
+        ('api_group_checkin', lambda c: post(c, 'core:api_group_checkin',
+                                             {'guests': [{'room_id': r, 'guest_id': f'T{r}'} for r in arriving]})),
+        ('api_group_checkout', lambda c: post(c, 'core:api_group_checkout', {'room_ids': leaving})),
+        ('api_scheduler_queues', lambda c: c.get(reverse('core:api_scheduler_queues'))),
+        ('api_scheduler_metrics', lambda c: c.get(reverse('core:api_scheduler_metrics'))),
+        ('api_export', lambda c: b''.join(c.get(reverse('core:api_export', args=['bills'])).streaming_content)),
+        ('logout', lambda c: c.post(reverse('core:logout'))),
+    ]
+
+
+def measure(fn):
+    """(queries, milliseconds) of one call."""
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - started) * 1000
+    return len(ctx.captured_queries), elapsed
+
+
+def run_scale(rooms):
+    """{name: (queries, ms)} of every scenario with `rooms` rooms seeded (needs an empty test database)."""
+    from django.test import Client
+    from core.services.read_model import MonitorReadModel
+    from core.services.scheduler import Scheduler
+    from core.services.simulation import SimulationEngine
+    data = seed(rooms)
+    # Fresh engine state for this data set, as after a server start
+    Scheduler._instances.clear()
+    SimulationEngine._instance = None
+    scheduler = Scheduler()
+    engine = SimulationEngine()
+    engine._update_rooms()  # First tick loads every room; measure the steady state
+    MonitorReadModel().publish()
+
+    results = {
+        'scheduler_tick': measure(scheduler._tick),
+        'simulation_tick': measure(engine._update_rooms),
+    }
+    client = Client()
+    for name, fn in scenarios(rooms, data):
+        results[name] = measure(lambda: fn(client))
+    return results
+
+
+def over_budget(name, rooms, queries):
+    """Why a result breaks its query budget, or None."""
+    base, per_room, _, _ = BUDGETS[name]
+    allowed = base + int(per_room * rooms)
+    if queries > allowed:
+        return f'{name} at {rooms} rooms: {queries} queries > {allowed}'
+    return None
+
+
+def over_time(name, rooms, ms, time_factor=1.0):
+    """Why a result exceeds its time budget (times time_factor), or None."""
+    _, _, base, per_room = BUDGETS[name]
+    max_ms = (base + per_room * rooms) * time_factor
+    if ms > max_ms:
+        return f'{name} at {rooms} rooms: {ms:.0f} ms > {max_ms:.0f} ms'
+    return None
@@ -0,0 +1,129 @@
+"""
+Query-plan audit of the hot filters (manage.py query_plans).
+HOT_QUERIES builds each hot query the way the code that runs it does; audit()
+asks the database for its plan (QuerySet.explain(), EXPLAIN QUERY PLAN on
+SQLite) and flags full table scans and temporary sort trees. time_queries()
+times the same queries on seeded data, with and without the indexes that
+the models declare, to show what each index buys.
+"""
+import datetime
+import random
+import time
+from django.db import connection
+from django.utils import timezone
+from core.models import Room, Bill, ACSession
+
+HOT_QUERIES = {
+    # name: (where it runs, params -> QuerySet)
+    'queue_rooms': ('dashboard, /api/queues/',
+                    lambda p: Room.objects.filter(status='WAITING')),
+    'hotel_queue_rooms': ('scheduler restore',
+                          lambda p: Room.objects.filter(hotel__isnull=True, status='SERVING')),
+    'occupied_rooms': ('checkout page, monitor snapshot',
+                       lambda p: Room.objects.filter(occupancy_status='OCCUPIED').order_by('room_id')),
+    'empty_rooms': ('checkin page',
+                    lambda p: Room.objects.filter(occupancy_status='EMPTY').order_by('room_id')),
+    'room_login': ('login',
+                   lambda p: Room.objects.filter(username=p['username'], password=p['password'])),
+    'open_session': ('control changes, checkout',
+                     lambda p: ACSession.objects.filter(room_id=p['room'], end_time__isnull=True).order_by('-pk')[:1]),
+    'unbilled_sessions': ('checkout',
+                          lambda p: ACSession.objects.filter(room_id=p['room'], start_time__gte=p['since'],
+                                                             bill__isnull=True)),
+    'bill_sessions': ('bill detail',
+                      lambda p: ACSession.objects.filter(bill_id=p['bill']).order_by('start_time')),
+    'bill_history': ('bill history',
+                     lambda p: Bill.objects.order_by('-check_out_time')),
+}
+
+# Indexes declared by the models for these queries (dropped by benchmark() for the "before" run)
+INDEXED_MODELS = (Room, Bill, ACSession)
+
+
+def sample_params(rng=random):
+    """Parameters taken from the current data (a random room, its login, a bill)."""
+    rooms = list(Room.objects.values_list('room_id', 'username', 'password')[:1000])
+    room, username, password = rng.choice(rooms) if rooms else ('', '', '')
+    bills = list(Bill.objects.values_list('id', flat=True)[:1000])
+    return {
+        'room': room, 'username': username, 'password': password,
+        'bill': rng.choice(bills) if bills else 0,
+        'since': timezone.now() - datetime.timedelta(days=2),
+    }
+
+
+def flags(plan):
+    """Problems in a query plan: full table scans and temporary sort trees."""
+    problems = []
+    for line in plan.splitlines():
+        detail = line.split(' ', 3)[-1] if line[:1].isdigit() else line
+        if detail.startswith('SCAN') and 'USING' not in detail:
+            problems.append(f'full scan: {detail}')
+        elif 'TEMP B-TREE' in detail:
+            problems.append(f'sort: {detail}')
+    return problems
+
+
+def audit(params=None):
+    """[(name, where, plan, problems)] for every hot query."""
+    params = params or sample_params()
+    result = []
+    for name, (where, build) in HOT_QUERIES.items():
+        plan = build(params).explain()
+        result.append((name, where, plan, flags(plan)))
+    return result
+
+
+def time_queries(repeat=50, seed=0):
+    """{name: mean milliseconds} of every hot query (executed and fetched), run `repeat` times with varying parameters."""
+    rng = random.Random(seed)
+    params = [sample_params(rng) for _ in range(repeat)]
+    timings = {}
+    with connection.cursor() as cursor:
+        for name, (_, build) in HOT_QUERIES.items():
+            # The SQL alone: building model instances would hide what the index changes
+            queries = [build(p).query.sql_with_params() for p in params]
+            started = time.perf_counter()
+            for sql, args in queries:
+                cursor.execute(sql, args)
+                cursor.fetchall()
+            timings[name] = (time.perf_counter() - started) * 1000 / repeat
+    return timings
+
+
+def drop_indexes():
+    """Drop the indexes the models declare (benchmark baseline on a throwaway database)."""
+    with connection.schema_editor() as editor:
+        for model in INDEXED_MODELS:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+
+
+def seed(sessions, rooms=1000, sessions_per_bill=5):
+    """Seed rooms and `sessions` AC sessions: settled stays, then a current stay for occupied rooms."""
+    now = timezone.now()
+    occupied = rooms // 2
+    Room.objects.bulk_create([
+        Room(room_id=str(10000 + i), username=f'guest{i}', password='88888888',
+             occupancy_status='OCCUPIED' if i < occupied else 'EMPTY', is_on=i < occupied,
+             status=('SERVING' if i < 3 else 'WAITING') if i < occupied else 'IDLE')
+        for i in range(rooms)
+    ], batch_size=1000)
+    current = occupied * 3  # Two closed sessions and an open one per occupied room
+    bills = max(0, sessions - current) // sessions_per_bill
+    Bill.objects.bulk_create([
+        Bill(room_id=str(10000 + b % rooms), guest_id=f'G{b}', check_in_time=now - datetime.timedelta(days=3))
+        for b in range(bills)
+    ], batch_size=5000)
+    bill_ids = list(Bill.objects.values_list('id', 'room_id'))
+    batch = []
+    for bill_id, room in bill_ids:
+        for _ in range(sessions_per_bill):
+            batch.append(ACSession(room_id=room, bill_id=bill_id, end_time=now))
+        if len(batch) >= 5000:
+            ACSession.objects.bulk_create(batch)
+            batch = []
+    for i in range(occupied):
+        for s in range(3):
+            batch.append(ACSession(room_id=str(10000 + i), end_time=None if s == 2 else now))
+    ACSession.objects.bulk_create(batch, batch_size=5000)
@@ -0,0 +1,129 @@
+"""
+In-memory rate limiting of the write APIs (token buckets, per process).
+Config.RATE_LIMITS maps a URL name to limits per scope: 'room' (the room_id in
+the URL) and 'client' (the caller's address, see client_address), each
+[tokens per second, burst]. A request takes one token from the bucket of every
+scope that applies; when a bucket is empty the view answers 429 with
+Retry-After and does no DB or scheduler work. Endpoints without limits pass
+straight through, and so does everything when settings.RATE_LIMIT_ENABLED is off.
+"""
+import functools
+import math
+import threading
+import time
+from django.conf import settings
+from django.http import JsonResponse
+from core.services.config import Config
+
+SCOPES = ('room', 'client')
+
+# How often buckets that have refilled are dropped (a new bucket starts full, so only full ones can go)
+PRUNE_INTERVAL = 60.0
+
+
+class RateLimiter:
+    """Token buckets keyed by (endpoint, scope, key), and throttle counts for the metrics API."""
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(RateLimiter, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self._buckets_lock = threading.Lock()
+        self.buckets = {}  # (endpoint, scope, key) -> [tokens, last refill time]
+        self.allowed = {}  # endpoint -> requests let through
+        self.throttled = {}  # endpoint -> {scope: requests refused}
+        self.last_prune = time.monotonic()
+
+    def check(self, endpoint, room_id=None, client=None, now=None):
+        """Take a token for each applicable scope. Returns None, or the seconds to wait if any bucket is empty."""
+        limits = Config.RATE_LIMITS.get(endpoint)
+        if not limits:
+            return None
+        now = time.monotonic() if now is None else now
+        keys = {'room': room_id, 'client': client}
+        with self._buckets_lock:
+            # All scopes are checked before any token is taken, so a refused request costs nothing
+            buckets = []
+            for scope, (rate, burst) in limits.items():
+                if keys.get(scope) is None:
+                    continue
+                bucket = self.buckets.get((endpoint, scope, keys[scope]))
+                if bucket is None:
+                    bucket = self.buckets[(endpoint, scope, keys[scope])] = [float(burst), now]
+                bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                if bucket[0] < 1.0:
+                    counts = self.throttled.setdefault(endpoint, {s: 0 for s in SCOPES})
+                    counts[scope] += 1
+                    return (1.0 - bucket[0]) / rate
+                buckets.append(bucket)
+            for bucket in buckets:
+                bucket[0] -= 1.0
+            self.allowed[endpoint] = self.allowed.get(endpoint, 0) + 1
+            if now - self.last_prune >= PRUNE_INTERVAL:
+                self._prune(now)
+        return None
+
+    def _prune(self, now):
+        self.last_prune = now
+        full = []
+        for key, (tokens, stamp) in self.buckets.items():
+            limit = Config.RATE_LIMITS.get(key[0], {}).get(key[1])
+            # A bucket whose endpoint or scope is no longer limited can go; otherwise only once refilled
+            if limit is None or tokens + (now - stamp) * limit[0] >= limit[1]:
+                full.append(key)
+        for key in full:
+            del self.buckets[key]
+
+    def stats(self):
+        with self._buckets_lock:
+            return {
+                'allowed': dict(self.allowed),
+                'throttled': {endpoint: dict(counts) for endpoint, counts in self.throttled.items()},
+                'buckets': len(self.buckets),
+            }
+
+
+def client_address(request):
+    """
+    Key of the 'client' scope: REMOTE_ADDR, or for a request from a trusted
+    reverse proxy (settings.RATE_LIMIT_TRUSTED_PROXIES) the right-most address
+    in its forwarding header that is not itself a trusted proxy. Entries left
+    of it were written by the client and cannot be trusted.
+    """
+    remote = request.META.get('REMOTE_ADDR')
+    proxies = settings.RATE_LIMIT_TRUSTED_PROXIES
+    if remote not in proxies:
+        return remote
+    forwarded = request.META.get(settings.RATE_LIMIT_CLIENT_HEADER, '')
+    for address in reversed([a.strip() for a in forwarded.split(',') if a.strip()]):
+        if address not in proxies:
+            return address
+    return remote
+
+
+def rate_limited(endpoint):
+    """View decorator: 429 + Retry-After when the endpoint's limits (Config.RATE_LIMITS) are exceeded."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not settings.RATE_LIMIT_ENABLED:
+                return view(request, *args, **kwargs)
+            retry_after = RateLimiter().check(endpoint, kwargs.get('room_id'), client_address(request))
+            if retry_after is not None:
+                response = JsonResponse({'status': 'error', 'message': 'Too many requests'}, status=429)
+                response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                return response
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,98 @@
+"""
+Per-tick read model of occupied rooms for the monitor API.
+The simulation publishes one projected snapshot per tick, built from its
+in-memory state (temperatures, AC state, fees accrued up to the tick) and the
+rows of its per-tick sync, so publishing queries nothing. Monitor requests in
+that tick get the same pre-encoded JSON bytes without querying or serializing
+again. Each hotel's monitor (?hotel=code) gets its own slice.
+"""
+import json
+import threading
+import time
+from core.models import Room
+from core.services.config import Config
+
+# Columns the monitor screen uses (never credentials or guest data)
+FIELDS = ('room_id', 'current_temp', 'target_temp', 'fan_speed', 'mode', 'fee', 'status', 'is_on', 'occupancy_status')
+# Rounded for display to keep payloads small
+ROUNDED = {'current_temp': 2, 'fee': 2}
+
+
+class MonitorReadModel:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(MonitorReadModel, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self._build_lock = threading.Lock()
+        self.tick = 0
+        self.built_at = None
+        self.rows = []
+        self.hotels = []   # hotel code of each row
+        self.encoded = {}  # (layout, hotel) -> bytes, for the current tick
+
+    def _query(self):
+        rows = Room.objects.filter(occupancy_status='OCCUPIED').order_by('room_id').values_list(*FIELDS, 'hotel_id')
+        return self._project(rows)
+
+    def _project(self, rows):
+        positions = [(FIELDS.index(name), digits) for name, digits in ROUNDED.items()]
+        result, hotels = [], []
+        for row in rows:
+            row = list(row)
+            hotels.append(row.pop())
+            for i, digits in positions:
+                row[i] = round(row[i], digits)
+            result.append(row)
+        return result, hotels
+
+    def publish(self, rows=None):
+        """
+        Build the snapshot for a new tick (called by the simulation after each tick)
+        from rows of FIELDS values plus hotel code, ordered by room_id; queried if None.
+        """
+        rows, hotels = self._query() if rows is None else self._project(rows)
+        with self._build_lock:
+            self._swap(rows, hotels)
+
+    def _swap(self, rows, hotels):
+        self.tick += 1
+        self.built_at = time.monotonic()
+        self.rows = rows
+        self.hotels = hotels
+        self.encoded = {}
+
+    def _encode(self, layout, hotel):
+        rows = self.rows
+        if hotel is not None:
+            rows = [row for row, code in zip(self.rows, self.hotels) if code == hotel]
+        if layout == 'columns':
+            # {"tick": n, "fields": [...], "columns": [[room_id...], [current_temp...], ...]}
+            columns = [list(col) for col in zip(*rows)] if rows else [[] for _ in FIELDS]
+            data = {'tick': self.tick, 'fields': FIELDS, 'columns': columns}
+        else:
+            data = {'tick': self.tick, 'rooms': [dict(zip(FIELDS, row)) for row in rows]}
+        return json.dumps(data, separators=(',', ':')).encode()
+
+    def get(self, layout='rows', hotel=None):
+        """
+        Return (tick, encoded bytes) of all rooms, or of one hotel's rooms.
+        Rebuilt here only if no simulation has published recently.
+        """
+        with self._build_lock:
+            if self.built_at is None or time.monotonic() - self.built_at > Config.MONITOR_SNAPSHOT_MAX_AGE:
+                self._swap(*self._query())
+            body = self.encoded.get((layout, hotel))
+            if body is None:
+                body = self.encoded[(layout, hotel)] = self._encode(layout, hotel)
+            return self.tick, body
@@ -1,9 +1,35 @@
+import datetime
+import os
+import queue
 import threading
 import time
-from core.models import Room
+from concurrent.futures import Future
+from django.conf import settings
+from django.db.models import Case, When, Value, FloatField
+from django.utils import timezone
+from core.models import Room, QueueLatencyAggregate
 from core.services.config import Config
+from core.services import journal as jr
+from core.services import power
+from core.services.policies import RoomView, Preempt, ServingIndex, INFINITE_TIMEOUT, get_policy
+from core.services.metrics import QueueMetrics
+from core.services.config_store import ConfigStore
+from core.services.profiling import Profiler
+from core.services import tenancy
 
-class Scheduler:
+OP_REQUEST = 'REQUEST'
+OP_STOP = 'STOP'
+
+# Queued rooms per timer UPDATE (two bound parameters each, well under SQLite's limit)
+TIMER_BATCH = 500
+
+
+class SchedulerHost:
+    """
+    The one thread that runs the Scheduler of every hotel (see core.services.tenancy).
+    A scheduler with new commands is handled as soon as they arrive; all
+    schedulers are ticked together once per SCHEDULER_TICK.
+    """
     _instance = None
     _lock = threading.Lock()
 
@@ -11,7 +37,7 @@ class Scheduler:
         if cls._instance is None:
             with cls._lock:
                 if cls._instance is None:
-                    cls._instance = super(Scheduler, cls).__new__(cls)
+                    cls._instance = super(SchedulerHost, cls).__new__(cls)
                     cls._instance._initialized = False
         return cls._instance
 
@@ -20,51 +46,360 @@ class Scheduler:
             return
         self._initialized = True
         self.running = False
-        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread = None
+        self.schedulers = {}              # hotel code (None = default property) -> Scheduler
+        self.ready = queue.SimpleQueue()  # Schedulers with commands in their inbox; None only wakes the loop
+        self._run_lock = threading.Lock() # Held while the thread works on the schedulers
+        self.hotels_version = None
+
+    def add(self, scheduler):
+        with self._run_lock:
+            self.schedulers[scheduler.hotel] = scheduler
+            if not self.running:
+                self.running = True
+                self.thread = threading.Thread(target=self._run_loop, daemon=True)
+                self.thread.start()
+
+    def remove(self, scheduler):
+        """Detach a scheduler; once this returns the thread no longer touches it."""
+        with self._run_lock:
+            if self.schedulers.get(scheduler.hotel) is scheduler:
+                del self.schedulers[scheduler.hotel]
+            if self.schedulers or not self.running:
+                return
+            self.running = False
+            thread = self.thread
+        self.ready.put(None)
+        if thread is not threading.current_thread():
+            thread.join(timeout=Config.SCHEDULER_TICK * 5)
+
+    def accepts_commands(self):
+        return self.running and threading.current_thread() is not self.thread
+
+    def notify(self, scheduler):
+        self.ready.put(scheduler)
+
+    def _run_loop(self):
+        next_tick = time.monotonic() + Config.SCHEDULER_TICK
+        while self.running:
+            # Sleep until the next tick, or until a command arrives
+            try:
+                first = self.ready.get(timeout=max(0.0, next_tick - time.monotonic()))
+            except queue.Empty:
+                first = None
+            pending = {first: None} if first is not None else {}
+            while True:
+                try:
+                    scheduler = self.ready.get_nowait()
+                except queue.Empty:
+                    break
+                if scheduler is not None:
+                    pending[scheduler] = None
+
+            profiler = Profiler()
+            profiler.poll()
+            with self._run_lock, profiler.section('scheduler'):
+                for scheduler in pending:
+                    if self.schedulers.get(scheduler.hotel) is scheduler:
+                        self._run(scheduler, scheduler._handle_batch, scheduler._drain())
+                        if not scheduler.inbox.empty():
+                            self.ready.put(scheduler)  # More than one batch arrived
+                if time.monotonic() >= next_tick:
+                    # Don't replay ticks missed while the machine was suspended
+                    next_tick = max(next_tick + Config.SCHEDULER_TICK, time.monotonic())
+                    ConfigStore().refresh()
+                    self._run(None, self._reload_hotels)
+                    for scheduler in list(self.schedulers.values()):
+                        self._run(scheduler, scheduler._tick)
+
+    def _run(self, scheduler, fn, *args):
+        # One hotel's failure must not stop the others
+        try:
+            fn(*args)
+        except Exception as e:
+            label = f" ({scheduler.hotel or 'default'})" if scheduler else ''
+            print(f"[Scheduler] Error in loop{label}: {e}")
+
+    def _reload_hotels(self):
+        if not any(hotel is not None for hotel in self.schedulers):
+            return
+        version = tenancy.hotels_version()
+        if version == self.hotels_version:
+            return
+        self.hotels_version = version
+        settings = tenancy.hotel_settings()
+        for hotel, scheduler in self.schedulers.items():
+            if hotel is not None:
+                scheduler.apply_hotel_settings(settings.get(hotel, {}))
+
+
+class Scheduler:
+    """
+    Dispatch scheduler of one hotel (Scheduler() is the default property,
+    Scheduler('code') the hotel with that code), run as an actor: once started,
+    only the SchedulerHost thread touches its queues. request_service/stop_service
+    from other threads put a command in the inbox and return a Future of the
+    room's resulting status ('SERVING', 'WAITING' or 'IDLE'); callers that don't
+    need the decision just ignore it. Commands that arrive together are handled
+    in one scheduling pass. Before start() (management commands, headless runs)
+    commands run inline.
+    """
+    _instances = {}
+    _lock = threading.RLock()
+
+    def __new__(cls, hotel=None):
+        if hotel not in cls._instances:
+            with cls._lock:
+                if hotel not in cls._instances:
+                    instance = super(Scheduler, cls).__new__(cls)
+                    instance._initialized = False
+                    cls._instances[hotel] = instance
+        return cls._instances[hotel]
+
+    def __init__(self, hotel=None):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.running = False
+        self.hotel = hotel
+        self.config = tenancy.config_for(hotel, tenancy.hotel_settings(hotel))
+        self.host = SchedulerHost()
+        self.inbox = queue.SimpleQueue()  # (op, room_id, Future)
+        self._init_state(get_policy(config=self.config))
+        self.metrics = QueueMetrics()
+        self.last_metrics_flush = time.time()
+        self.budget = self._power_budget()
+        self._config_changes = {}
+        ConfigStore().subscribe(self._on_config_change)
+
+        self.journal = None
+        journal_dir = getattr(settings, 'SCHEDULER_JOURNAL_DIR', None)
+        if journal_dir:
+            if hotel is not None:
+                journal_dir = os.path.join(str(journal_dir), hotel)
+            self.journal = jr.SchedulerJournal(journal_dir, snapshot_every=Config.JOURNAL_SNAPSHOT_EVERY)
+
+        # Restore from the journal, or sync from DB to handle restarts
+        if self.journal and self.journal.exists():
+            self._restore_from_journal()
+        else:
+            if self.journal:
+                self.journal.open()
+            self._sync_queues_from_db()
+            self._snapshot()
+
+    def _init_state(self, policy):
+        # Dispatch rules (see core.services.policies)
+        self.policy = policy
         # Queues store room_ids
-        self.waiting_queue = [] 
-        self.serving_queue = [] 
-        
-        # Sync from DB to handle restarts
-        self._sync_queues_from_db()
+        self.waiting_queue = []
+        self.serving_queue = []
+
+        # Scheduler clock (seconds of scheduler time, advanced by each tick).
+        # Service and wait timers are kept relative to it, so they survive restarts exactly.
+        self.clock = 0.0
+        self.service_start = {}  # room_id -> clock when service started
+        self.wait_info = {}      # room_id -> (reason, deadline clock)
+        self.wait_since = {}     # room_id -> clock when the room started waiting
+        self._waited = {}        # room_id -> time waited, between leaving the queue and admission
+        self.serving_power = {}  # room_id -> FAN_POWER drawn while serving (see core.services.power)
+        self.serving_index = ServingIndex()  # Serving rooms by fan speed, for decisions without room views
+        self._pass_rows = None   # room_id -> Room row, cached for one scheduling pass
+
+    def _restore_from_journal(self):
+        try:
+            started = time.perf_counter()
+            state = self.journal.load()
+            self.journal.open(state.seq)
+
+            # Drop rooms that no longer exist
+            known = set(self._rooms().filter(room_id__in=state.serving + state.waiting).values_list('room_id', flat=True))
+            self.clock = state.clock
+            self.serving_queue = [rid for rid in state.serving if rid in known]
+            self.waiting_queue = [rid for rid in state.waiting if rid in known]
+            self.service_start = {rid: state.service_start[rid] for rid in self.serving_queue}
+            self.wait_info = {rid: state.wait_info[rid] for rid in self.waiting_queue}
+            self.wait_since = {rid: state.wait_since.get(rid, self.clock) for rid in self.waiting_queue}
+            for rid in self.serving_queue:
+                self.policy.on_admit(rid, self.service_start[rid])
+
+            # Make the DB agree with the journal (a crash may have happened between the two writes)
+            self._rooms().filter(status__in=['SERVING', 'WAITING']).exclude(
+                room_id__in=self.serving_queue + self.waiting_queue
+            ).update(status='IDLE')
+            Room.objects.filter(room_id__in=self.serving_queue).update(status='SERVING')
+            Room.objects.filter(room_id__in=self.waiting_queue).update(status='WAITING')
+
+            elapsed = (time.perf_counter() - started) * 1000
+            self._log(f"[Scheduler] Restored from journal in {elapsed:.1f}ms: "
+                      f"Serving={len(self.serving_queue)}, Waiting={len(self.waiting_queue)}")
+
+            self._refresh_power(self.serving_queue)
+            self._fill_free_slots()
+            self._snapshot()
+        except Exception as e:
+            self._log(f"[Scheduler] Error restoring from journal: {e}")
+            self._init_state(self.policy)
+            self._sync_queues_from_db()
 
     def _sync_queues_from_db(self):
         try:
             # Restore queues from database state
-            serving_rooms = Room.objects.filter(status='SERVING')
+            serving_rooms = self._rooms().filter(status='SERVING')
             for room in serving_rooms:
                 if room.room_id not in self.serving_queue:
                     self.serving_queue.append(room.room_id)
-                    
-            waiting_rooms = Room.objects.filter(status='WAITING')
+                    self.service_start[room.room_id] = self.clock - room.service_time
+                    self.policy.on_admit(room.room_id, self.service_start[room.room_id])
+
+            waiting_rooms = self._rooms().filter(status='WAITING')
             for room in waiting_rooms:
                 if room.room_id not in self.waiting_queue:
                     self.waiting_queue.append(room.room_id)
-            
-            print(f"[Scheduler] Restored state: Serving={self.serving_queue}, Waiting={self.waiting_queue}")
-            
+                    # The original reason is not stored in the DB; infer it from the timeout
+                    reason = jr.REASON_LOW_PRIORITY if room.wait_timeout >= INFINITE_TIMEOUT / 2 else jr.REASON_TIME_SLICE
+                    self.wait_info[room.room_id] = (reason, self.clock + room.wait_timeout)
+                    self.wait_since[room.room_id] = self.clock
+
+            self._log(f"[Scheduler] Restored state: Serving={self.serving_queue}, Waiting={self.waiting_queue}")
+
             # Try to fill slots if available
-            while len(self.serving_queue) < Config.MAX_SERVING_ROOMS and self.waiting_queue:
-                self._fill_free_slot()
-                
+            self._refresh_power(self.serving_queue)
+            self._fill_free_slots()
+
         except Exception as e:
-            print(f"[Scheduler] Error syncing from DB: {e}")
+            self._log(f"[Scheduler] Error syncing from DB: {e}")
+
+    @classmethod
+    def for_hotel(cls, hotel=None):
+        """The scheduler of a hotel, started on first use if the others are running."""
+        with cls._lock:
+            scheduler = cls(hotel)
+            if not scheduler.running and SchedulerHost().running:
+                scheduler.start()
+        return scheduler
+
+    @classmethod
+    def start_all(cls):
+        """Start the default property's scheduler and one per hotel; returns them."""
+        from core.models import Hotel
+        schedulers = [cls(hotel) for hotel in [None] + list(Hotel.objects.values_list('code', flat=True))]
+        for scheduler in schedulers:
+            scheduler.start()
+        return schedulers
 
     def start(self):
         if not self.running:
             self.running = True
-            self.thread.start()
-            print("[Scheduler] Started.")
+            self.host.add(self)
+            self._log("[Scheduler] Started.")
 
     def stop(self):
         self.running = False
-        print("[Scheduler] Stopped.")
+        self.host.remove(self)
+        # Commands that arrived after the last pass are still applied
+        self._handle_batch(self._drain())
+        self._snapshot()
+        self._log("[Scheduler] Stopped.")
 
-    def request_service(self, room_id):
+    def request_service(self, room_id, fan_speed=None):
         """
         Called when a room requests service (e.g. turned on, or temp deviation).
-        Implements the dispatch strategy.
+        Pass the room's fan speed when known: the decision then needs no DB read.
+        Returns a Future of the room's status after the decision.
+        """
+        return self._submit(OP_REQUEST, room_id, fan_speed)
+
+    def stop_service(self, room_id):
+        """
+        Called when a room stops service (e.g. turned off, or target reached).
+        Returns a Future that resolves to 'IDLE' once the room left the queues.
+        """
+        return self._submit(OP_STOP, room_id)
+
+    def stop_services(self, room_ids):
+        """
+        stop_service of several rooms (e.g. a group checkout) in one scheduling pass.
+        Returns their Futures.
+        """
+        commands = [(OP_STOP, room_id, None, Future()) for room_id in room_ids]
+        if self.running and self.host.accepts_commands():
+            for command in commands:
+                self.inbox.put(command)
+            self.host.notify(self)
+        else:
+            self._handle_batch(commands)
+        return [future for _, _, _, future in commands]
+
+    def _submit(self, op, room_id, fan_speed=None):
+        future = Future()
+        if self.running and self.host.accepts_commands():
+            self.inbox.put((op, room_id, fan_speed, future))
+            self.host.notify(self)
+        else:
+            self._handle_batch([(op, room_id, fan_speed, future)])
+        return future
+
+    def _status_of(self, room_id):
+        if room_id in self.serving_queue:
+            return 'SERVING'
+        if room_id in self.waiting_queue:
+            return 'WAITING'
+        return 'IDLE'
+
+    def _drain(self):
+        batch = []
+        while len(batch) < Config.SCHEDULER_MAX_BATCH:
+            try:
+                batch.append(self.inbox.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _handle_batch(self, batch):
+        """One scheduling pass over a burst of commands, sharing one read of the rooms involved."""
+        if not batch:
+            return
+        # Only requests without a fan speed need their room read up front
+        unknown = {rid for op, rid, fan_speed, _ in batch if op == OP_REQUEST and fan_speed is None}
+        self._pass_rows = self._fetch_rows(unknown) if unknown else {}
+        try:
+            last_command = {}  # room_id -> (op, fan_speed, status the room was left in)
+            for op, room_id, fan_speed, future in self._order_stops(batch):
+                try:
+                    # Repeats (e.g. several panel clicks) change nothing after the first, unless
+                    # a command of another room moved this one since (preempted, swapped, promoted)
+                    if last_command.get(room_id) != (op, fan_speed, self._status_of(room_id)):
+                        if op == OP_REQUEST:
+                            self._request(room_id, fan_speed)
+                        else:
+                            self._stop(room_id)
+                        last_command[room_id] = (op, fan_speed, self._status_of(room_id))
+                    future.set_result(self._status_of(room_id))
+                except Exception as e:
+                    self._log(f"[Scheduler] Error handling {op} {room_id}: {e}")
+                    future.set_exception(e)
+        finally:
+            self._pass_rows = None
+
+    def _order_stops(self, batch):
+        """
+        Within each run of consecutive stops, stop waiting rooms before serving ones:
+        stops commute, and a slot freed by a serving room is then not handed to a
+        room that leaves in the same run.
         """
+        ordered, run = [], []
+        for command in batch:
+            if command[0] == OP_STOP:
+                run.append(command)
+                continue
+            ordered += sorted(run, key=lambda c: c[1] in self.serving_queue)
+            run = []
+            ordered.append(command)
+        return ordered + sorted(run, key=lambda c: c[1] in self.serving_queue)
+
+    def _request(self, room_id, fan_speed=None):
+        """Implements the dispatch strategy."""
         # Optimization: If already waiting and priority hasn't changed, don't reset queue position
         if room_id in self.waiting_queue:
             # We assume that if request_service is called, the room state (fan_speed) might have changed.
@@ -73,214 +408,373 @@ class Scheduler:
             # This is safer for correctness but resets wait time.
             # To optimize, we could check if the new priority is same as old, but we don't have old.
             # For now, we keep the behavior of re-evaluating to ensure priority upgrades are respected.
-            self.waiting_queue.remove(room_id)
-            print(f"[Scheduler] Re-evaluating waiting request: {room_id}")
+            self._remove_waiting(room_id)
+            self._log(f"[Scheduler] Re-evaluating waiting request: {room_id}")
 
         # If already serving, we generally keep it serving.
         if room_id in self.serving_queue:
+            # A fan speed change alters its priority and the power it draws
+            if fan_speed is not None:
+                self._set_serving_speed(room_id, fan_speed)
+            else:
+                self._refresh_power([room_id])
+            if self.budget is not None:
+                self._rebalance()
             return
 
-        print(f"[Scheduler] Request: {room_id}")
-        
-        # 1. If slots available, assign immediately
-        if len(self.serving_queue) < Config.MAX_SERVING_ROOMS:
-            self._add_to_serving(room_id)
+        self._log(f"[Scheduler] Request: {room_id}")
+
+        # 1. If slots (or power) available, assign immediately
+        if fan_speed is None:
+            request = self._room_views([room_id]).get(room_id)
+            fan_speed = request.fan_speed if request else None
+        if self._fits(fan_speed):
+            self._add_to_serving(room_id, fan_speed=fan_speed)
             return
 
         # 2. Slots full, run scheduling logic
-        self._handle_full_capacity_request(room_id)
+        self._handle_full_capacity_request(room_id, fan_speed)
 
-    def stop_service(self, room_id):
-        """
-        Called when a room stops service (e.g. turned off, or target reached).
-        """
-        print(f"[Scheduler] Stop: {room_id}")
+    def _stop(self, room_id):
+        self._log(f"[Scheduler] Stop: {room_id}")
         if room_id in self.serving_queue:
-            self.serving_queue.remove(room_id)
+            self._remove_serving(room_id)
+            self._record(jr.OP_STOP, room_id)
             # Slot freed, fill it
-            self._fill_free_slot()
+            self._fill_free_slots()
         elif room_id in self.waiting_queue:
-            self.waiting_queue.remove(room_id)
+            self._remove_waiting(room_id)
+            self._waited.pop(room_id, None)
+            self._record(jr.OP_STOP, room_id)
 
-    def _run_loop(self):
-        while self.running:
-            time.sleep(Config.SCHEDULER_TICK)
-            self._update_timers()
-            self._check_time_slice()
+    def _tick(self):
+        # Called by the SchedulerHost once per SCHEDULER_TICK, after ConfigStore().refresh()
+        self._apply_config_changes()
+        self._update_timers()
+        self._check_power_budget()
+        self._check_time_slice()
+        if self.journal and self.journal.snapshot_due():
+            self._snapshot()
+        if time.time() - self.last_metrics_flush >= Config.METRICS_FLUSH_INTERVAL:
+            self.last_metrics_flush = time.time()
+            self._persist_metrics()
+
+    def _log(self, message):
+        if self.hotel is not None:
+            message = message.replace('[Scheduler]', f'[Scheduler:{self.hotel}]', 1)
+        print(message)
+
+    def _rooms(self):
+        return tenancy.hotel_rooms(self.hotel)
+
+    def _record(self, op, *args):
+        if self.journal:
+            self.journal.append(op, self.clock, *args)
+
+    def _snapshot(self):
+        if self.journal:
+            self.journal.snapshot(self.clock, list(self.serving_queue), self.service_start,
+                                  list(self.waiting_queue), self.wait_info, self.wait_since)
+
+    def _record_admission(self, room_id, waited, fan_speed):
+        self.metrics.record_admission(room_id, fan_speed, waited)
+
+    def _record_preemption(self, room_id, fan_speed, swap):
+        self.metrics.record_preemption(room_id, fan_speed, swap=swap)
+
+    def _persist_metrics(self):
+        start, end, window = self.metrics.take_window()
+        if not window:
+            return
+        tz = datetime.timezone.utc
+        try:
+            QueueLatencyAggregate.objects.bulk_create([
+                QueueLatencyAggregate(
+                    hotel_id=self.hotel,
+                    period_start=datetime.datetime.fromtimestamp(start, tz),
+                    period_end=datetime.datetime.fromtimestamp(end, tz),
+                    fan_speed=fan_speed or '', zone=zone,
+                    admissions=h.count, wait_total=h.total, wait_max=h.max,
+                    histogram=list(h.counts), preemptions=h.preemptions, swaps=h.swaps,
+                )
+                for (fan_speed, zone), h in window.items()
+            ])
+        except Exception as e:
+            self._log(f"[Scheduler] Error persisting metrics: {e}")
+
+    def _on_config_change(self, changed):
+        # Called from whichever thread refreshed the store; applied on the next tick
+        self._config_changes.update(changed)
+
+    def apply_hotel_settings(self, settings):
+        """Switch to new Hotel.settings; the changes apply on the next tick like global ones."""
+        config = tenancy.config_for(self.hotel, settings)
+        changed = {key: getattr(config, key) for key in tenancy.HOTEL_KEYS
+                   if getattr(config, key) != getattr(self.config, key)}
+        self.config = config
+        self.policy.config = config
+        if changed:
+            self._log(f"[Scheduler] Hotel settings: {', '.join(sorted(changed))}")
+            self._on_config_change(changed)
+
+    def _apply_config_changes(self):
+        changes, self._config_changes = self._config_changes, {}
+        if not changes:
+            return
+        # Global changes of a key the hotel overrides leave it as it is
+        if 'SCHEDULING_POLICY' in changes and self.config.SCHEDULING_POLICY != self.policy.name:
+            self._log(f"[Scheduler] Policy: {self.policy.name} -> {self.config.SCHEDULING_POLICY}")
+            self.policy = get_policy(config=self.config)
+            for rid in self.serving_queue:
+                self.policy.on_admit(rid, self.service_start[rid])
+        if 'FAN_POWER' in changes:
+            self._refresh_power(self.serving_queue)
+        # Queues are kept; capacity grows or shrinks to the new limits
+        if any(key in changes for key in ('MAX_SERVING_ROOMS', 'POWER_BUDGET', 'POWER_SCHEDULE', 'FAN_POWER')):
+            self.budget = self._power_budget()
+            self._rebalance()
+
+    def power_status(self):
+        return {'budget': self.budget, 'load': self._load(), 'serving': len(self.serving_queue)}
+
+    def _power_budget(self):
+        now = timezone.localtime()
+        return power.budget_at(now.hour * 3600 + now.minute * 60 + now.second, self.config)
+
+    def _load(self):
+        return sum(self.serving_power.values())
+
+    def _fits(self, fan_speed):
+        """Whether one more room at this fan speed can be served."""
+        if self.budget is None:
+            return len(self.serving_queue) < self.config.MAX_SERVING_ROOMS
+        return self._load() + power.fan_power(fan_speed, self.config) <= self.budget + power.EPSILON
+
+    def _over_budget(self):
+        if self.budget is None:
+            return len(self.serving_queue) > self.config.MAX_SERVING_ROOMS
+        return self._load() > self.budget + power.EPSILON
+
+    def _refresh_power(self, room_ids):
+        # Re-read the fan speeds of serving rooms (restore, FAN_POWER change, speed change of unknown value)
+        views = self._room_views(room_ids)
+        for rid in room_ids:
+            if rid in self.serving_queue:
+                view = views.get(rid)
+                self._set_serving_speed(rid, view.fan_speed if view else None)
+
+    def _set_serving_speed(self, room_id, fan_speed):
+        self.serving_power[room_id] = power.fan_power(fan_speed, self.config)
+        self.serving_index.add(room_id, fan_speed, self.service_start[room_id])
+
+    def _check_power_budget(self):
+        # The budget follows POWER_SCHEDULE and runtime changes of Config.POWER_BUDGET
+        budget = self._power_budget()
+        if budget == self.budget:
+            return
+        self._log(f"[Scheduler] Power Budget: {self.budget} -> {budget}")
+        self.budget = budget
+        self._rebalance()
+
+    def _rebalance(self, protect=(), timeout=INFINITE_TIMEOUT, reason=jr.REASON_PREEMPTED):
+        self._shed_load(protect, timeout, reason)
+        self._fill_free_slots()
+
+    def _shed_load(self, protect=(), timeout=INFINITE_TIMEOUT, reason=jr.REASON_PREEMPTED):
+        # Over budget: move serving rooms to the wait queue, lowest speed and longest service first
+        if not self._over_budget():
+            return
+        views = self._room_views(self.serving_queue)
+        candidates = [views[rid] for rid in self.serving_queue if rid in views and rid not in protect]
+        for victim in sorted(candidates, key=lambda r: (r.priority, -r.service_time)):
+            if not self._over_budget():
+                break
+            self._log(f"[Scheduler] Over Budget: {victim.room_id} moved to wait queue")
+            self._remove_serving(victim.room_id)
+            self._add_to_waiting(victim.room_id, timeout=timeout, reason=reason)
+            self._record_preemption(victim.room_id, victim.fan_speed, swap=False)
+
+    def _service_time(self, room_id):
+        return self.clock - self.service_start.get(room_id, self.clock)
+
+    def _wait_timeout(self, room_id):
+        info = self.wait_info.get(room_id)
+        if not info:
+            return INFINITE_TIMEOUT
+        return info[1] - self.clock
+
+    def _room_views(self, room_ids):
+        """Current view of the given rooms for the policy, in one query (none if cached in this pass)."""
+        rows = self._pass_rows
+        if rows is None:
+            rows = self._fetch_rows(room_ids)
+        else:
+            missing = [rid for rid in room_ids if rid not in rows]
+            if missing:
+                rows.update(self._fetch_rows(missing))
+        return {rid: self._make_view(rid, rows[rid][0], abs(rows[rid][1] - rows[rid][2]))
+                for rid in room_ids if rid in rows}
+
+    def _fetch_rows(self, room_ids):
+        rows = Room.objects.filter(room_id__in=room_ids).values_list(
+            'room_id', 'fan_speed', 'current_temp', 'target_temp'
+        )
+        return {rid: (fan_speed, current_temp, target_temp) for rid, fan_speed, current_temp, target_temp in rows}
+
+    def _make_view(self, room_id, fan_speed, temp_delta):
+        return RoomView(
+            room_id, fan_speed,
+            service_time=self._service_time(room_id),
+            wait_timeout=self._wait_timeout(room_id),
+            waited=self.clock - self.wait_since.get(room_id, self.clock),
+            temp_delta=temp_delta,
+        )
 
     def _update_timers(self):
-        # Update service_time for serving rooms
-        for rid in self.serving_queue:
-            self._update_room_timer(rid, service_delta=Config.SCHEDULER_TICK)
-        
-        # Update wait_time (countdown) for waiting rooms
-        for rid in self.waiting_queue:
-            self._update_room_timer(rid, wait_delta=-Config.SCHEDULER_TICK)
+        self.clock += Config.SCHEDULER_TICK
+        if self.serving_queue or self.waiting_queue:
+            self._record(jr.OP_TICK)
+
+        # service_time of serving rooms, wait_timeout (countdown) of waiting ones: one UPDATE per queue
+        self._write_timers('service_time', [(rid, self._service_time(rid)) for rid in self.serving_queue])
+        self._write_timers('wait_timeout', [(rid, self._wait_timeout(rid)) for rid in self.waiting_queue])
+
+    @staticmethod
+    def _write_timers(field, values):
+        for start in range(0, len(values), TIMER_BATCH):
+            chunk = values[start:start + TIMER_BATCH]
+            Room.objects.filter(room_id__in=[rid for rid, _ in chunk]).update(**{field: Case(
+                *[When(room_id=rid, then=Value(value)) for rid, value in chunk], output_field=FloatField())})
 
     def _check_time_slice(self):
         # 2.2.2: Check if any waiting room has timed out (wait_timeout <= 0)
         # Only applies if we are in Time Slice mode (implied by having a timeout set)
-        
-        # We need to iterate a copy because we might modify the queue
-        for waiter_id in list(self.waiting_queue):
-            room = self._get_room(waiter_id)
-            if not room: continue
-            
-            if room.wait_timeout <= 0:
-                # Time slice expired. 
-                # Find serving room with SAME speed (Time Slice Strategy)
-                # And preempt the one with longest service time.
-                
-                victim_id = self._find_longest_serving_victim(room.fan_speed)
-                if victim_id:
-                    print(f"[Scheduler] Time Slice: Swapping {victim_id} (Longest Serve) with {waiter_id} (Timeout)")
-                    self._preempt(victim_id, waiter_id, victim_timeout=Config.TIME_SLICE)
-
-    def _handle_full_capacity_request(self, request_id):
-        req_room = self._get_room(request_id)
-        if not req_room: return
-
-        req_prio = Config.SPEED_PRIORITY.get(req_room.fan_speed, 0)
-        
-        # Analyze serving rooms
-        serving_rooms = [self._get_room(rid) for rid in self.serving_queue]
-        serving_rooms = [r for r in serving_rooms if r] # Filter None
-
-        # 2.1 Check for Lower Priority (Higher Speed > Lower Speed)
-        # Find rooms with lower priority
-        lower_prio_rooms = [r for r in serving_rooms if Config.SPEED_PRIORITY.get(r.fan_speed, 0) < req_prio]
-        
-        if lower_prio_rooms:
-            # 2.1.1 / 2.1.2 / 2.1.3
-            # We need to pick ONE victim.
-            # Rule: Lowest speed first. If speeds equal, longest service time.
-            
-            # Sort by Priority (Asc), then Service Time (Desc)
-            lower_prio_rooms.sort(key=lambda r: (
-                Config.SPEED_PRIORITY.get(r.fan_speed, 0), 
-                -r.service_time
-            ))
-            
-            victim = lower_prio_rooms[0]
-            print(f"[Scheduler] Priority Preemption: {request_id} (High) replaces {victim.room_id} (Low)")
-            # Victim gets infinite timeout because it was kicked by higher priority
-            self._preempt(victim.room_id, request_id, victim_timeout=999999)
+        expired = [rid for rid in self.waiting_queue if self._wait_timeout(rid) <= 0]
+        if not expired:
             return
 
-        # 2.2 Check for Equal Priority
-        # If we are here, no lower priority rooms exist.
-        # Check if there are equal priority rooms.
-        equal_prio_rooms = [r for r in serving_rooms if Config.SPEED_PRIORITY.get(r.fan_speed, 0) == req_prio]
-        
-        if equal_prio_rooms:
-            # 2.2.1 Time Slice Strategy
-            # Add to wait queue with timeout
-            print(f"[Scheduler] Time Slice Wait: {request_id} added to wait queue")
-            self._add_to_waiting(request_id, timeout=Config.TIME_SLICE)
-            return
+        views = self._room_views(expired + self.serving_queue)
+        swapped = False
+        for waiter_id in expired:
+            waiter = views.get(waiter_id)
+            if not waiter or waiter_id not in self.waiting_queue: continue
+
+            # Time slice expired. Let the policy pick the serving room to swap out
+            # (default: SAME speed, longest service time).
+            serving = [views[rid] for rid in self.serving_queue if rid in views]
+            victim_id = self.policy.pick_swap(waiter, serving)
+            if victim_id:
+                self._log(f"[Scheduler] Time Slice: Swapping {victim_id} (Longest Serve) with {waiter_id} (Timeout)")
+                self._preempt(victim_id, waiter_id, victim_timeout=self.policy.swap_timeout(), reason=jr.REASON_SWAPPED,
+                              victim_speed=views[victim_id].fan_speed, new_speed=waiter.fan_speed)
+                # Timers changed; refresh the views of the two rooms involved
+                views[victim_id] = self._make_view(victim_id, views[victim_id].fan_speed, views[victim_id].temp_delta)
+                views[waiter_id] = self._make_view(waiter_id, waiter.fan_speed, waiter.temp_delta)
+                swapped = True
+
+        # Swapping rooms of different speeds changes the load
+        if swapped and self.budget is not None:
+            self._rebalance()
+
+    def _handle_full_capacity_request(self, request_id, fan_speed=None):
+        # Policies that can decide from the per-speed index need no room views
+        decision = None
+        if fan_speed is not None:
+            decision = self.policy.on_full_capacity_indexed(fan_speed, self.serving_index)
+        if decision is None:
+            views = self._room_views([request_id] + self.serving_queue)
+            request = views.get(request_id)
+            if not request: return
+            fan_speed = request.fan_speed
+            serving = [views[rid] for rid in self.serving_queue if rid in views]
+            decision = self.policy.on_full_capacity(request, serving)
 
-        # 2.3 Lower Priority (Request < Serving)
-        # Must wait.
-        print(f"[Scheduler] Low Priority Wait: {request_id} added to wait queue (No Timeout)")
-        self._add_to_waiting(request_id, timeout=999999) # Effectively infinite
+        if isinstance(decision, Preempt):
+            self._log(f"[Scheduler] Priority Preemption: {request_id} (High) replaces {decision.victim_id} (Low)")
+            self._preempt(decision.victim_id, request_id, victim_timeout=decision.victim_timeout, reason=decision.reason,
+                          victim_speed=self.serving_index.speeds.get(decision.victim_id), new_speed=fan_speed)
+            # Under a power budget one victim may free too little (or too much)
+            if self.budget is not None:
+                self._rebalance(protect={request_id}, timeout=decision.victim_timeout, reason=decision.reason)
+        elif decision.reason == jr.REASON_TIME_SLICE:
+            self._log(f"[Scheduler] Time Slice Wait: {request_id} added to wait queue")
+            self._add_to_waiting(request_id, timeout=decision.timeout, reason=decision.reason)
+        else:
+            self._log(f"[Scheduler] Low Priority Wait: {request_id} added to wait queue (No Timeout)")
+            self._add_to_waiting(request_id, timeout=decision.timeout, reason=decision.reason)
 
-    def _fill_free_slot(self):
-        # 2.2.3: Slot freed. Pick best waiter.
+    def _fill_free_slots(self):
+        # 2.2.3: Slot freed. Pick best waiter, while capacity remains.
         if not self.waiting_queue:
             return
 
-        # Criteria:
-        # 1. Highest Priority (Fan Speed)
-        # 2. Smallest Wait Duration (wait_timeout). 
-        #    (Smallest timeout means closest to expiration, i.e. waited longest in slice logic)
-        
-        candidates = []
-        for rid in self.waiting_queue:
-            r = self._get_room(rid)
-            if r: candidates.append(r)
-            
-        if not candidates: return
-
-        # Sort: Priority (Desc), Wait Timeout (Asc)
-        candidates.sort(key=lambda r: (
-            -Config.SPEED_PRIORITY.get(r.fan_speed, 0),
-            r.wait_timeout
-        ))
-        
-        best_waiter = candidates[0]
-        print(f"[Scheduler] Slot Free: Assigning to {best_waiter.room_id}")
-        
-        self.waiting_queue.remove(best_waiter.room_id)
-        self._add_to_serving(best_waiter.room_id)
-
-    def _preempt(self, victim_id, new_id, victim_timeout):
+        # Default criteria: highest priority, then smallest wait_timeout
+        views = self._room_views(self.waiting_queue)
+        while True:
+            # Under a power budget, only waiters whose fan speed fits the headroom
+            candidates = [views[rid] for rid in self.waiting_queue if rid in views and self._fits(views[rid].fan_speed)]
+            if not candidates: return
+
+            best_waiter = self.policy.pick_waiter(candidates)
+            self._log(f"[Scheduler] Slot Free: Assigning to {best_waiter}")
+
+            self._remove_waiting(best_waiter)
+            self._add_to_serving(best_waiter, fan_speed=views[best_waiter].fan_speed)
+
+    def _preempt(self, victim_id, new_id, victim_timeout, reason, victim_speed=None, new_speed=None):
         # Remove victim
         if victim_id in self.serving_queue:
-            self.serving_queue.remove(victim_id)
-        self._add_to_waiting(victim_id, timeout=victim_timeout) 
-        
+            self._remove_serving(victim_id)
+        self._add_to_waiting(victim_id, timeout=victim_timeout, reason=reason, record=False)
+        self._record_preemption(victim_id, victim_speed, swap=(reason == jr.REASON_SWAPPED))
+
         # Add new
         if new_id in self.waiting_queue:
-            self.waiting_queue.remove(new_id)
-        self._add_to_serving(new_id)
+            self._remove_waiting(new_id)
+        self._add_to_serving(new_id, record=False, fan_speed=new_speed)
 
-    def _add_to_serving(self, room_id):
+        op = jr.OP_PREEMPT if reason == jr.REASON_PREEMPTED else jr.OP_SWAP
+        self._record(op, victim_id, new_id, self.clock + victim_timeout)
+
+    def _remove_serving(self, room_id):
+        self.serving_queue.remove(room_id)
+        self.service_start.pop(room_id, None)
+        self.serving_power.pop(room_id, None)
+        self.serving_index.remove(room_id)
+        self.policy.on_release(room_id, self.clock)
+
+    def _remove_waiting(self, room_id):
+        self.waiting_queue.remove(room_id)
+        self.wait_info.pop(room_id, None)
+        self._waited[room_id] = self.clock - self.wait_since.pop(room_id, self.clock)
+
+    def _add_to_serving(self, room_id, record=True, fan_speed=None):
+        if fan_speed is None:
+            view = self._room_views([room_id]).get(room_id)
+            fan_speed = view.fan_speed if view else None
+        # Queueing latency: time since the request was queued (0 if admitted immediately)
+        self._record_admission(room_id, self._waited.pop(room_id, 0.0), fan_speed)
         self.serving_queue.append(room_id)
+        self.service_start[room_id] = self.clock
+        self._set_serving_speed(room_id, fan_speed)
+        self.policy.on_admit(room_id, self.clock)
+        if record:
+            self._record(jr.OP_SERVE, room_id)
         self._update_room_status(room_id, 'SERVING', service_time=0)
 
-    def _add_to_waiting(self, room_id, timeout):
+    def _add_to_waiting(self, room_id, timeout, reason, record=True):
+        self._waited.pop(room_id, None)
         self.waiting_queue.append(room_id)
+        self.wait_info[room_id] = (reason, self.clock + timeout)
+        self.wait_since[room_id] = self.clock
+        if record:
+            self._record(jr.OP_WAIT, room_id, reason, self.clock + timeout)
         self._update_room_status(room_id, 'WAITING', wait_timeout=timeout)
 
-    def _find_longest_serving_victim(self, target_speed):
-        # Find serving room with same speed and longest service time
-        candidates = []
-        target_prio = Config.SPEED_PRIORITY.get(target_speed, 0)
-        
-        for rid in self.serving_queue:
-            r = self._get_room(rid)
-            if r and Config.SPEED_PRIORITY.get(r.fan_speed, 0) == target_prio:
-                candidates.append(r)
-        
-        if not candidates: return None
-        
-        # Sort by Service Time Desc
-        candidates.sort(key=lambda r: -r.service_time)
-        return candidates[0].room_id
-
-    def _get_room(self, room_id):
-        try:
-            return Room.objects.get(room_id=room_id)
-        except Room.DoesNotExist:
-            return None
-
     def _update_room_status(self, room_id, status, service_time=None, wait_timeout=None):
-        try:
-            room = Room.objects.get(room_id=room_id)
-            room.status = status
-            update_fields = ['status']
-            if service_time is not None:
-                room.service_time = service_time
-                update_fields.append('service_time')
-            if wait_timeout is not None:
-                room.wait_timeout = wait_timeout
-                update_fields.append('wait_timeout')
-            room.save(update_fields=update_fields)
-        except Room.DoesNotExist:
-            pass
-
-    def _update_room_timer(self, room_id, service_delta=0, wait_delta=0):
-        try:
-            room = Room.objects.get(room_id=room_id)
-            update_fields = []
-            if service_delta:
-                room.service_time += service_delta
-                update_fields.append('service_time')
-            if wait_delta:
-                room.wait_timeout += wait_delta
-                update_fields.append('wait_timeout')
-            
-            if update_fields:
-                room.save(update_fields=update_fields)
-        except Room.DoesNotExist:
-            pass
+        update = {'status': status}
+        if service_time is not None:
+            update['service_time'] = service_time
+        if wait_timeout is not None:
+            update['wait_timeout'] = wait_timeout
+        Room.objects.filter(room_id=room_id).update(**update)
@@ -1,15 +1,53 @@
 import time
 import threading
+from django.db.models import F, Q, Value
 from core.models import Room
 from core.services.config import Config
+from core.services.config_store import ConfigStore, THERMAL_KEYS
+from core.services.profiling import Profiler
 from core.services.scheduler import Scheduler
+from core.services.thermal import ThermalPartition
+from core.services.read_model import MonitorReadModel
+from core.services.history import get_history
+
 
 class SimulationEngine:
+    """
+    Event-driven thermal simulation.
+    Temperature is piecewise linear, so each room only stores its current
+    segment and the next event (target reached, hysteresis threshold crossed,
+    ambient reached). Temperature at any time is computed on demand.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(SimulationEngine, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
     def __init__(self):
-        self.scheduler = Scheduler()
+        if self._initialized:
+            return
+        self._initialized = True
         self.running = True
         self.thread = threading.Thread(target=self._run_loop, daemon=True)
 
+        self.partition = ThermalPartition()
+        self.keys = {}  # room_id -> last known (is_on, status, fan_speed, mode, target_temp)
+        self.hotels = {}  # room_id -> hotel code (None = default property), routes actions to its Scheduler
+        self.occupied = []  # (room_id, fee, fee_rate, fee_since, current_temp) of occupied rooms at the last sync
+        self.last_flush = 0.0
+        self.syncs = 0
+        self.settled = {}  # room_id -> sync count when a view was found to have settled the room
+        self._config_changes = {}
+        ConfigStore().subscribe(self._on_config_change)
+        self.read_model = MonitorReadModel()
+        self.history = get_history()
+
     def start(self):
         self.thread.start()
         print("[Simulation] Started.")
@@ -18,111 +56,202 @@ class SimulationEngine:
         self.running = False
         print("[Simulation] Stopped.")
 
+    def temperature_at(self, room_id, t=None):
+        return self.partition.temperature_at(room_id, time.time() if t is None else t)
+
     def _run_loop(self):
         while self.running:
             time.sleep(1.0)
             try:
-                self._update_rooms()
+                profiler = Profiler()
+                profiler.poll()
+                with profiler.section('simulation'):
+                    self._update_rooms()
+                self.read_model.publish(self._monitor_rows(time.time()))
+                self._record_history(time.time())
             except Exception as e:
                 print(f"[Simulation] Error: {e}")
 
+    def _on_config_change(self, changed):
+        # Called from whichever thread refreshed the store; applied on the next tick
+        self._config_changes.update(changed)
+
+    def _thermal_config_changed(self):
+        changes, self._config_changes = self._config_changes, {}
+        return any(key in changes for key in THERMAL_KEYS)
+
+    def _apply_thermal_config(self, now):
+        # New rates/ambient apply from now on; fees accrued so far keep the old rates
+        self.partition.resegment_all(now)
+
     def _update_rooms(self):
-        rooms = Room.objects.all()
-        for room in rooms:
-            update_fields = ['current_temp']
-
-            # 1. Calculate Natural Change Vector (Recovery to Ambient)
-            natural_change = 0.0
-            ambient_temp = Config.AMBIENT_TEMP
-            # Requirement: 0.5 degrees per minute recovery
-            recovery_rate = 0.5 / 60.0
-            
-            if room.current_temp < ambient_temp:
-                natural_change = recovery_rate
-            elif room.current_temp > ambient_temp:
-                natural_change = -recovery_rate
-            
-            # 2. Calculate AC Change Vector
-            ac_change = 0.0
-            if room.is_on and room.status == 'SERVING':
-                rate = Config.TEMP_CHANGE_RATE.get(room.fan_speed, 0.5) / 60.0
-                if room.mode == 'COOL':
-                    ac_change = -rate
-                else: # HEAT
-                    ac_change = rate
-                
-                self._calculate_cost(room)
-                update_fields.extend(['fee', 'total_fee'])
-
-            # 3. Apply Changes
-            # If AC is SERVING, we apply ONLY AC change (Ignore natural recovery)
-            if room.is_on and room.status == 'SERVING':
-                room.current_temp += ac_change
-            else:
-                # Only natural recovery, clamp to ambient to prevent overshoot
-                if natural_change != 0:
-                    new_temp = room.current_temp + natural_change
-                    if natural_change > 0 and new_temp > ambient_temp:
-                        new_temp = ambient_temp
-                    elif natural_change < 0 and new_temp < ambient_temp:
-                        new_temp = ambient_temp
-                    room.current_temp = new_temp
-
-            if self._check_state_transitions(room):
-                update_fields.append('status')
-            
-            room.save(update_fields=update_fields)
-
-    def _calculate_cost(self, room):
-        cost_per_min = Config.FEE_RATE.get(room.fan_speed, 1.0)
-        cost_per_sec = cost_per_min / 60.0
-        
-        room.fee += cost_per_sec
-        room.total_fee += cost_per_sec
-
-    def _check_state_transitions(self, room):
-        if not room.is_on:
-            if room.status != 'IDLE':
-                room.status = 'IDLE'
-                return True
-            return False
-
-        # Requirement: Re-request service when temp deviates by 1.0 degree
-        THRESHOLD = 1.0 # Hysteresis threshold
-
-        # Determine if there is demand for AC
-        demand = False
-        if room.mode == 'COOL':
-            if room.status == 'SERVING':
-                # Keep running until target reached
-                if room.current_temp > room.target_temp:
-                    demand = True
-            else:
-                # Start running if threshold exceeded (Resume condition)
-                # Or if just turned on and temp is high enough
-                if room.current_temp >= room.target_temp + THRESHOLD:
-                    demand = True
-        else: # HEAT
-            if room.status == 'SERVING':
-                # Keep running until target reached
-                if room.current_temp < room.target_temp:
-                    demand = True
+        ConfigStore().refresh()
+        now = time.time()
+        self.partition.advance(now)
+        if self._thermal_config_changed():
+            self._apply_thermal_config(now)
+        changed, removed = self._sync_states()
+        for rid in removed:
+            self.partition.remove(rid)
+            self.history.forget(rid)
+        for rid, key, current_temp in changed:
+            self.partition.apply_state(rid, key, current_temp, now)
+        self.partition.exchange_heat(now)
+        # Changes picked up by the sync may require an immediate transition
+        self.partition.advance(now)
+
+        if self._flush_due(now):
+            self.partition.flush(now)
+
+        temps, fees, statuses, actions, accruals = self.partition.drain()
+        self._persist(temps, fees, statuses, accruals)
+        requested = self._dispatch(actions)
+
+        # Feed scheduler decisions straight back instead of waiting for the next sync
+        for rid, status in requested:
+            key = self._key_after_request(rid, status)
+            if key:
+                self.partition.apply_state(rid, key, None, now)
+        if requested:
+            self.partition.advance(now)
+            temps, fees, statuses, actions, accruals = self.partition.drain()
+            self._persist(temps, fees, statuses, accruals)
+            self._dispatch(actions)
+
+    def _record_history(self, now):
+        if self.history.due(now):
+            self.history.record(now, self._sample_temperatures(now))
+
+    def _sample_temperatures(self, now):
+        return {rid: self.partition.temperature_at(rid, now) for rid in self.partition.tracks}
+
+    def _monitor_rows(self, now):
+        """
+        Monitor rows (read_model.FIELDS + hotel) of the rooms occupied at the last
+        sync: AC state and temperature as simulated, fees brought up to `now`.
+        """
+        rows = []
+        for rid, fee, fee_rate, fee_since, current_temp in self.occupied:
+            key = self.keys.get(rid)
+            if key is None:
+                continue
+            is_on, status, fan_speed, mode, target_temp = key
+            temp = self.temperature_at(rid, now)
+            if fee_since is not None and now > fee_since:
+                fee += fee_rate * (now - fee_since)
+            rows.append((rid, current_temp if temp is None else temp, target_temp, fan_speed, mode, fee,
+                         status, is_on, 'OCCUPIED', self.hotels.get(rid)))
+        return rows
+
+    def _flush_due(self, now):
+        if now - self.last_flush >= Config.SIM_FLUSH_INTERVAL:
+            self.last_flush = now
+            return True
+        return False
+
+    def _sync_states(self):
+        """
+        One narrow query per tick to pick up changes made by views and the scheduler.
+        Returns ([(room_id, key, current_temp)], [removed room_ids]).
+        """
+        rows = Room.objects.order_by('room_id').values_list(
+            'room_id', 'is_on', 'status', 'fan_speed', 'mode', 'target_temp', 'current_temp', 'hotel_id',
+            'occupancy_status', 'fee', 'fee_rate', 'fee_since'
+        )
+        self.syncs += 1
+        changed = []
+        seen = set()
+        occupied = []
+        for rid, is_on, status, fan_speed, mode, target_temp, current_temp, hotel, occupancy, *fee in rows:
+            seen.add(rid)
+            self.hotels[rid] = hotel
+            if occupancy == 'OCCUPIED':
+                occupied.append((rid, *fee, current_temp))
+            key = (is_on, status, fan_speed, mode, target_temp)
+            if self.keys.get(rid) != key:
+                self.keys[rid] = key
+                changed.append((rid, key, current_temp))
+
+        self.occupied = occupied
+        removed = [rid for rid in self.keys if rid not in seen]
+        for rid in removed:
+            del self.keys[rid]
+            self.hotels.pop(rid, None)
+            self.settled.pop(rid, None)
+        return changed, removed
+
+    def _key_after_request(self, room_id, status):
+        key = self.keys.get(room_id)
+        if not key or status not in ('SERVING', 'WAITING'):
+            return None
+        key = (key[0], status) + key[2:]
+        self.keys[room_id] = key
+        return key
+
+    def _dispatch(self, actions):
+        """
+        Send REQUEST/STOP actions to the scheduler in event order, as one burst
+        it can handle in a single pass. Returns [(room_id, status)] of the requests.
+        """
+        requested = []
+        for _, action, rid in sorted(actions):
+            scheduler = Scheduler.for_hotel(self.hotels.get(rid))
+            if action == 'STOP':
+                scheduler.stop_service(rid)
             else:
-                # Start running if threshold exceeded (Resume condition)
-                if room.current_temp <= room.target_temp - THRESHOLD:
-                    demand = True
-        
-        # Apply State Transitions
-        if demand:
-            if room.status == 'IDLE':
-                # room.status = 'WAITING' # Let scheduler handle this
-                self.scheduler.request_service(room.room_id)
-                return False
+                key = self.keys.get(rid)
+                requested.append((rid, scheduler.request_service(rid, key[2] if key else None)))
+        return [(rid, self._decision(future)) for rid, future in requested]
+
+    def _decision(self, future):
+        try:
+            return future.result(timeout=Config.SCHEDULER_REPLY_TIMEOUT)
+        except Exception as e:
+            # Keep simulating; the next sync picks up whatever the scheduler decided
+            print(f"[Simulation] No scheduler decision: {e}")
+            return None
+
+    def _persist(self, temps, fees, statuses, accruals):
+        for rid, status in statuses.items():
+            if rid in self.keys:
+                self.keys[rid] = (self.keys[rid][0], status) + self.keys[rid][2:]
+
+        for rid in set(temps) | set(statuses) | set(accruals):
+            update = {}
+            if rid in temps:
+                update['current_temp'] = temps[rid]
+            if rid in statuses:
+                update['status'] = statuses[rid]
+            if rid in accruals and self._persist_fee(rid, update, fees.get(rid), *accruals[rid]):
+                continue
+            if update:
+                Room.objects.filter(room_id=rid).update(**update)
+
+    def _persist_fee(self, rid, update, delta, since, until, rate):
+        """
+        Write `update` together with the fee the room accrued from `since` to
+        `until` at `rate`. Views settle fees too (see services.fees): a room
+        settled meanwhile keeps the view's fee, and the delta of the track,
+        which may not have seen the view's changes yet, is not added.
+        Returns False if the room's row was not written.
+        """
+        rows = Room.objects.filter(room_id=rid)
+        if rid in self.settled:
+            fee = {}
+            if self.settled[rid] != self.syncs:
+                # Synced since the settlement: the track's rate holds from here on
+                del self.settled[rid]
+                fee['fee_rate'] = rate
         else:
-            # No demand (Target reached or within hysteresis buffer)
-            if room.status == 'SERVING' or room.status == 'WAITING':
-                room.status = 'IDLE'
-                self.scheduler.stop_service(room.room_id)
+            fee = {'fee_since': until, 'fee_rate': rate}
+            if delta:
+                fee.update(fee=F('fee') + delta, total_fee=F('total_fee') + delta)
+            if rows.filter(Q(fee_since__isnull=True) | Q(fee_since__lte=since)).update(**update, **fee):
                 return True
-        
-        return False
+            # The view charged up to its fee_since at the rate in the DB; that rate
+            # applies until the track has synced whatever the view changed
+            self.settled[rid] = self.syncs
+            fee = {}
+        accrued = F('fee_rate') * (Value(until) - F('fee_since'))
+        fee.update(fee=F('fee') + accrued, total_fee=F('total_fee') + accrued, fee_since=until)
+        return bool(rows.filter(fee_since__lt=until).update(**update, **fee))
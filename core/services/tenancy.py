@@ -0,0 +1,72 @@
+"""
+Multi-property hosting: one engine process serves many hotels.
+Rooms belong to a Hotel (rooms without one form the default property of a
+single-hotel install). Each hotel has its own Scheduler with its own queues,
+policy, power budget, journal and metrics, and its own Config values:
+Hotel.settings overrides HOTEL_KEYS on top of the global Config, so global
+changes (ConfigStore) still reach hotels that don't override a key.
+All schedulers run on one shared thread (SchedulerHost), and the simulation
+engine advances the rooms of every hotel in one pass.
+"""
+from core.services.config import Config
+from core.services.config_store import validate, check_power_floors, POWER_KEYS
+
+# Config attributes a hotel can set for itself
+HOTEL_KEYS = (
+    'MAX_SERVING_ROOMS', 'TIME_SLICE', 'POWER_BUDGET', 'POWER_SCHEDULE',
+    'FAN_POWER', 'SCHEDULING_POLICY', 'AGING_SECONDS',
+)
+
+
+def validate_settings(settings):
+    """Return the hotel settings with validated values, or raise ValueError."""
+    if not isinstance(settings, dict):
+        raise ValueError("Hotel settings must be a JSON object")
+    result = {}
+    for key, value in settings.items():
+        if key not in HOTEL_KEYS:
+            raise ValueError(f"{key} cannot be set per hotel (allowed: {', '.join(HOTEL_KEYS)})")
+        result[key] = validate(key, value)
+    if any(key in result for key in POWER_KEYS):
+        check_power_floors({key: result.get(key, getattr(Config, key)) for key in POWER_KEYS})
+    return result
+
+
+def config_for(hotel, settings=None):
+    """
+    Config as seen by one hotel: a subclass of Config holding the hotel's
+    overrides, so every other attribute is looked up on Config itself.
+    """
+    if hotel is None or not settings:
+        return Config
+    overrides = {}
+    for key, value in settings.items():
+        try:
+            overrides[key] = validate_settings({key: value})[key]
+        except ValueError as e:
+            print(f"[Config] Ignoring setting of hotel {hotel}: {e}")
+    return type(f'Config[{hotel}]', (Config,), overrides)
+
+
+def hotel_settings(hotel=None):
+    """{code: settings} of all hotels, or the settings of one (empty for the default property)."""
+    from core.models import Hotel
+    if hotel is not None:
+        return Hotel.objects.filter(code=hotel).values_list('settings', flat=True).first() or {}
+    return dict(Hotel.objects.values_list('code', 'settings'))
+
+
+def hotels_version():
+    """Cheap stamp that changes whenever a hotel is added, removed or edited."""
+    from django.db.models import Count, Max
+    from core.models import Hotel
+    stamp = Hotel.objects.aggregate(n=Count('code'), last=Max('updated_at'))
+    return stamp['n'], stamp['last']
+
+
+def hotel_rooms(hotel):
+    """Rooms of one hotel (None = the default property)."""
+    from core.models import Room
+    if hotel is None:
+        return Room.objects.filter(hotel__isnull=True)
+    return Room.objects.filter(hotel_id=hotel)
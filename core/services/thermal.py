@@ -0,0 +1,341 @@
+import heapq
+import itertools
+from core.services.config import Config
+from core.services.heat_exchange import HeatExchange
+
+# Requirement: 0.5 degrees per minute recovery toward ambient
+RECOVERY_RATE = 0.5 / 60.0
+# Requirement: Re-request service when temp deviates by 1.0 degree
+THRESHOLD = 1.0
+
+# Event kinds
+TARGET_REACHED = 'TARGET_REACHED'
+THRESHOLD_CROSSED = 'THRESHOLD_CROSSED'
+AMBIENT_REACHED = 'AMBIENT_REACHED'
+
+# Small offset used to evaluate the state just after a crossing
+EPSILON = 1e-6
+
+
+class Segment:
+    """
+    One linear piece of a room's temperature trajectory.
+    temp(t) = temp + rate * (t - start), clamped at `limit` if set.
+    fee_rate is the AC cost per second accrued while the segment lasts.
+    """
+    __slots__ = ('start', 'temp', 'rate', 'limit', 'fee_rate')
+
+    def __init__(self, start, temp, rate=0.0, limit=None, fee_rate=0.0):
+        self.start = start
+        self.temp = temp
+        self.rate = rate
+        self.limit = limit
+        self.fee_rate = fee_rate
+
+    @property
+    def is_flat(self):
+        return self.rate == 0.0
+
+    def temp_at(self, t):
+        temp = self.temp + self.rate * (t - self.start)
+        if self.limit is not None:
+            if self.rate > 0 and temp > self.limit:
+                return self.limit
+            if self.rate < 0 and temp < self.limit:
+                return self.limit
+        return temp
+
+    def time_at(self, temp):
+        """Time at which the trajectory reaches `temp`, or None if it never does."""
+        if self.rate == 0.0:
+            return None
+        dt = (temp - self.temp) / self.rate
+        if dt < 0:
+            return None
+        if self.limit is not None:
+            if self.rate > 0 and temp > self.limit:
+                return None
+            if self.rate < 0 and temp < self.limit:
+                return None
+        return self.start + dt
+
+
+def build_segment(now, temp, is_on, status, fan_speed, mode, exchange=0.0):
+    """
+    Trajectory of a room from `now`, given its current AC state and the heat
+    exchanged with its neighbours (degrees per second, see heat_exchange).
+    """
+    if is_on and status == 'SERVING':
+        # AC is serving: only the AC change (and the neighbours) apply, natural recovery is ignored
+        rate = Config.TEMP_CHANGE_RATE.get(fan_speed, 0.5) / 60.0
+        if mode == 'COOL':
+            rate = -rate
+        fee_rate = Config.FEE_RATE.get(fan_speed, 1.0) / 60.0
+        return Segment(now, temp, rate + exchange, None, fee_rate)
+
+    ambient = Config.AMBIENT_TEMP
+    if abs(temp - ambient) < EPSILON:
+        # Reaching ambient by float arithmetic can stop a hair short of it; late in
+        # a long run the remaining step is below the resolution of t and would repeat forever
+        temp = ambient
+        # Recovery holds the room at ambient unless the neighbours pull harder
+        if abs(exchange) <= RECOVERY_RATE:
+            return Segment(now, temp)
+        return Segment(now, temp, exchange - RECOVERY_RATE if exchange > 0 else exchange + RECOVERY_RATE)
+    recovery = RECOVERY_RATE if temp < ambient else -RECOVERY_RATE
+    rate = recovery + exchange
+    if rate * recovery > 0:
+        return Segment(now, temp, rate, ambient)
+    # Neighbours outweigh recovery: drifting away from ambient
+    return Segment(now, temp, rate)
+
+
+def has_demand(temp, status, mode, target_temp):
+    """Whether a powered-on room wants AC at `temp` (hysteresis applies when not serving)."""
+    if mode == 'COOL':
+        if status == 'SERVING':
+            # Keep running until target reached
+            return temp > target_temp
+        # Start running if threshold exceeded (Resume condition)
+        return temp >= target_temp + THRESHOLD
+    # HEAT
+    if status == 'SERVING':
+        return temp < target_temp
+    return temp <= target_temp - THRESHOLD
+
+
+def next_event(segment, now, is_on, status, mode, target_temp):
+    """
+    Next meaningful event for a room after `now`: (time, kind) or None.
+    Only the boundary relevant to the current status is considered, so a room
+    generates a handful of events per hour instead of one update per second.
+    """
+    candidates = []
+    if is_on:
+        if status == 'SERVING':
+            boundary, kind = target_temp, TARGET_REACHED
+        elif mode == 'COOL':
+            boundary, kind = target_temp + THRESHOLD, THRESHOLD_CROSSED
+        else:
+            boundary, kind = target_temp - THRESHOLD, THRESHOLD_CROSSED
+        t = segment.time_at(boundary)
+        if t is not None and t > now + EPSILON:
+            candidates.append((t, kind))
+
+    if segment.limit is not None and not segment.is_flat:
+        t = segment.time_at(segment.limit)
+        if t is not None:
+            candidates.append((max(t, now), AMBIENT_REACHED))
+
+    if not candidates:
+        return None
+    return min(candidates)
+
+
+class RoomTrack:
+    """In-memory trajectory of one room: its AC state key and current segment."""
+    __slots__ = ('room_id', 'key', 'segment', 'version', 'fee_mark', 'exchange')
+
+    def __init__(self, room_id, key, segment):
+        self.room_id = room_id
+        self.key = key  # (is_on, status, fan_speed, mode, target_temp)
+        self.segment = segment
+        self.version = 0
+        self.fee_mark = segment.start  # Fees accrued up to this time are already persisted
+        self.exchange = 0.0  # Neighbour heat exchange built into the segment (degrees per second)
+
+
+class ThermalPartition:
+    """
+    Event-driven thermal state for a set of rooms, with no DB access.
+    Callers feed state changes with apply_state(), move time forward with
+    advance(), and collect what must be persisted or sent to the scheduler
+    with drain(). Scheduler work is returned as actions (time, 'REQUEST'|'STOP', room_id),
+    fee accounting as accruals room_id -> (fees pending since, fees accounted up to,
+    fee rate from then on).
+    """
+
+    def __init__(self):
+        self.tracks = {}   # room_id -> RoomTrack
+        self.events = []   # heap of (time, seq, room_id, version, kind)
+        self._seq = itertools.count()
+        self.moving = set()  # rooms whose segment is not flat
+        self.on_segment_end = None  # optional callback(track, t) before a segment is replaced
+        self.heat = HeatExchange()
+        self._coupled = False
+        self._reset_pending()
+
+    def _reset_pending(self):
+        self.temps = {}     # room_id -> temp to persist
+        self.fees = {}      # room_id -> fee delta to persist
+        self.statuses = {}  # room_id -> status to persist
+        self.actions = []   # scheduler calls, in event order
+        self.since = {}     # room_id -> fee_mark the pending fee delta starts at
+
+    def drain(self):
+        accruals = {rid: (since, self.tracks[rid].fee_mark, self.tracks[rid].segment.fee_rate)
+                    for rid, since in self.since.items() if rid in self.tracks}
+        pending = (self.temps, self.fees, self.statuses, self.actions, accruals)
+        self._reset_pending()
+        return pending
+
+    def temperature_at(self, room_id, t):
+        track = self.tracks.get(room_id)
+        if not track:
+            return None
+        return track.segment.temp_at(t)
+
+    def apply_state(self, room_id, key, current_temp, now):
+        track = self.tracks.get(room_id)
+        if track is None:
+            is_on, status, fan_speed, mode, _ = key
+            segment = build_segment(now, current_temp, is_on, status, fan_speed, mode)
+            track = RoomTrack(room_id, key, segment)
+            self.tracks[room_id] = track
+            self.since.setdefault(room_id, now)
+            self._schedule(track, now)
+        elif track.key != key:
+            track.key = key
+            self._resegment(track, now)
+
+    def remove(self, room_id):
+        self.tracks.pop(room_id, None)
+        self.moving.discard(room_id)
+
+    def advance(self, now):
+        while self.events and self.events[0][0] <= now:
+            t, _, rid, version, kind = heapq.heappop(self.events)
+            track = self.tracks.get(rid)
+            if not track or track.version != version:
+                continue  # Stale event
+            if kind == AMBIENT_REACHED:
+                self._resegment(track, t)
+            else:
+                self._check_state_transitions(track, t)
+
+    def resegment_all(self, now):
+        """Rebuild every segment at `now`, e.g. after rates or ambient temperature changed."""
+        for track in self.tracks.values():
+            self._resegment(track, now)
+
+    def exchange_heat(self, now):
+        """
+        Coupled thermal model (Config.HEAT_TRANSFER_COEFF > 0): recompute the
+        neighbour exchange of every room with one sparse product, and reshape
+        the segments of rooms whose exchange moved by more than
+        HEAT_EXCHANGE_TOLERANCE, so a settled building still generates few events.
+        """
+        coefficient = Config.HEAT_TRANSFER_COEFF
+        if not coefficient:
+            if self._coupled:
+                self._coupled = False
+                for track in self.tracks.values():
+                    if track.exchange:
+                        track.exchange = 0.0
+                        self._reshape(track, now)
+            return
+        self._coupled = True
+        self.heat.rebuild(self.tracks)
+        tracks = [self.tracks[rid] for rid in self.heat.order]
+        temps = [track.segment.temp_at(now) for track in tracks]
+        tolerance = Config.HEAT_EXCHANGE_TOLERANCE / 60.0
+        for track, rate in zip(tracks, self.heat.rates(temps, coefficient)):
+            if abs(rate - track.exchange) > tolerance:
+                track.exchange = rate
+                self._reshape(track, now)
+        self._compact_events()
+
+    def next_event_time(self):
+        return self.events[0][0] if self.events else None
+
+    def flush(self, now):
+        # Persist moving rooms so pages polling the DB see progress
+        for rid in self.moving:
+            self._materialize(self.tracks[rid], now)
+
+    def _resegment(self, track, t):
+        if self.on_segment_end:
+            self.on_segment_end(track, t)
+        self._materialize(track, t)
+        is_on, status, fan_speed, mode, _ = track.key
+        track.segment = build_segment(t, self.temps[track.room_id], is_on, status, fan_speed, mode, track.exchange)
+        track.fee_mark = t
+        self._schedule(track, t)
+
+    def _reshape(self, track, t):
+        # New slope from `t` with the same AC state: the fee rate is unchanged, so
+        # nothing is materialized (fees keep accruing from fee_mark, temps are flushed as usual)
+        if self.on_segment_end:
+            self.on_segment_end(track, t)
+        is_on, status, fan_speed, mode, _ = track.key
+        track.segment = build_segment(t, track.segment.temp_at(t), is_on, status, fan_speed, mode, track.exchange)
+        self._schedule(track, t)
+
+    def _compact_events(self):
+        # Reshaping leaves stale events behind; drop them before the heap outgrows the rooms
+        if len(self.events) > 2 * len(self.tracks) + 1000:
+            self.events = [e for e in self.events if e[2] in self.tracks and self.tracks[e[2]].version == e[3]]
+            heapq.heapify(self.events)
+
+    def _schedule(self, track, now, check_now=True):
+        track.version += 1
+        if track.segment.is_flat:
+            self.moving.discard(track.room_id)
+        else:
+            self.moving.add(track.room_id)
+
+        # A new segment may already require a transition (e.g. just turned on above threshold)
+        if check_now and self._needs_transition(track, now):
+            heapq.heappush(self.events, (now, next(self._seq), track.room_id, track.version, THRESHOLD_CROSSED))
+            return
+
+        is_on, status, _, mode, target_temp = track.key
+        event = next_event(track.segment, now, is_on, status, mode, target_temp)
+        if event:
+            heapq.heappush(self.events, (event[0], next(self._seq), track.room_id, track.version, event[1]))
+
+    def _needs_transition(self, track, t):
+        is_on, status, _, mode, target_temp = track.key
+        if not is_on:
+            return status != 'IDLE'
+        demand = has_demand(track.segment.temp_at(t + EPSILON), status, mode, target_temp)
+        if demand:
+            return status == 'IDLE'
+        return status in ('SERVING', 'WAITING')
+
+    def _materialize(self, track, t):
+        self.temps[track.room_id] = track.segment.temp_at(t)
+        self.since.setdefault(track.room_id, track.fee_mark)
+        if track.segment.fee_rate and t > track.fee_mark:
+            self.fees[track.room_id] = self.fees.get(track.room_id, 0.0) + track.segment.fee_rate * (t - track.fee_mark)
+        track.fee_mark = max(track.fee_mark, t)
+
+    def _check_state_transitions(self, track, t):
+        is_on, status, fan_speed, mode, target_temp = track.key
+        rid = track.room_id
+
+        if not is_on:
+            if status != 'IDLE':
+                self.statuses[rid] = 'IDLE'
+                track.key = (is_on, 'IDLE', fan_speed, mode, target_temp)
+                self._resegment(track, t)
+            return
+
+        demand = has_demand(track.segment.temp_at(t + EPSILON), status, mode, target_temp)
+        if demand:
+            if status == 'IDLE':
+                # Let scheduler handle this; the new status comes back through apply_state()
+                self._materialize(track, t)
+                self.actions.append((t, 'REQUEST', rid))
+                self._schedule(track, t, check_now=False)
+                return
+            self._schedule(track, t)
+        else:
+            # No demand (Target reached or within hysteresis buffer)
+            if status == 'SERVING' or status == 'WAITING':
+                self.statuses[rid] = 'IDLE'
+                track.key = (is_on, 'IDLE', fan_speed, mode, target_temp)
+                self._resegment(track, t)
+                self.actions.append((t, 'STOP', rid))
+            else:
+                self._schedule(track, t)
@@ -0,0 +1,138 @@
+"""
+Monte Carlo tuning of TIME_SLICE and MAX_SERVING_ROOMS (manage.py tune_scheduler).
+Each run generates a random occupancy and usage scenario from its seed and
+replays it with HeadlessSimulation (no DB, simulated time), so a run is fully
+determined by (seed, grid point). Every grid point replays the same seeds
+(common random numbers), which makes the differences between grid points far
+less noisy than the spread of any single one. Runs are spread over a process
+pool; results are reported as means with confidence intervals.
+"""
+import itertools
+import multiprocessing
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from core.services.config import Config
+
+METRICS = ('mean_wait', 'p95_wait', 'comfort_error', 'energy')
+
+# Settings a guest picks when turning the AC on, and how often
+FAN_WEIGHTS = {'LOW': 0.3, 'MID': 0.5, 'HIGH': 0.2}
+COOL_TARGETS = (20.0, 26.0)
+HEAT_TARGETS = (22.0, 28.0)
+
+
+def random_workload(seed, rooms=40, hours=4.0):
+    """
+    A randomized occupancy and usage scenario: a random share of `rooms` is
+    occupied, each guest turns the AC on and off at random (exponential gaps
+    and session lengths) and sometimes changes fan speed or target mid-session.
+    """
+    rng = random.Random(seed)
+    horizon = hours * 3600.0
+    occupancy = rng.uniform(0.4, 1.0)
+    heat_share = rng.choice((0.0, 0.0, 0.2, 1.0))  # Summer, summer, mixed, winter
+    mean_gap = rng.uniform(10, 60) * 60.0          # Between sessions of a room
+    mean_session = rng.uniform(10, 45) * 60.0
+    workload = {'rooms': {}, 'events': []}
+    for i in range(rooms):
+        rid = str(100 * (1 + i // 20) + 1 + i % 20)
+        heat = rng.random() < heat_share
+        workload['rooms'][rid] = round(rng.uniform(10.0, 18.0) if heat else rng.uniform(26.0, 32.0), 1)
+        if rng.random() >= occupancy:
+            continue
+        t = rng.expovariate(1.0 / mean_gap)
+        while t < horizon:
+            fan = rng.choices(list(FAN_WEIGHTS), weights=list(FAN_WEIGHTS.values()))[0]
+            low, high = HEAT_TARGETS if heat else COOL_TARGETS
+            workload['events'].append((t, rid, {'is_on': True, 'mode': 'HEAT' if heat else 'COOL', 'fan_speed': fan,
+                                                'target_temp': float(rng.randint(int(low), int(high)))}))
+            end = t + rng.expovariate(1.0 / mean_session)
+            if rng.random() < 0.3:
+                change = rng.uniform(t, end)
+                if rng.random() < 0.5:
+                    workload['events'].append((change, rid, {'fan_speed': rng.choice(list(FAN_WEIGHTS))}))
+                else:
+                    workload['events'].append((change, rid, {'target_temp': float(rng.randint(int(low), int(high)))}))
+            workload['events'].append((end, rid, {'is_on': False}))
+            t = end + rng.expovariate(1.0 / mean_gap)
+    workload['events'].sort(key=lambda e: (e[0], e[1]))
+    return workload, horizon
+
+
+def run_one(task):
+    """One seeded run at one grid point: (time_slice, max_serving, seed, {metric: value})."""
+    from core.services.headless import HeadlessSimulation
+    from core.services.policies import get_policy
+    time_slice, max_serving, seed, rooms, hours, policy = task
+    workload, horizon = random_workload(seed, rooms, hours)
+    m = HeadlessSimulation(workload, policy=get_policy(policy), max_serving=max_serving,
+                           time_slice=time_slice).run(horizon)
+    room_hours = len(workload['rooms']) * hours
+    return time_slice, max_serving, seed, {
+        'mean_wait': m['mean_wait'],
+        'p95_wait': m['p95_wait'],
+        'comfort_error': m['error_integral'] / room_hours,  # degree-minutes per room-hour
+        'energy': m['energy'],
+    }
+
+
+def confidence_interval(values, level=0.95):
+    """(mean, half width) of the normal-approximation confidence interval of the mean."""
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, float('inf')
+    z = statistics.NormalDist().inv_cdf(0.5 + level / 2)
+    return mean, z * statistics.stdev(values) / len(values) ** 0.5
+
+
+def _init_worker(overrides):
+    # Spawned workers start from the shipped Config; use the values in effect
+    # in the parent. The headless simulation never touches the DB.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hotel_server.settings')
+    import django
+    django.setup()
+    for key, value in overrides.items():
+        setattr(Config, key, value)
+
+
+def sweep(time_slices, max_serving, runs, rooms=40, hours=4.0, seed=0, policy=None, workers=None,
+          overrides=None, progress=None):
+    """
+    Replay `runs` seeded scenarios at every (time_slice, max_serving) grid point.
+    Returns {(time_slice, max_serving): {metric: [value per seed, in seed order]}}.
+    """
+    policy = policy or Config.SCHEDULING_POLICY
+    seeds = [seed + i for i in range(runs)]
+    tasks = [(ts, ms, s, rooms, hours, policy) for ts, ms in itertools.product(time_slices, max_serving) for s in seeds]
+    samples = {}
+    workers = workers or os.cpu_count() or 1
+    # Spawned like the partitioned simulation: no DB connections or threads inherited
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(overrides or {},)) as pool:
+        chunksize = max(1, len(tasks) // (workers * 8))
+        # map() keeps task order, so every series is in seed order
+        for done, (ts, ms, _, metrics) in enumerate(pool.map(run_one, tasks, chunksize=chunksize), 1):
+            point = samples.setdefault((ts, ms), {metric: [] for metric in METRICS})
+            for metric in METRICS:
+                point[metric].append(metrics[metric])
+            if progress:
+                progress(done, len(tasks))
+    return samples
+
+
+def summarize(samples, baseline, level=0.95):
+    """
+    {point: {metric: (mean, half width), 'delta': {metric: (mean, half width)}}}.
+    delta is the paired difference to the baseline point over the same seeds,
+    far tighter than comparing the two intervals.
+    """
+    summary = {}
+    for point, series in samples.items():
+        summary[point] = {metric: confidence_interval(values, level) for metric, values in series.items()}
+        summary[point]['delta'] = {
+            metric: confidence_interval([a - b for a, b in zip(values, samples[baseline][metric])], level)
+            for metric, values in series.items()
+        }
+    return summary
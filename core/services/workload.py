@@ -0,0 +1,59 @@
+"""
+Workloads for offline scheduler experiments (see core.services.headless).
+A workload is {'rooms': {room_id: initial_temp}, 'events': [(t, room_id, changes), ...]}.
+"""
+import json
+
+# Sessions closer than this are treated as a settings change, not off + on
+CONTINUATION_GAP = 2.0
+
+
+def record_workload(since=None, until=None):
+    """Rebuild guest control events from ACSession rows."""
+    from core.models import ACSession
+
+    sessions = ACSession.objects.order_by('room_id', 'start_time')
+    if since:
+        sessions = sessions.filter(start_time__gte=since)
+    if until:
+        sessions = sessions.filter(start_time__lt=until)
+    rows = list(sessions.values_list('room_id', 'start_time', 'end_time', 'mode', 'fan_speed', 'start_temp', 'target_temp'))
+    if not rows:
+        return {'rooms': {}, 'events': []}
+
+    origin = min(r[1] for r in rows)
+    rooms = {}
+    events = []
+    pending_off = {}  # room_id -> turn-off event of the previous session
+    last_settings = {}  # room_id -> settings of the previous session
+    for rid, start, end, mode, fan_speed, start_temp, target_temp in rows:
+        t = (start - origin).total_seconds()
+        rooms.setdefault(rid, start_temp)
+        settings = {'mode': mode, 'fan_speed': fan_speed, 'target_temp': target_temp}
+        off = pending_off.pop(rid, None)
+        if off is not None and t - off[0] <= CONTINUATION_GAP:
+            # Settings changed while on: drop the turn-off and send only what changed
+            events.remove(off)
+            previous = last_settings.get(rid, {})
+            changes = {k: v for k, v in settings.items() if previous.get(k) != v}
+        else:
+            changes = dict(settings, is_on=True)
+        events.append((t, rid, changes))
+        last_settings[rid] = settings
+        if end:
+            off = ((end - origin).total_seconds(), rid, {'is_on': False})
+            pending_off[rid] = off
+            events.append(off)
+    events.sort(key=lambda e: (e[0], e[1]))
+    return {'rooms': rooms, 'events': events}
+
+
+def save_workload(workload, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'rooms': workload['rooms'], 'events': [list(e) for e in workload['events']]}, f)
+
+
+def load_workload(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return {'rooms': data['rooms'], 'events': [tuple(e) for e in data['events']]}
@@ -125,6 +125,9 @@ function updateSettings() {
 
 function postUpdate(data) {
     if (!roomId) return;
+    // Show the change at once: the server merges rapid clicks and applies them a moment later
+    Object.assign(currentState, data);
+    render();
     fetch(`/api/control/${roomId}/`, {
         method: 'POST',
         headers: {
@@ -8,6 +8,16 @@ document.addEventListener('DOMContentLoaded', function() {
     if (btnCheckout) {
         btnCheckout.addEventListener('click', checkOut);
     }
+
+    const btnGroupCheckin = document.getElementById('btn-group-checkin');
+    if (btnGroupCheckin) {
+        btnGroupCheckin.addEventListener('click', groupCheckIn);
+    }
+
+    const btnGroupCheckout = document.getElementById('btn-group-checkout');
+    if (btnGroupCheckout) {
+        btnGroupCheckout.addEventListener('click', groupCheckOut);
+    }
 });
 
 function getCookie(name) {
@@ -95,4 +105,73 @@ function checkOut() {
             alert('退房失败: ' + (data.message || 'Unknown error'));
         }
     });
-}
\ No newline at end of file
+}
+function postJson(url, body) {
+    return fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCookie('csrftoken')
+        },
+        body: JSON.stringify(body)
+    }).then(res => res.json());
+}
+
+function groupProblems(data) {
+    // Per-room reasons of a rejected group, one per line
+    const lines = Object.entries(data.rooms || {}).map(([room, reason]) => `${room}: ${reason}`);
+    return data.message + (lines.length ? '\n' + lines.join('\n') : '');
+}
+
+function groupCheckIn() {
+    // One "room_id guest_id" per line
+    const guests = document.getElementById('group-guests').value.split('\n')
+        .map(line => line.trim().split(/[\s,]+/))
+        .filter(parts => parts[0])
+        .map(parts => ({ room_id: parts[0], guest_id: parts.slice(1).join(' ') }));
+    const group = document.getElementById('group-name').value;
+
+    postJson('/api/checkin/group/', { group: group, guests: guests })
+    .then(data => {
+        if (data.status === 'ok') {
+            alert(`团队入住办理成功: ${data.rooms} 间`);
+            location.reload();
+        } else {
+            alert('团队入住失败: ' + groupProblems(data));
+        }
+    });
+}
+
+function groupCheckOut() {
+    const roomIds = document.getElementById('group-rooms').value.split(/[\s,]+/).filter(id => id);
+    if (!roomIds.length || !confirm(`确定为 ${roomIds.length} 间房退房吗?`)) return;
+
+    postJson('/api/checkout/group/', { room_ids: roomIds })
+    .then(data => {
+        if (data.status === 'ok') {
+            const invoice = data.invoice;
+            document.getElementById('group-invoice').classList.remove('d-none');
+            document.getElementById('group-rooms-count').innerText = invoice.rooms;
+            document.getElementById('group-accom').innerText = '¥' + invoice.accommodation_fee.toFixed(2);
+            document.getElementById('group-ac').innerText = '¥' + invoice.ac_fee.toFixed(2);
+            document.getElementById('group-total').innerText = '¥' + invoice.total.toFixed(2);
+
+            const tbody = document.getElementById('group-bills-body');
+            tbody.innerHTML = '';
+            invoice.bills.forEach(bill => {
+                const tr = document.createElement('tr');
+                tr.innerHTML = `
+                    <td>${bill.room_id}</td>
+                    <td>${bill.guest_id}</td>
+                    <td>${bill.days}</td>
+                    <td>¥${bill.accommodation_fee.toFixed(2)}</td>
+                    <td>¥${bill.ac_fee.toFixed(2)}</td>
+                    <td>¥${bill.total.toFixed(2)}</td>
+                `;
+                tbody.appendChild(tr);
+            });
+        } else {
+            alert('团队退房失败: ' + groupProblems(data));
+        }
+    });
+}
@@ -20,8 +20,13 @@ urlpatterns = [
     # APIs
     path('api/rooms/', views.api_room_status, name='api_room_status'),
     path('api/room/<str:room_id>/', views.api_room_detail, name='api_room_detail'),
+    path('api/room/<str:room_id>/history/', views.api_room_history, name='api_room_history'),
     path('api/control/<str:room_id>/', views.api_control_room, name='api_control_room'),
     path('api/checkin/', views.api_checkin, name='api_checkin'),
     path('api/checkout/', views.api_checkout, name='api_checkout'),
+    path('api/checkin/group/', views.api_group_checkin, name='api_group_checkin'),
+    path('api/checkout/group/', views.api_group_checkout, name='api_group_checkout'),
     path('api/queues/', views.api_scheduler_queues, name='api_scheduler_queues'),
+    path('api/metrics/queues/', views.api_scheduler_metrics, name='api_scheduler_metrics'),
+    path('api/export/<str:kind>/', views.api_export, name='api_export'),
 ]
@@ -1,14 +1,27 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login
-from .models import Room, Bill, ACSession
+from .models import Room, Bill, ACSession, QueueLatencyAggregate, ArchivedBill, Hotel
 from .services.scheduler import Scheduler
 from .services.config import Config
+from .services.metrics import merge_aggregates
+from .services.read_model import MonitorReadModel
+from .services.history import get_history
+from .services.archive import archived_sessions
+from .services.export import stream_export, ArchivedRangeError
+from .services.control import ControlCoalescer, parse_changes
+from .services.rate_limit import RateLimiter, rate_limited
+from .services.front_desk import GroupError, group_check_in, group_check_out, stay_nights
+from .services.fees import settle_fees
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 import json
 import datetime
+import heapq
+import itertools
+import time
 
 def custom_login(request):
     if request.method == 'POST':
@@ -43,13 +56,12 @@ def index(request):
     floors = {}
     for room in rooms:
         try:
-            floor = int(room.room_id) // 100
-            if floor not in floors:
-                floors[floor] = []
-            floors[floor].append(room)
+            floor = (0, int(room.room_id) // 100)
         except ValueError:
-            pass # Skip invalid room ids
-            
+            floor = (1, 'misc')  # Room ids that are not numbers have no floor
+        # Each hotel's floors apart: room numbers say nothing about which building they are in
+        floors.setdefault((room.hotel_id or '',) + floor, []).append(room)
+
     # Get Scheduler queues from DB state (since Scheduler instance memory is not shared)
     serving_queue = list(Room.objects.filter(status='SERVING'))
     waiting_queue = list(Room.objects.filter(status='WAITING'))
@@ -62,7 +74,8 @@ def index(request):
     ))
             
     return render(request, 'core/index.html', {
-        'floors': dict(sorted(floors.items())),
+        'floors': {(f"{hotel} {floor}" if hotel else floor): rooms
+                   for (hotel, _, floor), rooms in sorted(floors.items())},
         'serving_queue': serving_queue,
         'waiting_queue': waiting_queue
     })
@@ -92,13 +105,31 @@ def checkout_page(request):
 
 @login_required
 def bill_history(request):
-    bills = Bill.objects.all().order_by('-check_out_time')
-    return render(request, 'core/bill_history.html', {'bills': bills})
+    # Newest first, one page at a time, across the hot table and the bills moved out by archive_records.
+    # Each table gives at most the rows up to the end of the page, plus one to tell whether there is a next page.
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+    start = (page - 1) * Config.BILL_HISTORY_PAGE_SIZE
+    stop = start + Config.BILL_HISTORY_PAGE_SIZE + 1
+    tables = [model.objects.select_related('room').order_by('-check_out_time')[:stop] for model in (Bill, ArchivedBill)]
+    bills = list(itertools.islice(heapq.merge(*tables, key=lambda b: b.check_out_time, reverse=True), start, stop))
+    return render(request, 'core/bill_history.html', {
+        'bills': bills[:Config.BILL_HISTORY_PAGE_SIZE],
+        'page': page,
+        'has_next': len(bills) > Config.BILL_HISTORY_PAGE_SIZE,
+    })
 
 @login_required
 def bill_detail(request, bill_id):
-    bill = get_object_or_404(Bill, id=bill_id)
-    ac_sessions = ACSession.objects.filter(bill=bill).order_by('start_time')
+    bill = Bill.objects.filter(id=bill_id).first()
+    if bill:
+        ac_sessions = ACSession.objects.filter(bill=bill).order_by('start_time')
+    else:
+        # Archived: summary row in the DB, sessions in the monthly archive file
+        bill = get_object_or_404(ArchivedBill, id=bill_id)
+        ac_sessions = archived_sessions(bill)
     
     # Calculate days for display (re-calculate or store? We didn't store days in Bill model, only fees)
     # But we can infer or just show fees. The user asked for "detailed bill".
@@ -115,9 +146,13 @@ def bill_detail(request, bill_id):
 # APIs
 
 def api_room_status(request):
-    # Only return occupied rooms for monitoring
-    rooms = Room.objects.filter(occupancy_status='OCCUPIED').values()
-    return JsonResponse({'rooms': list(rooms)})
+    # Only return occupied rooms for monitoring, from the snapshot published each simulation tick.
+    # ?layout=columns returns one array per field instead of one object per room; ?hotel=code one hotel's rooms.
+    layout = 'columns' if request.GET.get('layout') == 'columns' else 'rows'
+    tick, body = MonitorReadModel().get(layout, request.GET.get('hotel') or None)
+    response = HttpResponse(body, content_type='application/json')
+    response['X-Snapshot-Tick'] = str(tick)
+    return response
 
 def api_room_detail(request, room_id):
     room = get_object_or_404(Room, room_id=room_id)
@@ -132,97 +167,32 @@ def api_room_detail(request, room_id):
         'is_on': room.is_on,
         'occupancy_status': room.occupancy_status
     }
+    # Show the panel the settings it asked for while they are being coalesced
+    data.update(ControlCoalescer().pending_changes(room_id))
     return JsonResponse(data)
 
 @csrf_exempt
+@rate_limited('api_control_room')
 def api_control_room(request, room_id):
     if request.method == 'POST':
         try:
-            data = json.loads(request.body)
             room = get_object_or_404(Room, room_id=room_id)
-            scheduler = Scheduler()
-            
-            # Handle AC Session Logic
-            if 'is_on' in data:
-                new_state = data['is_on']
-                if new_state and not room.is_on:
-                    # Turning ON: Start Session
-                    ACSession.objects.create(
-                        room=room,
-                        mode=room.mode,
-                        fan_speed=room.fan_speed,
-                        start_temp=room.current_temp,
-                        target_temp=room.target_temp,
-                        initial_fee=room.fee
-                    )
-                    scheduler.request_service(room_id)
-                elif not new_state and room.is_on:
-                    # Turning OFF: End Session
-                    session = ACSession.objects.filter(room=room, end_time__isnull=True).last()
-                    if session:
-                        session.end_time = timezone.now()
-                        session.fee = room.fee - session.initial_fee
-                        session.save()
-                    scheduler.stop_service(room_id)
-                room.is_on = new_state
-            
-            # If settings change while ON, maybe split session? 
-            # For simplicity, we just update the room settings. 
-            # If strict logging is needed, we should close current and start new.
-            # Let's implement strict logging for better detail.
-            if room.is_on and ('mode' in data or 'fan_speed' in data or 'target_temp' in data):
-                 # Close current
-                session = ACSession.objects.filter(room=room, end_time__isnull=True).last()
-                if session:
-                    session.end_time = timezone.now()
-                    session.fee = room.fee - session.initial_fee
-                    session.save()
-                
-                # Update room
-                if 'target_temp' in data: room.target_temp = float(data['target_temp'])
-                if 'fan_speed' in data: room.fan_speed = data['fan_speed']
-                if 'mode' in data: room.mode = data['mode']
-                
-                # Start new
-                ACSession.objects.create(
-                    room=room,
-                    mode=room.mode,
-                    fan_speed=room.fan_speed,
-                    start_temp=room.current_temp,
-                    target_temp=room.target_temp,
-                    initial_fee=room.fee
-                )
-            else:
-                # Just update settings if OFF
-                if 'target_temp' in data: room.target_temp = float(data['target_temp'])
-                if 'fan_speed' in data: room.fan_speed = data['fan_speed']
-                if 'mode' in data: room.mode = data['mode']
-
-            room.save()
-            
-            # Requirement C: Adjusting fan speed counts as new request, adjusting temp does not.
-            # We only request service if:
-            # 1. Room was just turned ON
-            # 2. Fan speed changed (Priority changed)
-            # 3. Mode changed (Treat as major change, though not explicitly specified, safer to re-eval)
-            should_request_service = False
-            
-            if 'is_on' in data and data['is_on']:
-                should_request_service = True
-            elif room.is_on:
-                if 'fan_speed' in data:
-                    should_request_service = True
-                # If only target_temp changed, we DO NOT request service to avoid resetting wait timer.
-            
-            if should_request_service:
-                scheduler.request_service(room_id)
-                
-            return JsonResponse({'status': 'ok'})
+            coalescer = ControlCoalescer()
+            # Checked here: coalesced changes are applied after the response, too late to refuse them
+            try:
+                mode = coalescer.pending_changes(room_id).get('mode', room.mode)
+                changes = parse_changes(json.loads(request.body), mode)
+            except ValueError as e:
+                return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+            # Bursts of clicks are merged and applied once (see core.services.control)
+            applied = coalescer.submit(room_id, changes)
+            return JsonResponse({'status': 'ok', 'pending': not applied})
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
     return JsonResponse({'status': 'error'}, status=400)
 
 @csrf_exempt
+@rate_limited('api_checkin')
 def api_checkin(request):
     if request.method == 'POST':
         data = json.loads(request.body)
@@ -237,14 +207,20 @@ def api_checkin(request):
         room.guest_id = guest_id
         room.check_in_time = timezone.now()
         room.fee = 0.0 # Reset AC fee
+        room.fee_rate = 0.0
+        room.fee_since = time.time()
         room.save()
         return JsonResponse({'status': 'ok'})
 
 @csrf_exempt
+@rate_limited('api_checkout')
 def api_checkout(request):
     if request.method == 'POST':
         data = json.loads(request.body)
         room_id = data.get('room_id')
+        ControlCoalescer().flush(room_id)
+        # Bill the fee accrued up to now; the simulation may not have written it yet
+        settle_fees(Room.objects.filter(room_id=room_id))
         
         room = get_object_or_404(Room, room_id=room_id)
         
@@ -259,29 +235,14 @@ def api_checkout(request):
                 session.fee = room.fee - session.initial_fee
                 session.save()
             room.is_on = False
-            Scheduler().stop_service(room_id)
+            Scheduler.for_hotel(room.hotel_id).stop_service(room_id)
 
         # Calculate Accommodation Fee
         check_out_time = timezone.now()
         check_in_time = room.check_in_time or check_out_time # Fallback
         
-        # Logic: Day 1 checkin. Day 2 12:00 is deadline.
-        # If checkout > 12:00, count as new day.
-        # Calculate number of nights.
-        # If check_in is today, and now is today -> 1 day.
-        
-        # Algorithm:
-        # 1. Get dates.
-        # 2. Base days = (checkout_date - checkin_date).days
-        # 3. If checkout_time > 12:00:00, days += 1
-        # 4. If days == 0, days = 1.
-        
-        days = (check_out_time.date() - check_in_time.date()).days
-        if check_out_time.hour >= 12:
-            days += 1
-        if days == 0:
-            days = 1
-            
+        # Day 1 checkin, day 2 12:00 is the deadline: checking out later counts a new day
+        days = stay_nights(check_in_time, check_out_time)
         accommodation_fee = days * room.daily_rate
         
         # Create Bill
@@ -320,6 +281,7 @@ def api_checkout(request):
         room.guest_id = None
         room.fee = 0.0
         room.total_fee = 0.0
+        room.fee_rate = 0.0
         room.check_in_time = None
         room.status = 'IDLE'
         room.save()
@@ -337,10 +299,43 @@ def api_checkout(request):
             }
         })
 
+@csrf_exempt
+@rate_limited('api_group_checkin')
+def api_group_checkin(request):
+    # Tour group: {"group": "...", "guests": [{"room_id": ..., "guest_id": ...}]}, all rooms or none
+    if request.method == 'POST':
+        data = json.loads(request.body)
+        guests = [(g.get('room_id'), g.get('guest_id')) for g in data.get('guests', [])]
+        try:
+            result = group_check_in(guests)
+        except GroupError as e:
+            return JsonResponse({'status': 'error', 'message': str(e), 'rooms': e.rooms})
+        return JsonResponse({'status': 'ok', 'group': data.get('group'), 'rooms': result['rooms']})
+
+@csrf_exempt
+@rate_limited('api_group_checkout')
+def api_group_checkout(request):
+    # Tour group: {"group": "...", "room_ids": [...]}, one combined invoice
+    if request.method == 'POST':
+        data = json.loads(request.body)
+        try:
+            invoice, powered = group_check_out(data.get('room_ids', []))
+        except GroupError as e:
+            return JsonResponse({'status': 'error', 'message': str(e), 'rooms': e.rooms})
+        by_hotel = {}
+        for room_id, hotel_id in powered:
+            by_hotel.setdefault(hotel_id, []).append(room_id)
+        for hotel_id, room_ids in by_hotel.items():
+            Scheduler.for_hotel(hotel_id).stop_services(room_ids)
+        return JsonResponse({'status': 'ok', 'group': data.get('group'), 'invoice': invoice})
+
 def api_scheduler_queues(request):
-    # Get Scheduler queues from DB state
-    serving_queue = Room.objects.filter(status='SERVING').values('room_id', 'fan_speed', 'service_time')
-    waiting_queue = list(Room.objects.filter(status='WAITING'))
+    # Get Scheduler queues from DB state, of all hotels or of ?hotel=code
+    rooms = Room.objects.all()
+    if request.GET.get('hotel'):
+        rooms = rooms.filter(hotel_id=request.GET['hotel'])
+    serving_queue = rooms.filter(status='SERVING').values('room_id', 'fan_speed', 'service_time')
+    waiting_queue = list(rooms.filter(status='WAITING'))
     
     # Sort Waiting Queue to match Scheduler logic
     waiting_queue.sort(key=lambda r: (
@@ -355,3 +350,89 @@ def api_scheduler_queues(request):
         'waiting': waiting_data
     })
 
+
+def api_scheduler_metrics(request):
+    # Live queueing-latency histograms of this process' scheduler for the default property or ?hotel=code
+    hotel = request.GET.get('hotel') or None
+    if hotel is not None and not Hotel.objects.filter(code=hotel).exists():
+        return JsonResponse({'error': 'Unknown hotel'}, status=404)
+    # Only a scheduler this process already runs: a GET must not create (and DB-sync) one
+    scheduler = Scheduler._instances.get(hotel)
+    data = {}
+    if scheduler is not None:
+        data = scheduler.metrics.report()
+        data['power'] = scheduler.power_status()
+    data['control'] = ControlCoalescer().stats()  # Process-wide
+    data['rate_limit'] = RateLimiter().stats()  # Process-wide
+
+    # Persisted aggregates, e.g. ?hours=24 (the scheduler may run in another process)
+    hours = request.GET.get('hours')
+    if hours:
+        try:
+            since = timezone.now() - datetime.timedelta(hours=float(hours))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid hours'}, status=400)
+        rows = QueueLatencyAggregate.objects.filter(period_end__gte=since, hotel_id=hotel)
+        data['history'] = merge_aggregates(rows)
+    return JsonResponse(data)
+
+def _parse_time(value, default):
+    # Unix seconds or ISO 8601
+    if value in (None, ''):
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f"Invalid time: {value}")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed.timestamp()
+
+def api_room_history(request, room_id):
+    get_object_or_404(Room, room_id=room_id)
+    history = get_history()
+    try:
+        t1 = _parse_time(request.GET.get('to'), time.time())
+        t0 = _parse_time(request.GET.get('from'), t1 - 3600)
+        step = float(request.GET.get('step') or max(history.interval, (t1 - t0) / 300))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if t1 < t0 or step <= 0 or (t1 - t0) / step > Config.HISTORY_MAX_BUCKETS:
+        return JsonResponse({'error': 'Invalid range or step'}, status=400)
+
+    return JsonResponse({
+        'room_id': room_id,
+        'from': t0,
+        'to': t1,
+        'step': step,
+        'interval': history.interval,
+        'buckets': history.buckets(room_id, t0, t1, step),
+    })
+
+@login_required
+def api_export(request, kind):
+    # Streaming CSV/NDJSON export for accounting; resume with ?after=<id of the last complete row>
+    fmt = request.GET.get('format', 'csv')
+    compress = request.GET.get('gzip') in ('1', 'true')
+    try:
+        after = int(request.GET.get('after') or 0)
+        since = _parse_time(request.GET.get('from'), None)
+        until = _parse_time(request.GET.get('to'), None)
+        chunks = stream_export(
+            kind, fmt, compress=compress, after=after,
+            since=datetime.datetime.fromtimestamp(since, datetime.timezone.utc) if since is not None else None,
+            until=datetime.datetime.fromtimestamp(until, datetime.timezone.utc) if until is not None else None,
+            hot_only=request.GET.get('hot_only') in ('1', 'true'),
+        )
+    except ArchivedRangeError as e:
+        return JsonResponse({'error': str(e)}, status=409)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    filename = f"{kind}.{fmt}" + ('.gz' if compress else '')
+    content_type = 'application/gzip' if compress else ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
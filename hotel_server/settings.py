@@ -41,6 +41,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'hotel_server.urls'
@@ -116,6 +117,34 @@ LOGIN_URL = 'core:login'
 LOGIN_REDIRECT_URL = 'core:index'
 LOGOUT_REDIRECT_URL = 'core:login'
 
+# Room definitions loaded on first start when the Room table is empty
+# (see `manage.py import_rooms` for provisioning real properties)
+ROOM_SEED_FILE = BASE_DIR / 'core' / 'fixtures' / 'default_rooms.csv'
+
+# Scheduler journal and snapshots for crash recovery (None disables journaling)
+SCHEDULER_JOURNAL_DIR = BASE_DIR / 'journal'
+
+# Runtime Config overrides: None keeps them in the ConfigSetting table,
+# a path keeps them in that JSON file (see core.services.config_store)
+CONFIG_FILE = None
+
+# Spilled per-room temperature history (None keeps only the in-memory ring buffers)
+HISTORY_DIR = BASE_DIR / 'history'
+
+# Compressed monthly archives of settled bills and AC sessions (manage.py archive_records)
+ARCHIVE_DIR = BASE_DIR / 'archive'
+
+# Profiling requests and results (manage.py profile)
+PROFILE_DIR = BASE_DIR / 'profiles'
+
+# Rate limiting of the write APIs (Config.RATE_LIMITS). The 'client' scope keys on
+# REMOTE_ADDR; requests from one of these reverse proxies are keyed on the address
+# the proxy appended to RATE_LIMIT_CLIENT_HEADER instead. RATE_LIMIT_ENABLED=0 in
+# the environment turns limiting off (manage.py load_test does for its own server).
+RATE_LIMIT_TRUSTED_PROXIES = []
+RATE_LIMIT_CLIENT_HEADER = 'HTTP_X_FORWARDED_FOR'
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 